@@ -1,65 +1,15 @@
-# Import from organized folders
-# LLM nodes
-from .llm import LLM_NODE_CLASS_MAPPINGS, LLM_NODE_DISPLAY_NAME_MAPPINGS
+# Node modules are listed in registry.MODULES. With a current metadata
+# snapshot they're imported on first execution, otherwise right here.
+from . import registry
 
-# Utility nodes
-from .util import UTIL_NODE_CLASS_MAPPINGS, UTIL_NODE_DISPLAY_NAME_MAPPINGS
+# Importing registers the HTTP routes on ComfyUI's server (/leon/metrics, ...);
+# no-op outside ComfyUI
+from .base import routes  # noqa: F401
+from .base import profiling
 
-# Image generation nodes
-from .img import (
-    FLUX_NODE_CLASS_MAPPINGS, FLUX_NODE_DISPLAY_NAME_MAPPINGS,
-    GOOGLE_NODE_CLASS_MAPPINGS, GOOGLE_NODE_DISPLAY_NAME_MAPPINGS,
-    LUMA_NODE_CLASS_MAPPINGS, LUMA_NODE_DISPLAY_NAME_MAPPINGS,
-    BYTEDANCE_NODE_CLASS_MAPPINGS, BYTEDANCE_NODE_DISPLAY_NAME_MAPPINGS,
-    IDEOGRAM_NODE_CLASS_MAPPINGS, IDEOGRAM_NODE_DISPLAY_NAME_MAPPINGS,
-    RECRAFT_NODE_CLASS_MAPPINGS, RECRAFT_NODE_DISPLAY_NAME_MAPPINGS,
-    QWEN_NODE_CLASS_MAPPINGS, QWEN_NODE_DISPLAY_NAME_MAPPINGS,
-    NANO_BANANA_NODE_CLASS_MAPPINGS, NANO_BANANA_NODE_DISPLAY_NAME_MAPPINGS,
-    XAI_NODE_CLASS_MAPPINGS, XAI_NODE_DISPLAY_NAME_MAPPINGS,
-    MJ_PROXY_NODE_CLASS_MAPPINGS, MJ_PROXY_NODE_DISPLAY_NAME_MAPPINGS,
-    OPENAI_IMAGE_NODE_CLASS_MAPPINGS, OPENAI_IMAGE_NODE_DISPLAY_NAME_MAPPINGS,
-    STABLE_DIFFUSION_NODE_CLASS_MAPPINGS, STABLE_DIFFUSION_NODE_DISPLAY_NAME_MAPPINGS,
-    GOOGLE_OFFICIAL_NODE_CLASS_MAPPINGS, GOOGLE_OFFICIAL_NODE_DISPLAY_NAME_MAPPINGS,
-    PRUNA_NODE_CLASS_MAPPINGS, PRUNA_NODE_DISPLAY_NAME_MAPPINGS
-)
+NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS = registry.load()
 
-# Combine all node mappings
-NODE_CLASS_MAPPINGS = {
-    **FLUX_NODE_CLASS_MAPPINGS,
-    **GOOGLE_NODE_CLASS_MAPPINGS,
-    **LUMA_NODE_CLASS_MAPPINGS,
-    **BYTEDANCE_NODE_CLASS_MAPPINGS,
-    **IDEOGRAM_NODE_CLASS_MAPPINGS,
-    **RECRAFT_NODE_CLASS_MAPPINGS,
-    **QWEN_NODE_CLASS_MAPPINGS,
-    **NANO_BANANA_NODE_CLASS_MAPPINGS,
-    **XAI_NODE_CLASS_MAPPINGS,
-    **LLM_NODE_CLASS_MAPPINGS,
-    **MJ_PROXY_NODE_CLASS_MAPPINGS,
-    **OPENAI_IMAGE_NODE_CLASS_MAPPINGS,
-    **STABLE_DIFFUSION_NODE_CLASS_MAPPINGS,
-    **GOOGLE_OFFICIAL_NODE_CLASS_MAPPINGS,
-    **PRUNA_NODE_CLASS_MAPPINGS,
-    **UTIL_NODE_CLASS_MAPPINGS
-}
-
-NODE_DISPLAY_NAME_MAPPINGS = {
-    **FLUX_NODE_DISPLAY_NAME_MAPPINGS,
-    **GOOGLE_NODE_DISPLAY_NAME_MAPPINGS,
-    **LUMA_NODE_DISPLAY_NAME_MAPPINGS,
-    **BYTEDANCE_NODE_DISPLAY_NAME_MAPPINGS,
-    **IDEOGRAM_NODE_DISPLAY_NAME_MAPPINGS,
-    **RECRAFT_NODE_DISPLAY_NAME_MAPPINGS,
-    **QWEN_NODE_DISPLAY_NAME_MAPPINGS,
-    **NANO_BANANA_NODE_DISPLAY_NAME_MAPPINGS,
-    **XAI_NODE_DISPLAY_NAME_MAPPINGS,
-    **LLM_NODE_DISPLAY_NAME_MAPPINGS,
-    **MJ_PROXY_NODE_DISPLAY_NAME_MAPPINGS,
-    **OPENAI_IMAGE_NODE_DISPLAY_NAME_MAPPINGS,
-    **STABLE_DIFFUSION_NODE_DISPLAY_NAME_MAPPINGS,
-    **GOOGLE_OFFICIAL_NODE_DISPLAY_NAME_MAPPINGS,
-    **PRUNA_NODE_DISPLAY_NAME_MAPPINGS,
-    **UTIL_NODE_DISPLAY_NAME_MAPPINGS
-}
+# Opt-in cProfile/tracemalloc wrapping of every node, see LEON_PROFILE_DIR
+profiling.install(NODE_CLASS_MAPPINGS)
 
 __all__ = ["NODE_CLASS_MAPPINGS", "NODE_DISPLAY_NAME_MAPPINGS"]
\ No newline at end of file
@@ -0,0 +1,282 @@
+import threading
+
+
+# Declarative per-model capability tables.
+#
+# A provider node describes its models as data instead of if-chains:
+#
+#   CAPABILITIES = capabilities.Table(
+#       common={"response_format": ALWAYS, "output_format": ALWAYS},
+#       prompt={"max_chars": 10000},
+#       models={
+#           "FLUX 1.1 Pro": {
+#               "id": "flux-1.1-pro",
+#               "params": {"steps": ALWAYS, "height": {"multiple_of": 32}},
+#               "images": {"image_prompt": 1},
+#           },
+#       },
+#   )
+#
+# The first time a node runs, its table is compiled together with its
+# INPUT_TYPES (widget choices, min/max and defaults) into one Capability per
+# model. Capability.build() checks the prompt, every parameter the model takes
+# and the number of images in each slot, raising ValueError before any image
+# is encoded or request made, then assembles the payload. Adding a model is
+# adding a table entry.
+#
+# Param rules (a bare string is the send mode):
+#   send         ALWAYS, IF_SET (truthy / non-blank), UNLESS_DEFAULT, WITH_IMAGES
+#   field        payload key (defaults to the input name)
+#   slot         image slot WITH_IMAGES looks at
+#   choices, min, max, multiple_of, max_chars
+#                narrower than (or in addition to) the widget's own limits
+#   clamp        (lo, hi), either may be None; applied instead of rejecting
+#   needs_images values only sent when some image is given (skipped with a warning)
+# Image slot rules (a bare int is max):
+#   field, min (default 0), max (None = no limit),
+#   collapse     send a single image as a plain value rather than a list
+# Prompt rules:
+#   field (default "prompt"), max_chars, required (True, False or "unless_images")
+#   A model with "prompt": None takes no prompt.
+# An optional input that another model of the table takes is reported when
+# it is set away from its default for a model that ignores it.
+
+ALWAYS = "always"
+IF_SET = "if_set"
+UNLESS_DEFAULT = "unless_default"
+WITH_IMAGES = "with_images"
+
+_SEND_MODES = (ALWAYS, IF_SET, UNLESS_DEFAULT, WITH_IMAGES)
+_DEFAULT_PROMPT = {"field": "prompt", "max_chars": None, "required": True}
+_NO_WIDGET = (None, {}, False)
+
+_compiled = {}
+_compile_lock = threading.Lock()
+
+
+class Table:
+    """The capability data of one node class, keyed by model choice."""
+
+    def __init__(self, models, common=None, prompt=None):
+        self.models = models
+        self.common = common or {}
+        self.prompt = prompt or {}
+
+    def __iter__(self):
+        return iter(self.models)
+
+    def __len__(self):
+        return len(self.models)
+
+    def __contains__(self, key):
+        return key in self.models
+
+
+def _label(name):
+    return name.replace("_", " ").capitalize()
+
+
+def _is_set(value):
+    if isinstance(value, str):
+        return bool(value.strip())
+    return bool(value)
+
+
+def _count(images):
+    if images is None:
+        return 0
+    if isinstance(images, (list, tuple)):
+        return len(images)
+    return 1
+
+
+def _widgets(cls):
+    """name -> (choices, options, optional) for every input of the node."""
+    widgets = {}
+    input_types = cls.INPUT_TYPES()
+    for section in ("required", "optional"):
+        for name, spec in input_types.get(section, {}).items():
+            kind = spec[0] if spec else None
+            options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+            widgets[name] = (list(kind) if isinstance(kind, (list, tuple)) else None, options, section == "optional")
+    return widgets
+
+
+class Capability:
+    """One model's limits and payload rules, compiled from its table entry."""
+
+    def __init__(self, key, spec, table, widgets, all_params):
+        self.key = key
+        self.model = spec.get("id", key)
+
+        if "prompt" in spec and spec["prompt"] is None:
+            self.prompt = None
+        else:
+            self.prompt = dict(_DEFAULT_PROMPT, **table.prompt)
+            self.prompt.update(spec.get("prompt") or {})
+
+        rules = dict(table.common)
+        rules.update(spec.get("params", {}))
+        self.params = []
+        for name, rule in rules.items():
+            rule = {"send": rule} if isinstance(rule, str) else dict(rule)
+            rule.setdefault("send", ALWAYS)
+            if rule["send"] not in _SEND_MODES:
+                raise ValueError(f"{key}: unknown send mode {rule['send']!r} for {name}")
+            choices, options, _ = widgets.get(name, _NO_WIDGET)
+            rule.setdefault("field", name)
+            rule.setdefault("choices", choices)
+            rule.setdefault("default", options.get("default"))
+            for limit in ("min", "max"):
+                if limit not in rule and limit in options:
+                    rule[limit] = options[limit]
+            self.params.append((name, rule))
+
+        self.slots = []
+        for slot, rule in spec.get("images", {}).items():
+            rule = {"max": rule} if rule is None or isinstance(rule, int) else dict(rule)
+            rule.setdefault("field", slot)
+            rule.setdefault("min", 0)
+            rule.setdefault("max", None)
+            rule.setdefault("collapse", False)
+            self.slots.append((slot, rule))
+
+        self.dimensions = [tuple(d) for d in spec.get("dimensions", ())]
+        taken = {name for name, _ in self.params}
+        self.unsupported = [(name, widgets[name][1].get("default")) for name in all_params
+                            if name not in taken and widgets.get(name, _NO_WIDGET)[2]]
+
+    # -- validation -------------------------------------------------------
+
+    def _check_value(self, name, rule, value):
+        if value is None:
+            return
+        if rule["choices"] is not None and value not in rule["choices"]:
+            raise ValueError(f"{self.key}: {name} must be one of {rule['choices']}. Got {value!r}.")
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            low, high = rule.get("min"), rule.get("max")
+            if (low is not None and value < low) or (high is not None and value > high):
+                raise ValueError(f"{self.key}: {name} must be between {low} and {high}. Got {value}.")
+            step = rule.get("multiple_of")
+            if step and value % step != 0:
+                raise ValueError(f"{self.key}: {name} must be a multiple of {step}. Got {value}.")
+        if isinstance(value, str) and rule.get("max_chars") and len(value) > rule["max_chars"]:
+            raise ValueError(f"{_label(name)} must not exceed {rule['max_chars']:,} characters")
+
+    def validate(self, prompt=None, params=None, images=None):
+        """Raise ValueError for anything this model can't take; returns the image count per slot."""
+        params = params or {}
+        images = images or {}
+        counts = {slot: _count(images.get(slot)) for slot, _ in self.slots}
+
+        if self.prompt is not None:
+            text = prompt or ""
+            limit = self.prompt["max_chars"]
+            if limit and len(text) > limit:
+                raise ValueError(f"Prompt must not exceed {limit:,} characters")
+            required = self.prompt["required"]
+            if required == "unless_images":
+                if not text.strip() and not any(counts.values()):
+                    raise ValueError(f"{self.key}: a prompt or at least one reference image is required.")
+            elif required and not text.strip():
+                raise ValueError("Prompt must be a non-empty string")
+
+        for name, rule in self.params:
+            self._check_value(name, rule, params.get(name))
+
+        if self.dimensions:
+            size = (params.get("width"), params.get("height"))
+            if size not in self.dimensions and size[::-1] not in self.dimensions:
+                raise ValueError(f"Dimensions {size[0]}x{size[1]} not allowed. Must be one of: {self.dimensions}")
+
+        for slot, rule in self.slots:
+            count = counts[slot]
+            if count < rule["min"]:
+                needed = "an input image" if rule["min"] == 1 else f"at least {rule['min']} input images"
+                raise ValueError(f"{self.key} requires {needed} ({slot})")
+            if rule["max"] is not None and count > rule["max"]:
+                raise ValueError(f"{self.key} accepts at most {rule['max']} image(s) in {slot}. Got {count}.")
+        declared = {slot for slot, _ in self.slots}
+        for slot, given in images.items():
+            if slot not in declared and _count(given):
+                print(f"⚠️ {self.key}: {slot} is not used by this model, ignoring")
+
+        for name, default in self.unsupported:
+            value = params.get(name)
+            if value is not None and value != default:
+                print(f"⚠️ {self.key}: '{name}' is not supported by this model, ignoring")
+        return counts
+
+    # -- payload ----------------------------------------------------------
+
+    def build(self, prompt=None, params=None, images=None, encode=None):
+        """Validate, then encode the images and assemble the request payload."""
+        params = params or {}
+        images = images or {}
+        counts = self.validate(prompt, params, images)
+        has_images = any(counts.values())
+
+        payload = {"model": self.model}
+        if self.prompt is not None:
+            payload[self.prompt["field"]] = prompt
+
+        for slot, rule in self.slots:
+            given = images.get(slot)
+            if not counts[slot]:
+                continue
+            if isinstance(given, (list, tuple)):
+                value = list(given)
+                print(f"🟢 {self.key}: Using {len(value)} input image(s)")
+                if rule["collapse"] and len(value) == 1:
+                    value = value[0]
+            else:
+                value = encode(given) if encode is not None else given
+            payload[rule["field"]] = value
+
+        for name, rule in self.params:
+            value = params.get(name)
+            send = rule["send"]
+            if send == IF_SET and not _is_set(value):
+                continue
+            if send == UNLESS_DEFAULT and value == rule["default"]:
+                continue
+            if send == WITH_IMAGES and not counts.get(rule.get("slot")):
+                continue
+            if value in rule.get("needs_images", ()) and not has_images:
+                print(f"⚠️ {self.key}: '{value}' requires at least one input image, skipping {name}")
+                continue
+            if "clamp" in rule:
+                low, high = rule["clamp"]
+                value = value if low is None else max(low, value)
+                value = value if high is None else min(high, value)
+            payload[rule["field"]] = value
+        return payload
+
+
+def _compile(cls):
+    table = cls.CAPABILITIES
+    widgets = _widgets(cls)
+    all_params = []
+    for spec in table.models.values():
+        for name in spec.get("params", {}):
+            if name not in all_params and name not in table.common:
+                all_params.append(name)
+    return {key: Capability(key, spec, table, widgets, all_params) for key, spec in table.models.items()}
+
+
+def for_node(node, model):
+    """The compiled Capability of `model` for a node (instance or class)."""
+    cls = node if isinstance(node, type) else type(node)
+    compiled = _compiled.get(cls)
+    if compiled is None:
+        with _compile_lock:
+            compiled = _compiled.get(cls)
+            if compiled is None:
+                compiled = _compiled[cls] = _compile(cls)
+    capability = compiled.get(model)
+    if capability is None:
+        raise ValueError(f"Invalid model choice: {model}.")
+    return capability
+
+
+__all__ = ["Table", "Capability", "for_node", "ALWAYS", "IF_SET", "UNLESS_DEFAULT", "WITH_IMAGES"]
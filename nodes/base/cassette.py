@@ -0,0 +1,282 @@
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from . import metrics
+from .job_journal import STATE_DIR
+from .timings import SECRET_MARKERS
+
+
+# Record/replay of real provider traffic through the shared transport.
+#
+#   LEON_CASSETTE_MODE=record   every request/response pair (with ttfb and total
+#                               latency) is appended to <dir>/<name>.jsonl
+#   LEON_CASSETTE_MODE=replay   requests are answered from the cassette, after
+#                               sleeping the recorded latencies (x LEON_CASSETTE_SPEED)
+#
+# Secrets in headers, query strings and JSON/form/multipart fields are scrubbed
+# before anything touches disk. Base64 runs and binary bodies are stored once
+# under <dir>/blobs/<sha256> and referenced as "leon-blob:<sha256>", so a
+# cassette of image generations stays small and diffable.
+#
+# Replay matches on method + scrubbed URL + scrubbed body; repeated identical
+# requests (e.g. MJ task polling) get the recorded responses in order and the
+# last one once exhausted. Requests with no exact match fall back to the
+# recordings for the same endpoint, in order.
+
+MODE = os.environ.get("LEON_CASSETTE_MODE", "").strip().lower()
+NAME = os.environ.get("LEON_CASSETTE", "default")
+CASSETTE_DIR = os.environ.get("LEON_CASSETTE_DIR", os.path.join(STATE_DIR, "cassettes"))
+SPEED = float(os.environ.get("LEON_CASSETTE_SPEED", "1.0"))
+BLOB_MIN_CHARS = 4096
+
+SCRUBBED = "<scrubbed>"
+_BLOB_RUN = re.compile(r"[A-Za-z0-9+/=_-]{%d,}" % BLOB_MIN_CHARS)
+_BLOB_REF = re.compile(r"leon-blob:([0-9a-f]{64})")
+_SECRET_NAME = "|".join(SECRET_MARKERS)
+_JSON_SECRET = re.compile(r'("[^"]*(?:%s)[^"]*"\s*:\s*)"(?:[^"\\]|\\.)*"' % _SECRET_NAME, re.IGNORECASE)
+_MULTIPART_SECRET = re.compile(
+    r'(name="[^"]*(?:%s)[^"]*"\r\n(?:[^\r\n]+\r\n)*\r\n)[^\r]*' % _SECRET_NAME, re.IGNORECASE
+)
+_REQUEST_ARGS = ("headers", "files", "data", "params", "auth", "cookies", "json")
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Replay found no recorded interaction for a request."""
+
+
+def _is_secret(name):
+    return any(marker in name.lower() for marker in SECRET_MARKERS)
+
+
+def scrub_url(url):
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(k, SCRUBBED if _is_secret(k) else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query, safe="<>"), parts.fragment))
+
+
+def scrub_headers(headers):
+    return {k: (SCRUBBED if _is_secret(k) else v) for k, v in headers.items()}
+
+
+class _BlobStore:
+    def __init__(self, root):
+        self.root = root
+
+    def put(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.root, digest)
+        if not os.path.exists(path):
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest):
+        with open(os.path.join(self.root, digest), "rb") as f:
+            return f.read()
+
+
+def _body_bytes(body):
+    if body is None:
+        return b""
+    return body.encode("utf-8") if isinstance(body, str) else bytes(body)
+
+
+def _normalize_body(body, content_type):
+    """Scrubbed request body with the multipart boundary fixed, so it can be stored and matched."""
+    data = _body_bytes(body)
+    boundary = re.search(r"boundary=([^;\s]+)", content_type or "")
+    if boundary:
+        data = data.replace(boundary.group(1).encode("latin-1"), b"leon-boundary")
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None, data
+    if "json" in (content_type or ""):
+        text = _JSON_SECRET.sub(lambda m: f'{m.group(1)}"{SCRUBBED}"', text)
+    elif "x-www-form-urlencoded" in (content_type or ""):
+        text = urlencode([(k, SCRUBBED if _is_secret(k) else v)
+                          for k, v in parse_qsl(text, keep_blank_values=True)], safe="<>")
+    elif boundary:
+        text = _MULTIPART_SECRET.sub(lambda m: m.group(1) + SCRUBBED, text)
+    return text, None
+
+
+class Cassette:
+    def __init__(self, path):
+        self.path = path
+        self.blobs = _BlobStore(os.path.join(os.path.dirname(path), "blobs"))
+        self._lock = threading.Lock()
+        self._by_key = None
+        self._by_endpoint = None
+        self._served = collections.Counter()
+
+    # -- storage helpers -------------------------------------------------
+
+    def _externalize(self, text):
+        return _BLOB_RUN.sub(lambda m: "leon-blob:" + self.blobs.put(m.group(0).encode("ascii")), text)
+
+    def _internalize(self, text):
+        return _BLOB_REF.sub(lambda m: self.blobs.get(m.group(1)).decode("ascii"), text)
+
+    def _store_body(self, text, raw):
+        if text is None:
+            return {"body_blob": self.blobs.put(raw)} if raw else {"body": ""}
+        return {"body": self._externalize(text)}
+
+    def _load_body(self, entry):
+        if "body_blob" in entry:
+            return self.blobs.get(entry["body_blob"])
+        return self._internalize(entry.get("body", "")).encode("utf-8")
+
+    @staticmethod
+    def match_key(method, url, body_text, body_raw):
+        digest = hashlib.sha256()
+        digest.update(f"{method.upper()} {url}\n".encode("utf-8"))
+        digest.update(body_text.encode("utf-8") if body_text is not None else body_raw)
+        return digest.hexdigest()
+
+    def _describe_request(self, prepared):
+        url = scrub_url(prepared.url)
+        text, raw = _normalize_body(prepared.body, prepared.headers.get("Content-Type", ""))
+        # Blob-substitute before hashing so matching sees exactly what is stored.
+        text = self._externalize(text) if text is not None else None
+        return url, text, raw
+
+    # -- recording ---------------------------------------------------------
+
+    def record(self, response, ttfb, total):
+        prepared = response.request
+        url, text, raw = self._describe_request(prepared)
+        try:
+            response_text, response_raw = response.content.decode("utf-8"), None
+        except UnicodeDecodeError:
+            response_text, response_raw = None, response.content
+        entry = {
+            "recorded_at": time.time(),
+            "key": self.match_key(prepared.method, url, text, raw),
+            "endpoint": f"{prepared.method.upper()} {urlunsplit(urlsplit(url)[:3] + ('', ''))}",
+            "request": {
+                "method": prepared.method, "url": url, "headers": scrub_headers(prepared.headers),
+                **({"body": text} if text is not None else self._store_body(None, raw)),
+            },
+            "response": {
+                "status": response.status_code, "reason": response.reason,
+                "headers": scrub_headers(response.headers),
+                **self._store_body(response_text, response_raw),
+            },
+            "ttfb": ttfb,
+            "total": total,
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            if self._by_key is not None:
+                self._index(entry)
+
+    # -- replay --------------------------------------------------------------
+
+    def _index(self, entry):
+        self._by_key.setdefault(entry["key"], []).append(entry)
+        self._by_endpoint.setdefault(entry["endpoint"], []).append(entry)
+
+    def _load(self):
+        if self._by_key is not None:
+            return
+        self._by_key, self._by_endpoint = {}, {}
+        if not os.path.exists(self.path):
+            print(f"Leon cassette: {self.path} does not exist; every request will miss")
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        self._index(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+
+    def _next(self, table, key):
+        entries = table.get(key)
+        if not entries:
+            return None
+        served = (id(table), key)
+        index = self._served[served]
+        self._served[served] += 1
+        return entries[min(index, len(entries) - 1)]
+
+    def find(self, prepared):
+        url, text, raw = self._describe_request(prepared)
+        key = self.match_key(prepared.method, url, text, raw)
+        endpoint = f"{prepared.method.upper()} {urlunsplit(urlsplit(url)[:3] + ('', ''))}"
+        with self._lock:
+            self._load()
+            entry = self._next(self._by_key, key) or self._next(self._by_endpoint, endpoint)
+        if entry is None:
+            metrics.inc("leon_cache_misses_total", cache="cassette")
+            raise CassetteMiss(f"No recorded interaction for {endpoint} in {self.path}")
+        metrics.inc("leon_cache_hits_total", cache="cassette")
+        return entry
+
+    def replay(self, session, method, url, kwargs, sleep):
+        """Build the recorded response for a request; `sleep` waits out the recorded latency."""
+        prepared = session.prepare_request(
+            requests.Request(method, url, **{k: v for k, v in kwargs.items() if k in _REQUEST_ARGS})
+        )
+        entry = self.find(prepared)
+        recorded = entry["response"]
+        sleep(entry.get("ttfb", 0.0) * SPEED)
+        response = requests.Response()
+        response.status_code = recorded["status"]
+        response.reason = recorded.get("reason", "")
+        response.headers = CaseInsensitiveDict(recorded.get("headers", {}))
+        response.url = url
+        response.request = prepared
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response._content = self._load_body(recorded)
+        response._content_consumed = True
+        return response, max(0.0, entry.get("total", 0.0) - entry.get("ttfb", 0.0)) * SPEED
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def current():
+    """The cassette selected by LEON_CASSETTE, or None when record/replay is off."""
+    if MODE not in ("record", "replay"):
+        return None
+    with _cassettes_lock:
+        if NAME not in _cassettes:
+            _cassettes[NAME] = Cassette(os.path.join(CASSETTE_DIR, f"{NAME}.jsonl"))
+        return _cassettes[NAME]
+
+
+def use(mode, name=None, speed=None):
+    """Switch record/replay at runtime (benchmarks, scripts): mode is "record", "replay" or ""."""
+    global MODE, NAME, SPEED
+    MODE = (mode or "").strip().lower()
+    NAME = name or NAME
+    if speed is not None:
+        SPEED = float(speed)
+
+
+if MODE and MODE not in ("record", "replay"):
+    print(f"Leon cassette: ignoring unknown LEON_CASSETTE_MODE={MODE!r} (expected record or replay)")
+
+
+__all__ = ["Cassette", "CassetteMiss", "current", "use", "scrub_url", "scrub_headers"]
@@ -0,0 +1,162 @@
+import collections
+import os
+import threading
+import time
+
+from . import metrics
+
+
+# Circuit breakers for the shared transport, one per (endpoint, model).
+#
+#   closed    -> calls flow normally; consecutive failures are counted
+#   open      -> calls fail fast with CircuitOpenError until reset_timeout passes
+#   half_open -> exactly one probe call is let through; success closes the
+#                circuit again, failure re-opens it for another reset_timeout
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+FAILURE_THRESHOLD = int(os.environ.get("LEON_BREAKER_FAILURES", "5"))
+RESET_TIMEOUT_SECONDS = float(os.environ.get("LEON_BREAKER_RESET_SECONDS", "60"))
+# Upper bound on tracked breakers; idle healthy ones are evicted first.
+MAX_BREAKERS = int(os.environ.get("LEON_BREAKER_MAX", "256"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of issuing a request while a circuit is open."""
+
+    def __init__(self, endpoint, model, retry_after):
+        self.endpoint = endpoint
+        self.model = model
+        self.retry_after = retry_after
+        target = f"{endpoint} ({model})" if model else endpoint
+        super().__init__(
+            f"Circuit open for {target}: upstream failed repeatedly, "
+            f"failing fast for another {retry_after:.0f}s instead of retrying."
+        )
+
+
+class CircuitBreaker:
+    def __init__(self, endpoint, model="", failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT_SECONDS):
+        self.endpoint = endpoint
+        self.model = model
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error = ""
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def before_call(self):
+        """Admit or reject a call. Raises CircuitOpenError when rejected."""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self._state == OPEN and remaining <= 0:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                print(f"Leon circuit: probing {self.endpoint} ({self.model or '-'})")
+                return
+            raise CircuitOpenError(self.endpoint, self.model, max(remaining, 0.0))
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                print(f"Leon circuit: {self.endpoint} ({self.model or '-'}) recovered, closing circuit")
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error=""):
+        with self._lock:
+            self._last_error = str(error)[:200]
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    print(f"Leon circuit: opening circuit for {self.endpoint} ({self.model or '-'}) after {self._failures} failure(s)")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """Let another probe through after a call ended without a verdict."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    @property
+    def idle(self):
+        """Closed with no failures counted: dropping it loses nothing."""
+        with self._lock:
+            return self._state == CLOSED and self._failures == 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "endpoint": self.endpoint,
+                "model": self.model,
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "last_error": self._last_error,
+            }
+
+
+_registry_lock = threading.Lock()
+_breakers = collections.OrderedDict()  # least recently used first
+
+
+def get_breaker(endpoint, model=""):
+    key = (endpoint, model or "")
+    with _registry_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(endpoint, model or "")
+            _breakers[key] = breaker
+            _evict()
+        else:
+            _breakers.move_to_end(key)
+        return breaker
+
+
+def _evict():
+    # Call with _registry_lock held. Breakers that are tripped or counting
+    # failures are kept even past the limit; they are the ones doing work.
+    excess = len(_breakers) - MAX_BREAKERS
+    if excess <= 0:
+        return
+    for key in [key for key, breaker in _breakers.items() if breaker.idle][:excess]:
+        del _breakers[key]
+
+
+def breaker_snapshots():
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return [b.snapshot() for b in breakers]
+
+
+def _collect_breaker_states():
+    return [
+        ("leon_circuit_state", STATE_VALUES[snap["state"]], {"endpoint": snap["endpoint"], "model": snap["model"]})
+        for snap in breaker_snapshots()
+    ]
+
+
+metrics.register_collector(_collect_breaker_states)
+
+
+__all__ = [
+    "CircuitBreaker", "CircuitOpenError", "get_breaker", "breaker_snapshots",
+    "CLOSED", "OPEN", "HALF_OPEN",
+]
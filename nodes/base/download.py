@@ -0,0 +1,311 @@
+import concurrent.futures
+import contextvars
+import io
+import os
+import re
+import threading
+
+from PIL import Image
+
+from . import cassette, interrupt, metrics, timings, transport
+
+
+# Streaming image downloads.
+#
+# A provider's CDN URL used to be read completely (a list of chunks joined into
+# one bytes object) and only then decoded. Instead, chunks are copied once into
+# a pooled buffer as they arrive, and a decode thread reads the image from that
+# buffer through a file object that blocks until the bytes it needs are there.
+# PNG and JPEG decoding therefore overlaps the transfer and the image is ready
+# shortly after the last byte; formats PIL reads in one go (WebP) start when
+# the download ends, as before.
+#
+# With LEON_DOWNLOAD_RANGES > 1 the first request asks for the first
+# LEON_DOWNLOAD_RANGE_BYTES only. If the server answers 206 and the file is
+# larger, the rest is fetched with up to that many parallel Range requests
+# straight into the same buffer while the decoder works through the first part.
+# Servers without Range support send the whole file with a 200, which is used
+# as is.
+
+STREAM_DECODE = os.environ.get("LEON_STREAM_DECODE", "1") != "0"
+PARALLEL_RANGES = max(1, int(os.environ.get("LEON_DOWNLOAD_RANGES", "1")))
+RANGE_BYTES = max(64 * 1024, int(os.environ.get("LEON_DOWNLOAD_RANGE_BYTES", str(4 * 1024 * 1024))))
+# Buffers up to this size go back to the pool for the next download; larger ones are dropped.
+KEEP_BUFFER_BYTES = int(os.environ.get("LEON_DOWNLOAD_KEEP_BUFFER_BYTES", str(64 * 1024 * 1024)))
+POOL_SIZE = 4
+# Starting buffer size when the length isn't known yet.
+INITIAL_BUFFER_BYTES = 1024 * 1024
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+# Decoders block until their bytes arrive, so range fetches get a pool of
+# their own: with one shared pool, enough concurrent downloads would fill it
+# with waiting decoders and the fetches they wait for would never start.
+_decoders = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="leon-decode-stream")
+_fetchers = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="leon-download")
+
+
+class _BufferPool:
+    """A few bytearrays reused across downloads instead of allocating one per image."""
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._free = []
+
+    def acquire(self, capacity):
+        with self._lock:
+            fitting = [buf for buf in self._free if len(buf) >= capacity]
+            buf = min(fitting, key=len) if fitting else (max(self._free, key=len) if self._free else None)
+            if buf is not None:
+                self._free.remove(buf)
+        metrics.inc("leon_download_buffers_total", reused="yes" if buf is not None else "no")
+        if buf is None:
+            return bytearray(capacity)
+        if len(buf) < capacity:
+            buf.extend(bytes(capacity - len(buf)))
+        return buf
+
+    def release(self, buf):
+        if len(buf) > KEEP_BUFFER_BYTES:
+            return
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(buf)
+
+
+pool = _BufferPool()
+
+
+class _Buffer:
+    """
+    One download's bytes at their offsets, in a pooled bytearray. Segments
+    (one per request) record how far they have been filled; readers wait on
+    `ready` for the contiguous prefix to grow.
+    """
+
+    def __init__(self, capacity):
+        self.data = pool.acquire(max(capacity, 1))
+        self.ready = threading.Condition()
+        self.segments = {}  # start -> [received, end or None]
+        self.total = None
+        self.done = False
+        self.error = None
+
+    def ensure(self, size):
+        with self.ready:
+            if size > len(self.data):
+                self.data.extend(bytes(max(size, len(self.data) * 2) - len(self.data)))
+
+    def plan(self, start, end=None):
+        with self.ready:
+            self.segments[start] = [0, end]
+
+    def put(self, start, chunk):
+        with self.ready:
+            segment = self.segments[start]
+            offset = start + segment[0]
+            end = offset + len(chunk)
+            if end > len(self.data):
+                self.data.extend(bytes(max(end, len(self.data) * 2) - len(self.data)))
+            self.data[offset:end] = chunk
+            segment[0] += len(chunk)
+            self.ready.notify_all()
+
+    def contiguous(self):
+        """Length of the prefix that has fully arrived (call with `ready` held)."""
+        position = 0
+        while position in self.segments:
+            received, end = self.segments[position]
+            if end is None or received < end - position + 1:
+                return position + received
+            position = end + 1
+        return position
+
+    def finish(self, error=None):
+        with self.ready:
+            self.done = True
+            self.error = error
+            self.ready.notify_all()
+
+    def release(self):
+        pool.release(self.data)
+        self.data = None
+
+
+class _Reader(io.RawIOBase):
+    """Read-only file over a _Buffer that blocks until the requested bytes have arrived."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def _wait(self, needed):
+        buffer = self.buffer
+        with buffer.ready:
+            while True:
+                available = buffer.contiguous()
+                if needed is not None and available >= needed:
+                    return available
+                if buffer.done:
+                    if buffer.error is not None:
+                        raise IOError(f"download failed: {buffer.error}")
+                    return available
+                buffer.ready.wait()
+
+    def readinto(self, target):
+        available = self._wait(self.position + len(target))
+        count = max(0, min(len(target), available - self.position))
+        with self.buffer.ready:
+            target[:count] = self.buffer.data[self.position:self.position + count]
+        self.position += count
+        return count
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            available = self._wait(None)
+        else:
+            available = self._wait(self.position + size)
+            available = min(available, self.position + size)
+        with self.buffer.ready:
+            data = bytes(self.buffer.data[self.position:available])
+        self.position = max(self.position, available)
+        return data
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self._wait(None)
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+
+class _Sink:
+    """transport sink writing a response body into its segment of the buffer."""
+
+    def __init__(self, buffer, offset=0):
+        self.buffer = buffer
+        self.offset = offset
+        self.status = None
+        self.total = None
+
+    def start(self, response):
+        self.status = response.status_code
+        if self.status == 206:
+            match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if match is None or int(match.group(1)) != self.offset:
+                return False
+            if match.group(3) != "*":
+                self.total = int(match.group(3))
+                self.buffer.ensure(self.total)
+            self.buffer.plan(self.offset, int(match.group(2)))
+            return True
+        if self.status != 200 or self.offset:
+            return False
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and not response.headers.get("Content-Encoding"):
+            self.total = int(length)
+            self.buffer.ensure(self.total)
+        self.buffer.plan(self.offset)
+        return True
+
+    def write(self, chunk):
+        self.buffer.put(self.offset, chunk)
+
+    @property
+    def received(self):
+        with self.buffer.ready:
+            segment = self.buffer.segments.get(self.offset)
+            return segment[0] if segment else 0
+
+    def getvalue(self):
+        # Only needed when a cassette records the response.
+        with self.buffer.ready:
+            return bytes(self.buffer.data[self.offset:self.offset + self.received])
+
+
+def _wait(future):
+    while True:
+        try:
+            return future.result(timeout=interrupt.CHECK_INTERVAL)
+        except concurrent.futures.TimeoutError:
+            interrupt.check()
+
+
+def _submit(pool, fn, *args):
+    # In a copy of the caller's context so timings land on its call.
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _fetch_range(url, buffer, start, end):
+    sink = _Sink(buffer, offset=start)
+    response = transport.get(url, headers={"Range": f"bytes={start}-{end}"}, sink=sink)
+    if sink.status != 206 or sink.received != end - start + 1:
+        raise Exception(f"Range {start}-{end} of {url} failed, status: {response.status_code}")
+
+
+def _fetch_rest(url, buffer, first_end, total):
+    """Fetch bytes after first_end with up to PARALLEL_RANGES concurrent Range requests."""
+    start = first_end + 1
+    segment = max(RANGE_BYTES, -(-(total - start) // PARALLEL_RANGES))
+    futures = []
+    while start < total:
+        end = min(start + segment, total) - 1
+        futures.append(_submit(_fetchers, _fetch_range, url, buffer, start, end))
+        start = end + 1
+    metrics.inc("leon_download_ranges_total", len(futures))
+    try:
+        for future in futures:
+            _wait(future)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def _decode(buffer):
+    with timings.stage("stream_decode"):
+        image = Image.open(_Reader(buffer))
+        image.load()
+    return image
+
+
+def fetch_image(url):
+    """Download an image URL and return it as a loaded PIL image."""
+    ranged = PARALLEL_RANGES > 1 and cassette.current() is None
+    buffer = _Buffer(RANGE_BYTES if ranged else INITIAL_BUFFER_BYTES)
+    decoding = _submit(_decoders, _decode, buffer) if STREAM_DECODE else None
+    try:
+        try:
+            sink = _Sink(buffer)
+            headers = {"Range": f"bytes=0-{RANGE_BYTES - 1}"} if ranged else None
+            response = transport.get(url, headers=headers, sink=sink)
+            if sink.status not in (200, 206) or response.status_code not in (200, 206):
+                raise Exception(f"Failed to download the image from {url}, status: {response.status_code}")
+            if sink.status == 206 and sink.total and sink.total > sink.received:
+                _fetch_rest(url, buffer, sink.received - 1, sink.total)
+        except BaseException as e:
+            buffer.finish(error=e)
+            if decoding is not None:
+                # Let the decode thread see the failure before the buffer goes back to the pool.
+                concurrent.futures.wait([decoding])
+            raise
+        buffer.finish()
+        return _wait(decoding) if decoding is not None else _decode(buffer)
+    finally:
+        if decoding is not None and not decoding.done():
+            concurrent.futures.wait([decoding])
+        buffer.release()
+
+
+__all__ = ["fetch_image", "pool", "STREAM_DECODE", "PARALLEL_RANGES", "RANGE_BYTES"]
@@ -0,0 +1,153 @@
+import base64
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from . import log, metrics, timings
+
+
+# Outbound image encoding.
+#
+# Every tensor sent to a provider is encoded under a Policy: PNG with a zlib
+# compress level, JPEG or WebP with a quality, or "auto", which keeps PNG for
+# images with transparency or few colours (masks, graphics, screenshots) and
+# uses JPEG for photographic content. A policy can also cap the longest side,
+# for providers that downsample large inputs anyway.
+#
+# Policies are named after the provider (or node family) they apply to, and
+# each node module asks for its own with a built-in default:
+#   hyprlab png:6, google png:6, llm auto:90, midjourney jpeg:95, array png:6
+# A spec string "<format>[:<level|quality>][,max=<px>]" in LEON_ENCODE_<NAME>
+# replaces one of them; LEON_ENCODE replaces all that have no variable of
+# their own. E.g. LEON_ENCODE_LLM="jpeg:85,max=1568".
+#
+# Images with transparency are never sent as JPEG; they fall back to PNG.
+# Encode time goes to the call's image_encode stage, and bytes and seconds
+# go to the leon_image_encode_* metrics.
+
+FORMATS = ("png", "jpeg", "webp", "auto")
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+# "auto" treats images with at most this many colours (on a 64px thumbnail) as graphics.
+AUTO_MAX_GRAPHIC_COLORS = 256
+
+logger = log.get_logger("encoding")
+
+
+class Policy:
+    """How one provider's outbound images are encoded."""
+
+    __slots__ = ("format", "quality", "compress_level", "max_side")
+
+    def __init__(self, format="png", quality=90, compress_level=6, max_side=0):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown image encoding {format!r}, expected one of {', '.join(FORMATS)}")
+        self.format = format
+        self.quality = quality
+        self.compress_level = compress_level
+        self.max_side = max_side
+
+    @classmethod
+    def parse(cls, spec):
+        """A Policy from "<format>[:<level|quality>][,max=<px>]"."""
+        head, *options = [part.strip() for part in spec.lower().split(",")]
+        name, _, number = head.partition(":")
+        name = {"jpg": "jpeg"}.get(name, name)
+        policy = cls(name)
+        if number:
+            if name == "png":
+                policy.compress_level = min(9, max(0, int(number)))
+            else:
+                policy.quality = min(100, max(1, int(number)))
+        for option in options:
+            key, _, value = option.partition("=")
+            if key == "max":
+                policy.max_side = int(value)
+            else:
+                raise ValueError(f"Unknown image encoding option {option!r} in {spec!r}")
+        return policy
+
+    def __repr__(self):
+        level = self.compress_level if self.format == "png" else self.quality
+        return f"{self.format}:{level}" + (f",max={self.max_side}" if self.max_side else "")
+
+
+def profile(name, default):
+    """The policy named `name`: LEON_ENCODE_<NAME>, else LEON_ENCODE, else `default`."""
+    spec = os.environ.get(f"LEON_ENCODE_{name.upper()}") or os.environ.get("LEON_ENCODE") or default
+    try:
+        return Policy.parse(spec)
+    except ValueError as e:
+        logger.warning("Leon image encoding: %s; using %s for %s", e, default, name)
+        return Policy.parse(default)
+
+
+def tensor_to_pil(tensor_image):
+    """The first image of a ComfyUI IMAGE tensor as an RGB(A) PIL image."""
+    if tensor_image.ndim == 4:
+        tensor_image = tensor_image[0]
+    np_image = (tensor_image.cpu().numpy() * 255).astype(np.uint8)
+    return Image.fromarray(np_image, "RGBA" if np_image.shape[-1] == 4 else "RGB")
+
+
+def _transparent(pil_image):
+    return pil_image.mode == "RGBA" and pil_image.getchannel("A").getextrema()[0] < 255
+
+
+def _choose(pil_image, policy):
+    if _transparent(pil_image):
+        return "webp" if policy.format == "webp" else "png"
+    if policy.format != "auto":
+        return policy.format
+    thumbnail = pil_image.convert("RGB").resize((64, 64), Image.Resampling.NEAREST)
+    graphic = thumbnail.getcolors(maxcolors=AUTO_MAX_GRAPHIC_COLORS) is not None
+    return "png" if graphic else "jpeg"
+
+
+def encode_pil(pil_image, policy):
+    """(bytes, mime type) of a PIL image under `policy`."""
+    start = time.perf_counter()
+    with timings.stage("image_encode"):
+        if policy.max_side and max(pil_image.size) > policy.max_side:
+            scale = policy.max_side / max(pil_image.size)
+            size = (max(1, round(pil_image.width * scale)), max(1, round(pil_image.height * scale)))
+            pil_image = pil_image.resize(size, Image.Resampling.LANCZOS)
+        fmt = _choose(pil_image, policy)
+        buffer = io.BytesIO()
+        if fmt == "png":
+            pil_image.save(buffer, format="PNG", compress_level=policy.compress_level)
+        elif fmt == "jpeg":
+            pil_image.convert("RGB").save(buffer, format="JPEG", quality=policy.quality)
+        else:
+            pil_image.save(buffer, format="WEBP", quality=policy.quality)
+        data = buffer.getvalue()
+    seconds = time.perf_counter() - start
+    metrics.inc("leon_image_encode_bytes_total", len(data), format=fmt)
+    metrics.observe("leon_image_encode_seconds", seconds, format=fmt)
+    logger.debug("Encoded %dx%d image as %s (%s): %d bytes in %.0f ms",
+                 pil_image.width, pil_image.height, fmt, policy, len(data), seconds * 1000)
+    return data, MIME_TYPES[fmt]
+
+
+def encode(tensor_image, policy):
+    """(bytes, mime type) of the first image of an IMAGE tensor under `policy`."""
+    return encode_pil(tensor_to_pil(tensor_image), policy)
+
+
+def to_base64(tensor_image, policy):
+    """(base64 string, mime type) of an IMAGE tensor, or (None, None) for no image."""
+    if tensor_image is None:
+        return None, None
+    data, mime = encode(tensor_image, policy)
+    return base64.b64encode(data).decode("utf-8"), mime
+
+
+def to_data_uri(tensor_image, policy):
+    """A data:<mime>;base64,... URI of an IMAGE tensor, or None for no image."""
+    b64_data, mime = to_base64(tensor_image, policy)
+    return None if b64_data is None else f"data:{mime};base64,{b64_data}"
+
+
+__all__ = ["Policy", "profile", "encode", "encode_pil", "tensor_to_pil", "to_base64", "to_data_uri", "FORMATS"]
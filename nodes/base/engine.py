@@ -0,0 +1,628 @@
+import base64
+import concurrent.futures
+import contextvars
+import io
+import json
+import os
+import time
+
+import numpy as np
+import requests
+import tenacity
+import torch
+from PIL import Image
+
+from . import download, idempotency, interrupt, job_journal, log, polling, timings, transport
+from . import response_format as formats
+from .circuit_breaker import CircuitOpenError
+from .interrupt import InterruptProcessingException
+
+
+# One request -> parse -> decode path for every image provider.
+#
+# A node used to carry its own copy of this (HyprLab, Stable Diffusion, the
+# official Google nodes, Midjourney). Now it picks a request adapter, which
+# addresses, authenticates and submits a call and returns the provider's JSON,
+# and a response parser, which finds the image (inline base64 or a URL) and any
+# text in that JSON. ImageEngine does the rest the same way for everyone:
+# idempotency keys and the response journal, retries, download and the
+# RGBA tensor conversion.
+#
+#   engine = ImageEngine(BearerJSON(), OpenAIImages(), logger)
+#   tensor, parsed = engine.generate(payload, api_url, api_key, model=...,
+#                                    response_format="b64_json", output_format="png")
+#
+# Adapters: BearerJSON (OpenAI-style JSON POST), BearerMultipart (form upload),
+# GoogleGenerateContent (native Gemini REST), MJProxyTask (Midjourney proxy
+# submit + poll). Parsers: OpenAIImages (`data[0]`), GoogleParts
+# (`candidates[0].content.parts[]`), MJTask (the finished task).
+
+RETRY_ATTEMPTS = 5
+
+# Stages spent before the first byte of a response arrives; what is left of an
+# attempt after them is delivery (download + decode), see response_format.py.
+_WAITING_STAGES = ("queue_wait", "connect", "upload", "ttfb")
+
+
+class RequestRejected(Exception):
+    """The provider refused the request itself (e.g. HTTP 400); retrying won't help."""
+
+
+class BadResponse(Exception):
+    """The provider answered, but not with something we can use; retrying won't help."""
+
+
+class TaskTimedOut(Exception):
+    """An asynchronous task didn't finish within its polling budget; it may still complete upstream."""
+
+
+def sanitize_for_logging(obj):
+    """Truncate data URIs and other long strings so payloads stay readable in logs."""
+    if isinstance(obj, dict):
+        return {k: sanitize_for_logging(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [sanitize_for_logging(v) for v in obj]
+    elif isinstance(obj, str) and len(obj) > 200:
+        if obj.startswith("data:image") or len(obj) > 1000:
+            return obj[:50] + f"... [truncated {len(obj)} chars]"
+    return obj
+
+
+def _waiting(timing):
+    if timing is None:
+        return 0.0
+    with timing._lock:
+        return sum(timing.stages.get(name, 0.0) for name in _WAITING_STAGES)
+
+
+def _retrying(attempts, fn, *args, **kwargs):
+    if attempts <= 1:
+        return fn(*args, **kwargs)
+    return tenacity.Retrying(
+        wait=tenacity.wait_exponential(multiplier=1.25, min=5, max=30),
+        stop=tenacity.stop_after_attempt(attempts),
+        retry=tenacity.retry_if_not_exception_type(
+            (CircuitOpenError, InterruptProcessingException, RequestRejected, BadResponse, TaskTimedOut)
+        ),
+        sleep=interrupt.sleep,
+        before_sleep=timings.count_retry,
+    )(fn, *args, **kwargs)
+
+
+# -- decoding ---------------------------------------------------------------
+
+# Images of a batch are decoded and converted on a small shared pool (PIL's
+# decoders and NumPy's ufuncs release the GIL) straight into their slice of
+# one preallocated (N, H, W, 4) tensor.
+DECODE_WORKERS = max(1, int(os.environ.get("LEON_DECODE_WORKERS", str(min(4, os.cpu_count() or 1)))))
+
+_decode_pool = concurrent.futures.ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="leon-decode")
+
+
+def map_parallel(fn, items):
+    """fn(item) for every item on the decode pool, results in order."""
+    if len(items) <= 1 or DECODE_WORKERS == 1:
+        return [fn(item) for item in items]
+    futures = [_decode_pool.submit(fn, item) for item in items]
+    return [future.result() for future in futures]
+
+
+def _fill(pil_img, mode, out):
+    """Decode pil_img as `mode` into `out`, a float32 (H, W, C) array, scaled to [0, 1]."""
+    # PIL decodes lazily, so the convert (or asarray) is where the image is actually decoded.
+    pixels = np.asarray(pil_img if pil_img.mode == mode else pil_img.convert(mode))
+    np.divide(pixels.reshape(out.shape), np.float32(255.0), out=out, casting="unsafe")
+
+
+def pil_to_rgba_tensor(pil_img):
+    """A PIL image as a (1, H, W, 4) float tensor in [0, 1]."""
+    with timings.stage("image_decode"):
+        rgba = np.asarray(pil_img.convert("RGBA"))
+    with timings.stage("tensor_conversion"):
+        batch = torch.empty((1, rgba.shape[0], rgba.shape[1], 4), dtype=torch.float32)
+        np.divide(rgba, np.float32(255.0), out=batch[0].numpy(), casting="unsafe")
+        return batch
+
+
+def pil_images_to_batch(pil_images, mode="RGBA"):
+    """
+    Same-sized PIL images as one (N, H, W, C) float tensor in `mode`, decoded
+    and converted in parallel into slices of a single allocation.
+    """
+    if len(pil_images) == 1 and mode == "RGBA":
+        return pil_to_rgba_tensor(pil_images[0])
+    sizes = {img.size for img in pil_images}
+    if len(sizes) != 1:
+        raise ValueError(f"Cannot batch images of different sizes: {sorted(sizes)}")
+    width, height = sizes.pop()
+    batch = torch.empty((len(pil_images), height, width, Image.getmodebands(mode)), dtype=torch.float32)
+    out = batch.numpy()
+    with timings.stage("image_decode"):
+        map_parallel(lambda i: _fill(pil_images[i], mode, out[i]), range(len(pil_images)))
+    return batch
+
+
+def _open_image(parsed):
+    if parsed.data is None:
+        return download.fetch_image(parsed.url)
+    with timings.stage("b64_decode"):
+        img_bytes = base64.b64decode(parsed.data)
+    return Image.open(io.BytesIO(img_bytes))
+
+
+def load_image(parsed):
+    """Decode (or download while decoding) the image a parser found."""
+    return pil_to_rgba_tensor(_open_image(parsed))
+
+
+def load_images(parsed_images):
+    """Decode several images a parser found (n > 1, multi-part answers) into one batch tensor."""
+    if len(parsed_images) == 1:
+        return load_image(parsed_images[0])
+    # Downloads (and base64 decodes) run side by side; decoding proper happens in the batch.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(parsed_images), 8)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _open_image, parsed) for parsed in parsed_images]
+        pil_images = [future.result() for future in futures]
+    return pil_images_to_batch(pil_images)
+
+
+# -- request adapters -------------------------------------------------------
+# send(logger, payload, api_url, api_key, model, idempotency_key, **options)
+# returns the provider's JSON. `idempotent` adapters get a key and the
+# response journal; `attempts` is how often the engine tries a call.
+
+class BearerJSON:
+    """OpenAI-style JSON POST to api_url with a Bearer key (HyprLab images and chat, Stable Diffusion)."""
+
+    idempotent = True
+    attempts = RETRY_ATTEMPTS
+
+    def send(self, logger, payload, api_url, api_key, model, idempotency_key=None):
+        url = api_url.rstrip('/')
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+        if idempotency_key:
+            headers[idempotency.HEADER] = idempotency_key
+
+        response = transport.post(url, model=model, json=payload, headers=headers)
+
+        logger.info("API Request URL: %s", url)
+        logger.debug("API Request Payload: %s", log.Lazy(lambda: json.dumps(sanitize_for_logging(payload))))
+        logger.info("HTTP status: %s", response.status_code)
+        (logger.debug if response.ok else logger.warning)("Response: %s", log.Preview(response))
+
+        response.raise_for_status()
+        return response.json()
+
+
+class BearerMultipart:
+    """multipart/form-data POST with a Bearer key; `payload` is the list of form fields and files."""
+
+    idempotent = False
+    # File objects in the form are consumed by the first attempt.
+    attempts = 1
+
+    def send(self, logger, payload, api_url, api_key, model, idempotency_key=None):
+        headers = {"Authorization": f"Bearer {api_key}"}
+        response = transport.post(api_url, model=model, headers=headers, files=payload)
+
+        logger.info("API Request URL: %s", api_url)
+        logger.info("HTTP status: %s", response.status_code)
+        (logger.debug if response.ok else logger.warning)("Response: %s", log.Preview(response))
+
+        response.raise_for_status()
+        return response.json()
+
+
+class GoogleGenerateContent:
+    """Google's native generateContent endpoint, keyed by x-goog-api-key."""
+
+    idempotent = False
+    attempts = RETRY_ATTEMPTS
+
+    def __init__(self, label):
+        self.label = label
+
+    def send(self, logger, payload, api_url, api_key, model, idempotency_key=None):
+        url = f"{api_url.rstrip('/')}/models/{model}:generateContent"
+        headers = {
+            "Content-Type": "application/json",
+            "x-goog-api-key": api_key,
+        }
+
+        logger.info("🌐 %s – POST %s", self.label, url)
+        logger.debug("🌐 Payload: %s", log.Lazy(lambda: json.dumps(sanitize_for_logging(payload), indent=2)))
+
+        response = transport.post(url, model=model, json=payload, headers=headers)
+        logger.info("🌐 HTTP %s", response.status_code)
+
+        if not response.ok:
+            logger.warning("🌐 Error response body from Google API: %s", log.Preview(response))
+            if response.status_code == 400:
+                # A bad request payload; sending it again gets the same answer.
+                raise RequestRejected(f"Google API HTTP 400: {response.text}")
+
+        logger.debug("🌐 Response: %s", log.Preview(response))
+
+        response.raise_for_status()
+        return response.json()
+
+
+def _mj_headers_for_logging(headers):
+    return json.dumps({k: (v if k not in ['mj-api-secret', 'X-Api-Key'] else '***') for k, v in headers.items()})
+
+
+def reattach_mj_task(job_fp, mj_proxy_endpoint, headers, bot_type):
+    """
+    Return (task_id, submitted_at) of a journaled, still-unfinished task with the
+    same payload, so a node re-run after a ComfyUI restart resumes polling instead
+    of resubmitting. Tasks the proxy no longer knows about are marked finished and
+    ignored. Only tasks submitted before this process started are considered: one
+    submitted since then is either still being polled by its own node or has
+    timed out there, and an identical run now asks for a new task.
+    """
+    record = job_journal.journal.find_in_flight(job_fp, submitted_before=job_journal.STARTED_AT)
+    if not record:
+        return None, None
+    task_id = record["task_id"]
+    fetch_url = f"{mj_proxy_endpoint.rstrip('/')}/mj/task/{task_id}/fetch"
+    try:
+        response = transport.get(fetch_url, model=bot_type, endpoint=f"{mj_proxy_endpoint.rstrip('/')}/mj/task/fetch", headers=headers)
+        if response.status_code == 404 or not (response.ok and response.json()):
+            print(f"MJ Proxy: Journaled task {task_id} is unknown to the proxy, submitting a new one")
+            job_journal.journal.record_finished(job_fp, "LOST")
+            return None, None
+    except (CircuitOpenError, InterruptProcessingException):
+        raise
+    except Exception as e:
+        # Proxy unreachable right now; the polling loop will keep retrying.
+        print(f"MJ Proxy: Could not verify journaled task {task_id}: {str(e)}")
+    print(f"MJ Proxy: Re-attaching to in-flight task {task_id} submitted at {time.ctime(record['submitted_at'])}")
+    return task_id, record["submitted_at"]
+
+
+def poll_mj_task(mj_proxy_endpoint, task_id, headers, bot_type, job_fp, kind, submitted_at,
+                 polling_interval_seconds, max_polling_attempts, adaptive_polling=True, label="task"):
+    """
+    Poll /mj/task/{id}/fetch until the task reaches a terminal state and return
+    the task data on SUCCESS.
+
+    The overall budget stays polling_interval_seconds x max_polling_attempts; within
+    it, adaptive polling spaces requests by the reported progress and the recent
+    durations of this bot_type, and never polls faster than polling_interval_seconds
+    while the task is queued, not progressing or past its predicted finish.
+    """
+    fetch_url = f"{mj_proxy_endpoint.rstrip('/')}/mj/task/{task_id}/fetch"
+    history_key = f"{kind}:{bot_type}"
+    polling.history.seed(history_key, job_journal.journal.finished_durations(kind, {"botType": bot_type}))
+    schedule = polling.PollSchedule(
+        polling.history.expected(history_key),
+        min_interval=1.0,
+        max_interval=polling_interval_seconds * 3 if adaptive_polling else polling_interval_seconds,
+        adaptive=adaptive_polling,
+        base_interval=polling_interval_seconds,
+    )
+    deadline = time.time() + polling_interval_seconds * max_polling_attempts
+    status = None
+    attempt = 0
+
+    while True:
+        attempt += 1
+        elapsed = time.time() - submitted_at
+        try:
+            fetch_response = transport.get(fetch_url, model=bot_type, endpoint=f"{mj_proxy_endpoint.rstrip('/')}/mj/task/fetch", headers=headers)
+            fetch_response.raise_for_status()
+            task_data = fetch_response.json()
+        except (CircuitOpenError, InterruptProcessingException):
+            raise
+        except Exception as e:
+            delay = schedule.error_delay()
+            print(f"MJ Proxy: Polling {label} {task_id} failed ({type(e).__name__}): {str(e)}. Retrying in {delay:.1f}s...")
+        else:
+            status = task_data.get("status")
+            progress = task_data.get("progress")
+            print(f"MJ Proxy: {label.capitalize()} {task_id} status: {status}, Progress: {progress or 'N/A'} (poll {attempt}, {elapsed:.0f}s elapsed)")
+
+            if status in ("SUCCESS", "FAILURE", "MODAL"):
+                job_journal.journal.record_finished(job_fp, status)
+
+            if status == "SUCCESS":
+                polling.history.record(history_key, elapsed)
+                return task_data
+            elif status == "FAILURE":
+                raise Exception(f"Midjourney {label} {task_id} failed: {task_data.get('failReason', 'Unknown reason')}.")
+            elif status == "MODAL":
+                raise Exception(f"Midjourney {label} {task_id} is in MODAL state.")
+
+            delay = schedule.next_delay(elapsed, progress)
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TaskTimedOut(f"Midjourney {label} {task_id} timed out. Last status: {status}.")
+        interrupt.sleep(min(delay, remaining))
+
+
+class MJProxyTask:
+    """
+    Midjourney proxy: submit to `path`, then (for task kinds) poll until the
+    task finishes and return its data, with the task id under "id". Submissions
+    are journaled by payload so a re-run resumes an in-flight task. Without a
+    `kind` the submit response itself is returned (uploads).
+    """
+
+    idempotent = False
+    # The proxy queues real Discord jobs; a failed submit is reported, not repeated.
+    attempts = 1
+
+    def __init__(self, path, action, kind=None, label="task"):
+        self.path = path
+        self.action = action
+        self.kind = kind
+        self.label = label
+
+    def send(self, logger, payload, api_url, api_key, model, idempotency_key=None,
+             polling_interval_seconds=5, max_polling_attempts=30, adaptive_polling=True):
+        submit_url = f"{api_url.rstrip('/')}{self.path}"
+        headers = {'Content-Type': 'application/json', 'mj-api-secret': api_key, 'X-Api-Key': api_key}
+
+        task_id = submitted_at = job_fp = None
+        if self.kind:
+            job_fp = job_journal.fingerprint(self.kind, api_url, payload)
+            task_id, submitted_at = reattach_mj_task(job_fp, api_url, headers, model)
+
+        if not task_id:
+            logger.info("MJ Proxy: %s to %s", self.action.capitalize(), submit_url)
+            logger.debug("MJ Proxy: Headers: %s", log.Lazy(_mj_headers_for_logging, headers))
+            logger.debug("MJ Proxy: Payload: %s", log.Lazy(lambda: json.dumps(sanitize_for_logging(payload))))
+
+            try:
+                response = transport.post(submit_url, model=model or "", json=payload, headers=headers)
+                response.raise_for_status()
+                submit_response_json = response.json()
+                logger.debug("MJ Proxy: Submit Response: %s", log.Preview(response))
+            except (CircuitOpenError, InterruptProcessingException):
+                raise
+            except requests.exceptions.RequestException as e:
+                response_text = e.response.text if e.response else "No response text"
+                raise Exception(f"Midjourney {self.action} failed (RequestException): {str(e)}, Response: {response_text}")
+            except Exception as e:
+                response_content = response.text if 'response' in locals() else 'No response object'
+                raise Exception(f"Midjourney {self.action} failed (Other Exception): {str(e)}, Response: {response_content}")
+
+            if submit_response_json.get("code") != 1:
+                raise RequestRejected(f"Midjourney {self.action} error: {submit_response_json.get('description', 'Unknown error')}, Code: {submit_response_json.get('code')}")
+            if not self.kind:
+                return submit_response_json
+
+            task_id = submit_response_json.get("result")
+            if not task_id:
+                raise Exception(f"Midjourney {self.label} ID not found in submission response.")
+            job_journal.journal.record_submitted(job_fp, self.kind, task_id, api_url, payload)
+            submitted_at = time.time()
+
+        print(f"MJ Proxy: {self.label.capitalize()} {task_id} submitted. Polling...")
+        with timings.stage("mj_polling"):
+            task_data = poll_mj_task(
+                api_url, task_id, headers, model, job_fp, self.kind, submitted_at,
+                polling_interval_seconds, max_polling_attempts, adaptive_polling, label=self.label,
+            )
+        return dict(task_data, id=task_data.get("id") or task_id)
+
+
+# -- response parsers -------------------------------------------------------
+# parse(response_json, **options) -> ParsedResponse; usage(response_json) is
+# the token usage reported with the call, if any.
+
+class ParsedResponse:
+    """Where the image of a response is (inline base64 `data` or a `url` to fetch), plus any text."""
+
+    __slots__ = ("data", "url", "image_url", "text", "extra")
+
+    def __init__(self, data=None, url=None, image_url="", text="", extra=None):
+        self.data = data
+        self.url = url
+        self.image_url = image_url
+        self.text = text
+        self.extra = extra or {}
+
+    @property
+    def has_image(self):
+        return self.data is not None or bool(self.url)
+
+
+class OpenAIImages:
+    """`data[0]` of an OpenAI-style images response: `b64_json` or `url`."""
+
+    def parse(self, response_json, response_format=None, output_format="png"):
+        if response_format == "b64_json":
+            b64_data = response_json["data"][0]["b64_json"]
+            return ParsedResponse(data=b64_data, image_url=f"data:image/{output_format};base64,{b64_data}")
+        image_url = response_json["data"][0]["url"]
+        if not image_url:
+            raise BadResponse(f"Image URL not found in response: {response_json}")
+        return ParsedResponse(url=image_url, image_url=image_url)
+
+    def usage(self, response_json):
+        return None
+
+
+class GoogleParts:
+    """`candidates[0].content.parts[]` of a generateContent response: text parts and inlineData."""
+
+    def parse(self, response_json, **options):
+        candidates = response_json.get("candidates", [])
+        if not candidates:
+            raise BadResponse(f"No candidates in response: {response_json}")
+
+        text_parts = []
+        image_data = None
+        for part in candidates[0].get("content", {}).get("parts", []):
+            if "text" in part:
+                text_parts.append(part["text"])
+            elif "inlineData" in part:
+                image_data = part["inlineData"]["data"]
+        return ParsedResponse(data=image_data, text="\n".join(text_parts))
+
+    def usage(self, response_json):
+        return response_json.get("usageMetadata")
+
+
+class OpenAIChat:
+    """`choices[0]` of an OpenAI-style chat completion: the message content, or `text` of legacy completions."""
+
+    def parse(self, response_json, **options):
+        choices = response_json.get("choices") or []
+        if choices:
+            choice = choices[0]
+            if "content" in choice.get("message", {}):
+                return ParsedResponse(text=choice["message"]["content"])
+            if "text" in choice:
+                return ParsedResponse(text=choice["text"])
+        raise BadResponse(f"Unexpected response format: {response_json}")
+
+    def usage(self, response_json):
+        return response_json.get("usage")
+
+
+class MJTask:
+    """A finished Midjourney proxy task: `imageUrl`, the final prompt and the message hash."""
+
+    def parse(self, response_json, **options):
+        task_id = response_json.get("id", "")
+        image_url = response_json.get("imageUrl")
+        if not image_url:
+            raise BadResponse(f"Midjourney task {task_id} Succeeded but no imageUrl found.")
+        return ParsedResponse(
+            url=image_url,
+            image_url=image_url,
+            text=response_json.get("finalPrompt", response_json.get("promptEn", "")),
+            extra={
+                "task_id": task_id,
+                "message_hash": response_json.get("properties", {}).get("messageHash", response_json.get("messageHash", "")),
+            },
+        )
+
+    def usage(self, response_json):
+        return None
+
+
+# -- engine -----------------------------------------------------------------
+
+class ProviderEngine:
+    """
+    A request adapter and a response parser, plus the shared idempotency,
+    retry and usage path. Text nodes call() it and parse the answer once, after
+    any retries, so an unusable answer is reported rather than sent again.
+    """
+
+    def __init__(self, adapter, parser, logger,
+                 request_failed="API request failed", failed="API call failed"):
+        self.adapter = adapter
+        self.parser = parser
+        self.logger = logger
+        self.request_failed = request_failed
+        self.failed = failed
+
+    def _send(self, payload, api_url, api_key, model, idempotency_key, options):
+        response_json = idempotency.journal.lookup(idempotency_key)
+        if response_json is not None:
+            # A previous attempt already got the generation back; re-fetch
+            # its result instead of submitting (and paying for) it again.
+            self.logger.info("API Request %s: reusing journaled response, not resubmitting", idempotency_key)
+            return response_json
+        response_json = self.adapter.send(self.logger, payload, api_url, api_key, model, idempotency_key, **options)
+        idempotency.journal.record(idempotency_key, response_json)
+        timings.set_usage(self.parser.usage(response_json))
+        return response_json
+
+    def _key(self, payload):
+        # The key is fixed before the first attempt so every retry of this
+        # generation is recognisable as the same request.
+        return idempotency.make_key(payload) if self.adapter.idempotent else None
+
+    def call(self, payload, api_url, api_key, model="", **options):
+        """The provider's JSON for one request, retried as the adapter allows."""
+        idempotency_key = self._key(payload)
+        try:
+            return _retrying(
+                self.adapter.attempts, self._send, payload, api_url, api_key, model, idempotency_key, options
+            )
+        finally:
+            # Also after a failed or cancelled call: the key has a per-call
+            # nonce, so nothing will ever look the response up again.
+            idempotency.journal.discard(idempotency_key)
+
+
+class ImageEngine(ProviderEngine):
+    """A ProviderEngine that also downloads and decodes the image of each response."""
+
+    def __init__(self, adapter, parser, logger,
+                 request_failed="API request failed", failed="Image generation failed"):
+        super().__init__(adapter, parser, logger, request_failed=request_failed, failed=failed)
+
+    def generate(self, payload, api_url, api_key, model="", response_format=None, output_format="png", **options):
+        """(image tensor, ParsedResponse) for one generation; request, parse and decode retry together."""
+        auto = response_format == formats.AUTO
+        if auto:
+            response_format = formats.resolve(api_url, model, payload)
+            payload = formats.with_format(payload, response_format)
+        idempotency_key = self._key(payload)
+        try:
+            img_tensor, parsed, delivery = _retrying(
+                self.adapter.attempts, self._generate_attempt,
+                payload, api_url, api_key, model, idempotency_key, response_format, output_format, options,
+            )
+        finally:
+            idempotency.journal.discard(idempotency_key)
+        if response_format in formats.FORMATS and delivery is not None:
+            formats.record(api_url, model, payload, response_format, delivery, auto=auto)
+        return img_tensor, parsed
+
+    def _generate_attempt(self, payload, api_url, api_key, model, idempotency_key,
+                          response_format, output_format, options):
+        response_json = None
+        timing = timings.current()
+        started = time.perf_counter()
+        waited = _waiting(timing)
+        try:
+            response_json = self._send(payload, api_url, api_key, model, idempotency_key, options)
+            waited = _waiting(timing) - waited
+            parsed = self.parser.parse(response_json, response_format=response_format, output_format=output_format)
+            if not parsed.has_image:
+                raise BadResponse("No image data found in response parts")
+            img_tensor = load_image(parsed)
+            delivery = time.perf_counter() - started - waited if timing is not None else None
+            return img_tensor, parsed, delivery
+
+        except (CircuitOpenError, InterruptProcessingException, TaskTimedOut):
+            raise
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"{self.request_failed}: {str(e)}")
+        except KeyError as e:
+            self._log_failure("KeyError", response_json)
+            raise BadResponse(f"Unexpected response format (KeyError): {str(e)}. Check API documentation and response structure.")
+        except Exception as e:
+            self._log_failure("other Exception", response_json)
+            if self.failed is None:
+                raise
+            # Keep the type so rejected requests and unusable responses still skip the retry.
+            wrap = type(e) if isinstance(e, (RequestRejected, BadResponse)) else Exception
+            raise wrap(f"{self.failed}: {str(e)}")
+
+    def _log_failure(self, kind, response_json):
+        self.logger.error(
+            "Full error response for %s: %s", kind,
+            log.Lazy(lambda: json.dumps(sanitize_for_logging(response_json)))
+            if response_json is not None else 'Response object not available',
+        )
+
+
+__all__ = [
+    "ProviderEngine", "ImageEngine", "ParsedResponse", "RequestRejected", "BadResponse", "TaskTimedOut",
+    "BearerJSON", "BearerMultipart", "GoogleGenerateContent", "MJProxyTask",
+    "OpenAIImages", "OpenAIChat", "GoogleParts", "MJTask",
+    "pil_to_rgba_tensor", "pil_images_to_batch", "map_parallel", "load_image", "load_images", "sanitize_for_logging",
+    "reattach_mj_task", "poll_mj_task", "RETRY_ATTEMPTS",
+]
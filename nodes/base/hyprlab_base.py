@@ -1,14 +1,8 @@
-import tenacity
 import random
-import base64
-from PIL import Image
-import os
-import io
-import torch
-import numpy as np
-import requests
-import json
-import time
+
+from . import encoding, engine, log, timings, uploads
+
+logger = log.get_logger("hyprlab")
 
 # Base class for HyprLab Image Generation Nodes
 class HyprLabImageGenerationNodeBase:
@@ -16,10 +10,12 @@ class HyprLabImageGenerationNodeBase:
     RETURN_TYPES = ("IMAGE", "STRING", "INT")
     RETURN_NAMES = ("image", "image_url", "seed")
 
-    @tenacity.retry(
-        wait=tenacity.wait_exponential(multiplier=1.25, min=5, max=30),
-        stop=tenacity.stop_after_attempt(5)
-    )
+    # OpenAI-style images endpoint: JSON POST with a Bearer key, image in data[0].
+    ENGINE = engine.ImageEngine(engine.BearerJSON(), engine.OpenAIImages(), logger)
+    # How image inputs are encoded (LEON_ENCODE_HYPRLAB).
+    ENCODING = encoding.profile("hyprlab", "png:6")
+
+    @timings.instrument
     def _make_api_call(
         self,
         payload,
@@ -29,120 +25,37 @@ class HyprLabImageGenerationNodeBase:
         output_format,   # "png", "jpeg", "webp"
         seed
     ):
-        if not payload.get("prompt", "").strip() and not payload.get("image_reference_url", "") : # Luma might not need prompt if image ref is strong
-            pass
-
         random.seed(seed)
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
-
-        try:
-            response = requests.post(api_url.rstrip('/'), json=payload, headers=headers)
-            
-            print(f"API Request URL: {api_url.rstrip('/')}")
-            print(f"API Request Payload: {json.dumps(self._sanitize_payload_for_logging(payload))}")
-            print(f"HTTP status: {response.status_code}")
-            response_text_to_print = response.text
-            if "b64_json" in response_text_to_print and len(response_text_to_print) > 1000:
-                response_text_to_print = response_text_to_print[:500] + "... (response truncated)"
-            print(f"Response: {response_text_to_print}")
-            
-            response.raise_for_status()
-            response_json = response.json()
-
-            pil_img = None
-            actual_image_url = ""
-
-            if response_format == "b64_json":
-                b64_data = response_json["data"][0]["b64_json"]
-                img_data = base64.b64decode(b64_data)
-                pil_img = Image.open(io.BytesIO(img_data))
-                actual_image_url = f"data:image/{output_format};base64,{b64_data}"
-            else:
-                actual_image_url = response_json["data"][0]["url"]
-                if not actual_image_url:
-                    raise Exception(f"Image URL not found in response: {response_json}")
-                
-                img_response = requests.get(actual_image_url)
-                if img_response.status_code != 200:
-                    raise Exception(f"Failed to download the image from {actual_image_url}, status: {img_response.status_code}")
-                pil_img = Image.open(io.BytesIO(img_response.content))
-
-            if pil_img is None:
-                raise Exception("Failed to load image from API response")
-
-            pil_img = pil_img.convert("RGBA")
-            img_array = np.array(pil_img).astype(np.float32) / 255.0
-
-            if img_array.ndim == 3 and img_array.shape[-1] == 3:
-                alpha_channel = np.ones_like(img_array[..., :1])
-                img_array = np.concatenate((img_array, alpha_channel), axis=-1)
-            
-            img_tensor = torch.from_numpy(img_array).unsqueeze(0)
-            
-            return (img_tensor, actual_image_url, seed)
-
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"API request failed: {str(e)}")
-        except KeyError as e:
-            err_text = response.text if 'response' in locals() else 'Response object not available'
-            print(f"Full error response for KeyError: {self._format_error_response(err_text)}")
-            raise Exception(f"Unexpected response format (KeyError): {str(e)}. Check API documentation and response structure.")
-        except Exception as e:
-            err_text = response.text if 'response' in locals() else 'Response object not available'
-            print(f"Full error response for other Exception: {self._format_error_response(err_text)}")
-            raise Exception(f"Image generation failed: {str(e)}")
-
-    def _format_error_response(self, err_text):
-        try:
-            parsed = json.loads(err_text)
-            sanitized = self._sanitize_payload_for_logging(parsed)
-            return json.dumps(sanitized)
-        except Exception:
-            if len(err_text) > 5000:
-                return err_text[:5000] + '...[truncated]'
-            return err_text
-
-    def _sanitize_payload_for_logging(self, obj):
-        if isinstance(obj, dict):
-            return {k: self._sanitize_payload_for_logging(v) for k, v in obj.items()}
-        elif isinstance(obj, list) or isinstance(obj, tuple):
-            return [self._sanitize_payload_for_logging(v) for v in obj]
-        elif isinstance(obj, str) and len(obj) > 200:
-            if obj.startswith("data:image") or len(obj) > 1000:
-                return obj[:50] + f"... [truncated {len(obj)} chars]"
-        return obj
+        # Before the engine derives the idempotency key, so retries and re-runs send the same reference.
+        payload = uploads.offload(payload, api_url, api_key)
+        img_tensor, parsed = self.ENGINE.generate(
+            payload, api_url, api_key, model=payload.get("model", ""),
+            response_format=response_format, output_format=output_format,
+        )
+        return (img_tensor, parsed.image_url, seed)
 
     def _tensor_to_base64_data_uri(self, tensor_image):
-        if tensor_image is None:
-            return None
-        
-        if tensor_image.ndim == 4:
-            tensor_image = tensor_image[0]
-        
-        np_image = (tensor_image.cpu().numpy() * 255).astype(np.uint8)
-        pil_image = Image.fromarray(np_image, 'RGBA' if np_image.shape[-1] == 4 else 'RGB')
-        
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format="PNG")
-        base64_str = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        return f"data:image/png;base64,{base64_str}"
+        return encoding.to_data_uri(tensor_image, self.ENCODING)
 
     def _resolve_image_input(self, tensor_image, image_url="", field_name="image"):
         """
         Prefer an explicit URL when provided, otherwise fall back to base64 encoding the tensor.
         We prevent sending both representations at once to keep payloads unambiguous.
         """
+        return self._encode_image_source(self._image_source(tensor_image, image_url, field_name))
+
+    def _image_source(self, tensor_image, image_url="", field_name="image"):
+        """The URL or tensor given for one image input, not encoded yet (None if neither)."""
         url = (image_url or "").strip()
         if tensor_image is not None and url:
             raise ValueError(f"{field_name}: provide either an image tensor or an image URL, not both.")
         if url:
             return url
-        if tensor_image is not None:
-            return self._tensor_to_base64_data_uri(tensor_image)
-        return None
+        return tensor_image
+
+    def _encode_image_source(self, source):
+        if source is None or isinstance(source, str):
+            return source
+        return self._tensor_to_base64_data_uri(source)
 
 __all__ = ["HyprLabImageGenerationNodeBase"]
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from . import metrics
+
+
+# Idempotency support for billed POSTs.
+#
+# Each logical generation gets a key derived from the request payload and a
+# run id that is fixed before the first attempt, so every retry of the same
+# generation carries the same Idempotency-Key header. Providers that honour the
+# header de-duplicate server-side; for those that ignore it, the short-lived
+# journal below keeps the response of a POST that already went through, and
+# retries re-fetch the result from it instead of submitting a second job.
+
+ENABLED = os.environ.get("LEON_IDEMPOTENCY", "1") != "0"
+JOURNAL_TTL_SECONDS = float(os.environ.get("LEON_IDEMPOTENCY_TTL_SECONDS", "600"))
+JOURNAL_MAX_ENTRIES = 64
+
+HEADER = "Idempotency-Key"
+
+
+def new_run_id():
+    return uuid.uuid4().hex
+
+
+def payload_hash(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def make_key(payload, run_id=None):
+    """Stable key for one logical generation: sha256(payload) scoped by run id."""
+    if not ENABLED:
+        return None
+    run_id = run_id or new_run_id()
+    digest = hashlib.sha256(f"{run_id}:{payload_hash(payload)}".encode("utf-8")).hexdigest()
+    return f"leon-{digest[:40]}"
+
+
+class ResponseJournal:
+    """In-memory, TTL-bounded map of idempotency key -> parsed response."""
+
+    def __init__(self, ttl_seconds=JOURNAL_TTL_SECONDS, max_entries=JOURNAL_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _prune(self, now):
+        expired = [k for k, (ts, _) in self._entries.items() if now - ts > self.ttl_seconds]
+        for k in expired:
+            del self._entries[k]
+        while len(self._entries) > self.max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest]
+
+    def record(self, key, response_json):
+        if not ENABLED or not key:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now, response_json)
+            self._prune(now)
+
+    def lookup(self, key):
+        if not ENABLED or not key:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            entry = self._entries.get(key)
+        metrics.inc("leon_cache_hits_total" if entry else "leon_cache_misses_total", cache="idempotency")
+        return entry[1] if entry else None
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+journal = ResponseJournal()
+
+
+__all__ = ["make_key", "new_run_id", "payload_hash", "journal", "ResponseJournal", "HEADER", "ENABLED"]
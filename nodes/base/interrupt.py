@@ -0,0 +1,63 @@
+import time
+
+from . import timings
+
+
+# Cooperative cancellation for long waits.
+#
+# ComfyUI's Cancel button only sets a flag; code that blocks in time.sleep() or
+# a socket read never sees it. Every wait in the Leon nodes (polling, retry
+# backoff, slot queues, HTTP calls) goes through this module so it wakes up at
+# least every CHECK_INTERVAL seconds and raises ComfyUI's own
+# InterruptProcessingException, which the executor reports as a clean cancel.
+# A single call can also be cancelled (CallCancelled, a subclass, so retries
+# and error handlers treat it the same). Outside ComfyUI only the latter happens.
+
+CHECK_INTERVAL = 0.25
+
+try:
+    import comfy.model_management as _mm
+    InterruptProcessingException = _mm.InterruptProcessingException
+    AVAILABLE = True
+except Exception:
+    _mm = None
+    AVAILABLE = False
+
+    class InterruptProcessingException(Exception):
+        pass
+
+
+class CallCancelled(InterruptProcessingException):
+    """One call was cancelled (watchdog, /leon/calls cancel) rather than the whole prompt."""
+
+
+def _cancel_reason():
+    timing = timings.current()
+    return timing.cancel_reason if timing is not None else None
+
+
+def is_interrupted():
+    return (AVAILABLE and _mm.processing_interrupted()) or _cancel_reason() is not None
+
+
+def check():
+    """Raise InterruptProcessingException if the user cancelled the prompt or this call."""
+    if AVAILABLE:
+        _mm.throw_exception_if_processing_interrupted()
+    reason = _cancel_reason()
+    if reason is not None:
+        raise CallCancelled(reason)
+
+
+def sleep(seconds):
+    """time.sleep() that returns early by raising when the prompt is cancelled."""
+    deadline = time.monotonic() + seconds
+    while True:
+        check()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, CHECK_INTERVAL))
+
+
+__all__ = ["InterruptProcessingException", "CallCancelled", "is_interrupted", "check", "sleep", "AVAILABLE", "CHECK_INTERVAL"]
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from . import metrics
+
+
+# Append-only JSONL journal of submitted asynchronous tasks (Midjourney imagine,
+# describe, ...). A record is written when a task is submitted and another when
+# it reaches a terminal state, so after a ComfyUI restart a node whose payload
+# matches a task that never finished can re-attach to it instead of paying for
+# a new submission. Entries older than the TTL are pruned when the journal is
+# loaded and whenever it is compacted.
+
+STATE_DIR = os.environ.get(
+    "LEON_STATE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".leon_state"),
+)
+JOB_TTL_SECONDS = float(os.environ.get("LEON_JOB_TTL_SECONDS", str(6 * 3600)))
+COMPACT_EVERY = 200
+# Tasks submitted before this are from an earlier run of ComfyUI.
+STARTED_AT = time.time()
+
+
+def fingerprint(kind, endpoint, payload):
+    """Hash of everything that defines a task; secrets live in headers and are never included."""
+    canonical = json.dumps({"kind": kind, "endpoint": endpoint.rstrip('/'), "payload": payload},
+                           sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _summarize(obj):
+    if isinstance(obj, dict):
+        return {k: _summarize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_summarize(v) for v in obj]
+    if isinstance(obj, str) and len(obj) > 200:
+        return obj[:50] + f"... [truncated {len(obj)} chars]"
+    return obj
+
+
+class JobJournal:
+    def __init__(self, path, ttl_seconds=JOB_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._jobs = None  # fingerprint -> latest record, loaded lazily
+        self._appends = 0
+
+    def _load(self):
+        if self._jobs is not None:
+            return
+        self._jobs = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn write from a crash; skip it
+                    self._jobs[record.get("fingerprint")] = record
+        except OSError as e:
+            print(f"Leon job journal: failed to read {self.path}: {str(e)}")
+        self._compact()
+
+    def _compact(self):
+        now = time.time()
+        self._jobs = {
+            fp: rec for fp, rec in self._jobs.items()
+            if fp and now - rec.get("submitted_at", 0) <= self.ttl_seconds
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for rec in self._jobs.values():
+                    f.write(json.dumps(rec) + "\n")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Leon job journal: failed to compact {self.path}: {str(e)}")
+        self._appends = 0
+
+    def _append(self, record):
+        self._jobs[record["fingerprint"]] = record
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Leon job journal: failed to append to {self.path}: {str(e)}")
+        self._appends += 1
+        if self._appends >= COMPACT_EVERY:
+            self._compact()
+
+    def find_in_flight(self, fp, submitted_before=None):
+        """Return the journaled record of an unfinished, unexpired task, or None."""
+        with self._lock:
+            self._load()
+            rec = self._jobs.get(fp)
+            if (not rec or rec.get("state") != "submitted"
+                    or time.time() - rec.get("submitted_at", 0) > self.ttl_seconds
+                    or (submitted_before is not None and rec.get("submitted_at", 0) >= submitted_before)):
+                metrics.inc("leon_cache_misses_total", cache="job_journal")
+                return None
+            metrics.inc("leon_cache_hits_total", cache="job_journal")
+            return dict(rec)
+
+    def finished_durations(self, kind, match=None, limit=20):
+        """Wall-clock durations of recent successful tasks of a kind, oldest first."""
+        with self._lock:
+            self._load()
+            records = [
+                rec for rec in self._jobs.values()
+                if rec.get("kind") == kind and rec.get("status") == "SUCCESS"
+                and all(rec.get("params", {}).get(k) == v for k, v in (match or {}).items())
+            ]
+        records.sort(key=lambda rec: rec.get("updated_at", 0))
+        return [rec["updated_at"] - rec["submitted_at"] for rec in records[-limit:]]
+
+    def record_submitted(self, fp, kind, task_id, endpoint, params):
+        with self._lock:
+            self._load()
+            self._append({
+                "fingerprint": fp, "kind": kind, "task_id": task_id, "endpoint": endpoint,
+                "params": _summarize(params), "state": "submitted",
+                "submitted_at": time.time(), "updated_at": time.time(),
+            })
+
+    def record_finished(self, fp, status):
+        with self._lock:
+            self._load()
+            rec = self._jobs.get(fp)
+            if not rec:
+                return
+            rec = dict(rec, state="finished", status=status, updated_at=time.time())
+            self._append(rec)
+
+
+journal = JobJournal(os.path.join(STATE_DIR, "jobs.jsonl"))
+
+
+__all__ = ["JobJournal", "journal", "fingerprint", "STATE_DIR", "STARTED_AT"]
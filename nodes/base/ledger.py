@@ -0,0 +1,224 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from . import timings
+from .job_journal import STATE_DIR
+
+
+# Local SQLite ledger of every instrumented call (generations, LLM calls,
+# uploads): model, node class, parameter summary, bytes, stage timings,
+# retries, success and an estimated cost. report() turns it into rolling
+# p50/p95 latency and throughput per model.
+#
+# Prices come from a JSON table keyed by model id ("*" is the fallback):
+#   {"flux-1.1-pro": {"per_call": 0.04},
+#    "gpt-4o": {"per_1m_input_tokens": 2.5, "per_1m_output_tokens": 10.0}}
+
+# Set LEON_LEDGER_DB to "" to disable the ledger.
+DB_PATH = os.environ.get("LEON_LEDGER_DB", os.path.join(STATE_DIR, "ledger.sqlite3"))
+PRICE_TABLE_PATH = os.environ.get("LEON_PRICE_TABLE", os.path.join(STATE_DIR, "prices.json"))
+DEFAULT_WINDOW_SECONDS = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    node_class TEXT NOT NULL,
+    model TEXT NOT NULL,
+    params TEXT,
+    bytes_out INTEGER,
+    bytes_in INTEGER,
+    total_seconds REAL,
+    stages TEXT,
+    requests INTEGER,
+    retries INTEGER,
+    success INTEGER,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    cost REAL
+);
+CREATE INDEX IF NOT EXISTS calls_model_ts ON calls (model, ts);
+"""
+
+_lock = threading.Lock()
+_conn = None
+_prices = None
+_prices_mtime = None
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=5.0)
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+
+def load_prices():
+    """Price table, re-read when the file changes."""
+    global _prices, _prices_mtime
+    try:
+        mtime = os.path.getmtime(PRICE_TABLE_PATH)
+    except OSError:
+        return {}
+    if mtime != _prices_mtime:
+        try:
+            with open(PRICE_TABLE_PATH, "r", encoding="utf-8") as f:
+                _prices = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Leon ledger: failed to read price table {PRICE_TABLE_PATH}: {str(e)}")
+            _prices = {}
+        _prices_mtime = mtime
+    return _prices or {}
+
+
+def estimate_cost(model, usage=None, success=True):
+    """Estimated cost of one call, or None when the model has no price entry."""
+    prices = load_prices()
+    price = prices.get(model, prices.get("*"))
+    if not price:
+        return None
+    if not success:
+        return 0.0
+    usage = usage or {}
+    cost = float(price.get("per_call", 0.0))
+    cost += usage.get("input_tokens", 0) * float(price.get("per_1m_input_tokens", 0.0)) / 1e6
+    cost += usage.get("output_tokens", 0) * float(price.get("per_1m_output_tokens", 0.0)) / 1e6
+    return cost
+
+
+def record(timing):
+    """timings sink: append one finished CallTiming to the ledger."""
+    if not DB_PATH:
+        return
+    row = (
+        timing.started_at, timing.node_class, timing.model or "",
+        json.dumps(timing.params, default=str), timing.bytes_out, timing.bytes_in,
+        timing.total, json.dumps({k: round(v, 6) for k, v in timing.stages.items()}),
+        timing.requests, timing.retries, 1 if timing.success else 0,
+        timing.usage.get("input_tokens"), timing.usage.get("output_tokens"),
+        estimate_cost(timing.model, timing.usage, timing.success),
+    )
+    with _lock:
+        try:
+            conn = _connection()
+            conn.execute(
+                "INSERT INTO calls (ts, node_class, model, params, bytes_out, bytes_in, total_seconds, stages,"
+                " requests, retries, success, input_tokens, output_tokens, cost)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                row,
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Leon ledger: failed to record call: {str(e)}")
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile.
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def report(window_seconds=DEFAULT_WINDOW_SECONDS, node_class=None):
+    """
+    Per-model stats over the last window: calls, success rate, p50/p95 latency of
+    successful calls, throughput (successful calls per minute) and total cost.
+    Sorted fastest first by p50.
+    """
+    if not DB_PATH:
+        return []
+    since = time.time() - window_seconds
+    query = "SELECT model, total_seconds, success, cost FROM calls WHERE ts >= ?"
+    params = [since]
+    if node_class:
+        query += " AND node_class = ?"
+        params.append(node_class)
+    with _lock:
+        try:
+            rows = _connection().execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Leon ledger: report query failed: {str(e)}")
+            return []
+
+    by_model = {}
+    for model, total, success, cost in rows:
+        stats = by_model.setdefault(model, {"latencies": [], "calls": 0, "ok": 0, "cost": 0.0})
+        stats["calls"] += 1
+        if success:
+            stats["ok"] += 1
+            if total is not None:
+                stats["latencies"].append(total)
+        stats["cost"] += cost or 0.0
+
+    minutes = window_seconds / 60.0
+    result = []
+    for model, stats in by_model.items():
+        latencies = sorted(stats["latencies"])
+        result.append({
+            "model": model,
+            "calls": stats["calls"],
+            "success_rate": stats["ok"] / stats["calls"],
+            "p50_seconds": _percentile(latencies, 0.50),
+            "p95_seconds": _percentile(latencies, 0.95),
+            "throughput_per_minute": stats["ok"] / minutes if minutes else 0.0,
+            "estimated_cost": round(stats["cost"], 6),
+        })
+    result.sort(key=lambda r: (r["p50_seconds"] is None, r["p50_seconds"] or 0.0))
+    return result
+
+
+def delivery_samples(model, window_seconds=DEFAULT_WINDOW_SECONDS, limit=500):
+    """
+    (delivery_key, response_format, seconds) of recent successful calls of a
+    model that recorded a delivery time, oldest first (see response_format.py).
+    """
+    if not DB_PATH:
+        return []
+    since = time.time() - window_seconds
+    with _lock:
+        try:
+            rows = _connection().execute(
+                "SELECT params, stages FROM calls WHERE model = ? AND ts >= ? AND success = 1 ORDER BY ts DESC LIMIT ?",
+                (model, since, limit),
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Leon ledger: delivery query failed: {str(e)}")
+            return []
+
+    samples = []
+    for params_json, stages_json in reversed(rows):
+        try:
+            params = json.loads(params_json or "{}")
+            stages = json.loads(stages_json or "{}")
+        except ValueError:
+            continue
+        if params.get("delivery_key") and "delivery" in stages:
+            samples.append((params["delivery_key"], params.get("response_format"), stages["delivery"]))
+    return samples
+
+
+def format_report(rows):
+    if not rows:
+        return "No calls recorded in this window."
+    lines = [f"{'model':<40} {'calls':>6} {'ok%':>6} {'p50 s':>8} {'p95 s':>8} {'per min':>8} {'cost':>10}"]
+    for r in rows:
+        p50 = f"{r['p50_seconds']:.2f}" if r["p50_seconds"] is not None else "-"
+        p95 = f"{r['p95_seconds']:.2f}" if r["p95_seconds"] is not None else "-"
+        lines.append(
+            f"{r['model'][:40]:<40} {r['calls']:>6} {r['success_rate'] * 100:>5.0f}% {p50:>8} {p95:>8}"
+            f" {r['throughput_per_minute']:>8.2f} {r['estimated_cost']:>10.4f}"
+        )
+    return "\n".join(lines)
+
+
+timings.register_sink(record)
+
+
+__all__ = ["record", "report", "format_report", "delivery_samples", "estimate_cost", "load_prices", "DB_PATH"]
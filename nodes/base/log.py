@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import re
+import sys
+
+from . import timings
+from .job_journal import STATE_DIR
+
+
+# Leveled, lazy logging for the Leon nodes.
+#
+# Request/response dumps used to be built eagerly: json.dumps of a sanitized
+# copy of every payload and a full decode of response.text, even when nobody
+# read them. Here nothing is formatted unless the record is emitted:
+#
+#   logger = log.get_logger("hyprlab")
+#   logger.info("API Request URL: %s", url)
+#   logger.debug("API Request Payload: %s", log.Lazy(lambda: json.dumps(sanitize(payload))))
+#   logger.debug("Response: %s", log.Preview(response))
+#
+# Preview reads at most LEON_LOG_PREVIEW_BYTES of the body and shortens long
+# base64 runs. Records at or above LEON_LOG_LEVEL (default INFO) go to stdout
+# as before and, tagged with the current call, to a JSONL trace file.
+
+LEVEL = os.environ.get("LEON_LOG_LEVEL", "INFO").upper()
+PREVIEW_BYTES = int(os.environ.get("LEON_LOG_PREVIEW_BYTES", "2048"))
+# Set LEON_TRACE_FILE to "" to disable the JSONL trace.
+TRACE_PATH = os.environ.get("LEON_TRACE_FILE", os.path.join(STATE_DIR, "trace.jsonl"))
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+
+_BASE64_RUN = re.compile(r"[A-Za-z0-9+/=_-]{200,}")
+
+
+class Lazy:
+    """Defers an expensive log argument until the record is actually formatted."""
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        try:
+            return str(self.func(*self.args))
+        except Exception as e:
+            return f"<unformattable: {type(e).__name__}: {e}>"
+
+
+def _shorten_base64(text):
+    return _BASE64_RUN.sub(lambda m: m.group(0)[:50] + f"... [truncated {len(m.group(0))} chars]", text)
+
+
+def preview_bytes(data, limit=None):
+    """Decode at most `limit` bytes of a body for display; never decodes the whole thing."""
+    limit = PREVIEW_BYTES if limit is None else limit
+    if data is None:
+        return ""
+    if isinstance(data, str):
+        head, total = data[:limit], len(data)
+    else:
+        head, total = data[:limit].decode("utf-8", errors="replace"), len(data)
+    text = _shorten_base64(head)
+    if total > limit:
+        text += f"... [{total} bytes total]"
+    return text
+
+
+class Preview:
+    """Byte-bounded view of a requests.Response body (or bytes/str), built only if logged."""
+
+    __slots__ = ("source", "limit")
+
+    def __init__(self, source, limit=None):
+        self.source = source
+        self.limit = limit
+
+    def __str__(self):
+        body = getattr(self.source, "content", self.source)
+        return preview_bytes(body, self.limit)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    # Looks up sys.stdout per record so ComfyUI's log interceptor and
+    # redirect_stdout (benchmarks) see these lines just like print().
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def get_logger(name):
+    return logging.getLogger(f"leon.{name}")
+
+
+class _TraceHandler(logging.Handler):
+    """Appends each emitted record as one JSON line, tagged with the running call."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        # Opened on the first record and kept open; its size is tracked here
+        # rather than looked up on disk for every line.
+        self._file = None
+        self._size = 0
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        os.replace(self.path, self.path + ".1")
+        self._open()
+
+    def emit(self, record):
+        # Called with the handler's lock held (logging.Handler.handle).
+        try:
+            entry = {
+                "ts": record.created,
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+            }
+            timing = timings.current()
+            if timing is not None:
+                entry.update(call_id=timing.id, node_class=timing.node_class, node_id=timing.node_id,
+                             model=timing.model)
+            fields = getattr(record, "fields", None)
+            if fields:
+                entry["fields"] = fields
+            line = json.dumps(entry, default=str) + "\n"
+            if self._file is None:
+                self._open()
+            self._file.write(line)
+            self._file.flush()
+            self._size += len(line)  # characters; close enough to bytes for a size cap
+            if self._size > TRACE_MAX_BYTES:
+                self._rotate()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.acquire()
+        try:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        finally:
+            self.release()
+        super().close()
+
+
+def _configure():
+    root = logging.getLogger("leon")
+    if getattr(root, "_leon_configured", False):
+        return
+    root.setLevel(getattr(logging, LEVEL, logging.INFO))
+    # Same plain lines on stdout the nodes always printed; ComfyUI's own log
+    # format would bury them, so don't propagate to the root logger.
+    console = _StdoutHandler()
+    console.setFormatter(logging.Formatter("%(message)s"))
+    root.addHandler(console)
+    if TRACE_PATH:
+        root.addHandler(_TraceHandler(TRACE_PATH))
+    root.propagate = False
+    root._leon_configured = True
+
+
+_configure()
+
+
+__all__ = ["get_logger", "Lazy", "Preview", "preview_bytes", "PREVIEW_BYTES"]
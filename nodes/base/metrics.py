@@ -0,0 +1,128 @@
+import threading
+
+
+# Process-wide metrics registry shared by every Leon node.
+# Counters, gauges and histograms are keyed by (name, sorted label items) so
+# the same metric can be reported per provider / model / node class.
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_collectors = []
+
+
+def _key(name, labels):
+    return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def inc(name, value=1, **labels):
+    """Increase a counter by value."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to an absolute value."""
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    """Record one observation into a cumulative histogram."""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = {"buckets": tuple(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            _histograms[key] = hist
+        for i, bound in enumerate(hist["buckets"]):
+            if value <= bound:
+                hist["counts"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+def register_collector(collector):
+    """
+    Register a callable returning a list of (name, value, labels) gauge samples.
+    Collectors are evaluated lazily whenever a snapshot is taken, which keeps
+    state that lives elsewhere (e.g. circuit breakers) out of the hot path.
+    """
+    with _lock:
+        if collector not in _collectors:
+            _collectors.append(collector)
+
+
+def snapshot():
+    """Return a point-in-time copy of every metric."""
+    with _lock:
+        counters = [(name, dict(labels), value) for (name, labels), value in _counters.items()]
+        gauges = [(name, dict(labels), value) for (name, labels), value in _gauges.items()]
+        histograms = [
+            (name, dict(labels), {"buckets": h["buckets"], "counts": list(h["counts"]), "sum": h["sum"], "count": h["count"]})
+            for (name, labels), h in _histograms.items()
+        ]
+        collectors = list(_collectors)
+
+    for collector in collectors:
+        try:
+            for name, value, labels in collector():
+                gauges.append((name, dict(labels), value))
+        except Exception as e:
+            print(f"Leon metrics: collector {collector!r} failed: {str(e)}")
+
+    return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = sorted(labels.items()) + (extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Render the current snapshot in the Prometheus text exposition format (0.0.4)."""
+    snap = snapshot()
+    lines = []
+
+    def grouped(samples):
+        by_name = {}
+        for name, labels, value in samples:
+            by_name.setdefault(name, []).append((labels, value))
+        return sorted(by_name.items())
+
+    for kind, samples in (("counter", snap["counters"]), ("gauge", snap["gauges"])):
+        for name, series in grouped(samples):
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for name, series in grouped(snap["histograms"]):
+        lines.append(f"# TYPE {name} histogram")
+        for labels, hist in series:
+            for bound, count in zip(hist["buckets"], hist["counts"]):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(float(bound)))])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(hist['sum']))}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+__all__ = ["inc", "set_gauge", "observe", "register_collector", "snapshot", "render_prometheus", "DEFAULT_BUCKETS"]
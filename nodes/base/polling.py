@@ -0,0 +1,110 @@
+import collections
+import statistics
+import threading
+
+
+# Progress-aware polling schedule for asynchronous tasks.
+#
+# The expected total duration comes from the task's own reported progress once
+# it is meaningful, otherwise from recent durations of the same task type.
+# Delays are long while completion is far away and shrink to min_interval as the
+# predicted finish time approaches. A task that is past its prediction or whose
+# progress hasn't moved since the last poll (queued, stalled, slow upstream)
+# says nothing about when it will finish, so polls then start at the base
+# interval and back off towards max_interval. Transient errors back off
+# exponentially.
+
+DEFAULT_EXPECTED_SECONDS = 60.0
+HISTORY_SIZE = 20
+
+
+def parse_progress(value):
+    """Turn '45%', '45', 45 or 0.45 into a fraction in [0, 1], or None."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            value = value.strip().rstrip('%')
+            if not value:
+                return None
+            fraction = float(value) / 100.0
+        else:
+            fraction = float(value)
+            if fraction > 1.0:
+                fraction /= 100.0
+    except (TypeError, ValueError):
+        return None
+    return min(max(fraction, 0.0), 1.0)
+
+
+class DurationHistory:
+    """Recent successful task durations per task type (e.g. bot_type)."""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._durations = collections.defaultdict(lambda: collections.deque(maxlen=size))
+
+    def record(self, task_type, seconds):
+        with self._lock:
+            self._durations[task_type].append(seconds)
+
+    def seed(self, task_type, durations):
+        with self._lock:
+            if not self._durations[task_type]:
+                self._durations[task_type].extend(durations)
+
+    def expected(self, task_type, default=DEFAULT_EXPECTED_SECONDS):
+        with self._lock:
+            durations = list(self._durations.get(task_type, ()))
+        return statistics.median(durations) if durations else default
+
+
+history = DurationHistory()
+
+
+class PollSchedule:
+    def __init__(self, expected_seconds, min_interval=1.0, max_interval=15.0, adaptive=True, base_interval=5.0):
+        self.expected_seconds = max(expected_seconds, min_interval)
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.base_interval = min(max(base_interval, self.min_interval), self.max_interval)
+        self.adaptive = adaptive
+        self._errors = 0
+        self._stalls = 0
+        self._polls = 0
+        self._last_fraction = None
+
+    def predicted_total(self, elapsed, progress):
+        fraction = parse_progress(progress)
+        if fraction and fraction >= 0.05:
+            from_progress = elapsed / fraction
+            # Early progress readings are noisy; lean on history until the task is well along.
+            return fraction * from_progress + (1.0 - fraction) * max(self.expected_seconds, elapsed)
+        return max(self.expected_seconds, elapsed)
+
+    def next_delay(self, elapsed, progress=None):
+        """Delay before the next poll after a successful fetch."""
+        self._errors = 0
+        if not self.adaptive:
+            return self.max_interval
+        fraction = parse_progress(progress)
+        remaining = self.predicted_total(elapsed, progress) - elapsed
+        stalled = remaining <= 0 or (self._polls > 0 and fraction == self._last_fraction)
+        self._polls += 1
+        self._last_fraction = fraction
+        if stalled:
+            self._stalls += 1
+            return min(self.base_interval * 2 ** (self._stalls - 1), self.max_interval)
+        self._stalls = 0
+        # Sleep for half the predicted remaining time so we close in on the finish.
+        return min(max(remaining / 2.0, self.min_interval), self.max_interval)
+
+    def error_delay(self):
+        """Delay before retrying after a transient fetch error."""
+        if not self.adaptive:
+            return self.max_interval
+        self._errors += 1
+        return min(self.min_interval * (2 ** self._errors), max(self.max_interval, 30.0))
+
+
+__all__ = ["PollSchedule", "DurationHistory", "history", "parse_progress"]
@@ -0,0 +1,108 @@
+import cProfile
+import functools
+import itertools
+import os
+import threading
+import time
+import tracemalloc
+
+
+# Opt-in profiling of node executions.
+#
+# With LEON_PROFILE_DIR set, every Leon node's FUNCTION is wrapped at load time
+# with cProfile and tracemalloc. Each execution writes
+#   <dir>/<timestamp>-<NodeClass>-<n>.prof        (open with snakeviz / pstats)
+#   <dir>/<timestamp>-<NodeClass>-<n>.alloc.txt   (top allocation sites)
+# and prints one summary line with wall time, process CPU time and peak traced
+# memory. cProfile only sees the executing thread; HTTP calls running on the
+# transport's worker threads appear as time spent waiting on their future.
+# tracemalloc sees Python and numpy allocations, not PIL's or torch's.
+# Without LEON_PROFILE_DIR nothing is wrapped.
+
+PROFILE_DIR = os.environ.get("LEON_PROFILE_DIR", "")
+TOP_ALLOCATIONS = int(os.environ.get("LEON_PROFILE_TOP", "25"))
+# Set LEON_PROFILE_NODES to a comma-separated list of node class names to limit profiling.
+ONLY_NODES = {n.strip() for n in os.environ.get("LEON_PROFILE_NODES", "").split(",") if n.strip()}
+
+_sequence = itertools.count(1)
+# cProfile can't nest profilers on one thread (and on 3.12+ not at all), so
+# an execution that starts while another is profiled runs unprofiled.
+_profiler_lock = threading.Lock()
+
+
+def _write_allocations(path, snapshot, top):
+    stats = snapshot.statistics("lineno")
+    total = sum(stat.size for stat in stats)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Top {min(top, len(stats))} allocation sites still held at return ({total / 2**20:.1f} MiB total)\n")
+        for index, stat in enumerate(stats[:top], 1):
+            frame = stat.traceback[0]
+            f.write(f"#{index}: {frame.filename}:{frame.lineno}: {stat.size / 2**20:.2f} MiB in {stat.count} blocks\n")
+
+
+def profile_call(label, func, *args, **kwargs):
+    """Run func under cProfile + tracemalloc, dump the results and print a summary line."""
+    if not _profiler_lock.acquire(blocking=False):
+        return func(*args, **kwargs)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    base = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{label.split('.')[0]}-{next(_sequence)}")
+    try:
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+    finally:
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        _profiler_lock.release()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(base + ".prof")
+            _write_allocations(base + ".alloc.txt", snapshot, TOP_ALLOCATIONS)
+        except OSError as e:
+            print(f"Leon profile: failed to write {base}.*: {str(e)}")
+        print(f"Leon profile: {label} wall {wall:.3f}s cpu {cpu:.3f}s peak {peak / 2**20:.1f} MiB -> {base}.prof")
+
+
+def _wrap(cls):
+    # Look in the class's own namespace: getattr would find a base class's
+    # wrapper and leave a subclass that inherits FUNCTION unwrapped. Such a
+    # subclass gets its own wrapper around the original, unwrapped method.
+    if getattr(cls.__dict__.get(cls.FUNCTION), "_leon_profiled", False):
+        return
+    method = getattr(cls, cls.FUNCTION)
+    method = getattr(method, "_leon_original", method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return profile_call(f"{type(self).__name__}.{cls.FUNCTION}", method, self, *args, **kwargs)
+
+    wrapper._leon_profiled = True
+    wrapper._leon_original = method
+    setattr(cls, cls.FUNCTION, wrapper)
+
+
+def install(node_class_mappings):
+    """Wrap every mapped node's FUNCTION when LEON_PROFILE_DIR is set; otherwise do nothing."""
+    if not PROFILE_DIR:
+        return
+    wrapped = 0
+    for name, cls in node_class_mappings.items():
+        if ONLY_NODES and name not in ONLY_NODES:
+            continue
+        if getattr(cls, "FUNCTION", None) and callable(getattr(cls, cls.FUNCTION, None)):
+            _wrap(cls)
+            wrapped += 1
+    print(f"Leon profile: profiling {wrapped} node(s), writing to {PROFILE_DIR}")
+
+
+__all__ = ["install", "profile_call", "PROFILE_DIR"]
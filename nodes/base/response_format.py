@@ -0,0 +1,150 @@
+import collections
+import os
+import statistics
+import threading
+
+from . import ledger, log, metrics, timings, transport
+
+
+# Adaptive response_format ("auto").
+#
+# With "url" the provider answers with a link and the image is fetched from its
+# CDN in a second request; with "b64_json" the image comes inline, about a third
+# larger, in the generation response itself. Which one is faster depends on the
+# output size, how close the CDN is and how busy the gateway is, so "auto"
+# decides from measurements instead of a fixed rule.
+#
+# Every generation that names a format records its delivery time: from the
+# first response byte of the generation request to the finished tensor, i.e.
+# everything that differs between the two formats. Samples are kept per
+# (provider, model, size) and seeded from the ledger, so a restart doesn't
+# start from scratch. "auto" picks the format with the lower median delivery
+# time. Until both formats have MIN_SAMPLES it alternates between them, and
+# every EXPLORE_EVERY decisions it tries the slower one again so the choice
+# follows changing conditions.
+
+AUTO = "auto"
+FORMATS = ("url", "b64_json")
+CHOICES = ["url", "b64_json", AUTO]
+
+MIN_SAMPLES = int(os.environ.get("LEON_AUTO_FORMAT_MIN_SAMPLES", "3"))
+EXPLORE_EVERY = int(os.environ.get("LEON_AUTO_FORMAT_EXPLORE_EVERY", "10"))
+HISTORY_SIZE = 30
+LEDGER_WINDOW_SECONDS = 7 * 24 * 3600
+
+# Payload fields that decide how large the output is.
+SIZE_FIELDS = ("size", "resolution", "image_size", "quality", "width", "height", "aspect_ratio",
+               "upscale_mode", "target", "factor")
+
+logger = log.get_logger("response_format")
+
+
+def size_key(payload):
+    """The output-size part of the history key, from whichever size fields the payload has."""
+    if isinstance(payload, dict):
+        fields = payload.items()
+    else:
+        # Multipart form: [(name, (filename, value)), ...]
+        fields = [(name, value[-1]) for name, value in payload if isinstance(value, tuple) and value[0] is None]
+    parts = [f"{name}={value}" for name, value in fields if name in SIZE_FIELDS and isinstance(value, (str, int, float))]
+    return ",".join(sorted(parts)) or "default"
+
+
+def history_key(api_url, model, payload):
+    return f"{transport.provider_for(api_url)}|{model}|{size_key(payload)}"
+
+
+def with_format(payload, response_format):
+    """A copy of the payload asking for `response_format`."""
+    if isinstance(payload, dict):
+        return dict(payload, response_format=response_format)
+    return [(name, (None, response_format)) if name == "response_format" else (name, value) for name, value in payload]
+
+
+class DeliveryHistory:
+    """Recent delivery times per history key and format."""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=size))
+        self._decisions = collections.Counter()
+        self._seeded = set()
+
+    def record(self, key, response_format, seconds):
+        with self._lock:
+            self._samples[(key, response_format)].append(seconds)
+
+    def _seed(self, model):
+        # Once per model and process; ledger rows come oldest first.
+        with self._lock:
+            if model in self._seeded:
+                return
+            self._seeded.add(model)
+        for key, response_format, seconds in ledger.delivery_samples(model, LEDGER_WINDOW_SECONDS):
+            if response_format in FORMATS:
+                self.record(key, response_format, seconds)
+
+    def medians(self, key, model):
+        self._seed(model)
+        with self._lock:
+            return {fmt: (statistics.median(self._samples[(key, fmt)]), len(self._samples[(key, fmt)]))
+                    for fmt in FORMATS if self._samples.get((key, fmt))}
+
+    def choose(self, key, model):
+        """(format, reason, medians) for the next "auto" call under `key`."""
+        medians = self.medians(key, model)
+        with self._lock:
+            self._decisions[key] += 1
+            decision = self._decisions[key]
+        lacking = [fmt for fmt in FORMATS if medians.get(fmt, (0, 0))[1] < MIN_SAMPLES]
+        if lacking:
+            return lacking[decision % len(lacking)], "measuring", medians
+        fastest = min(FORMATS, key=lambda fmt: medians[fmt][0])
+        if EXPLORE_EVERY and decision % EXPLORE_EVERY == 0:
+            return next(fmt for fmt in FORMATS if fmt != fastest), "re-checking", medians
+        return fastest, "faster", medians
+
+
+history = DeliveryHistory()
+
+
+def _describe(medians):
+    return ", ".join(f"{fmt} {seconds:.2f}s over {count}" for fmt, (seconds, count) in sorted(medians.items())) or "no history"
+
+
+def resolve(api_url, model, payload):
+    """The format to use for an "auto" call, logged with the history it was based on."""
+    key = history_key(api_url, model, payload)
+    choice, reason, medians = history.choose(key, model)
+    if reason == "faster":
+        other = next(fmt for fmt in FORMATS if fmt != choice)
+        saving = medians[other][0] - medians[choice][0]
+        logger.info("response_format auto: %s for %s (median delivery %s; saves ~%.2fs per call)",
+                    choice, key, _describe(medians), saving)
+    else:
+        logger.info("response_format auto: %s for %s (%s; %s)", choice, key, reason, _describe(medians))
+    metrics.inc("leon_response_format_auto_total", choice=choice, reason=reason)
+    return choice
+
+
+def record(api_url, model, payload, response_format, seconds, auto=False):
+    """Record one delivery time, on the current call (for the ledger) and in memory."""
+    key = history_key(api_url, model, payload)
+    other = next(fmt for fmt in FORMATS if fmt != response_format)
+    baseline = history.medians(key, model).get(other)
+    history.record(key, response_format, seconds)
+    timing = timings.current()
+    if timing is not None:
+        timing.add("delivery", seconds)
+        with timing._lock:
+            timing.params["delivery_key"] = key
+            timing.params["response_format"] = response_format
+    if auto and baseline is not None:
+        logger.info("response_format auto: %s delivered in %.2fs, %s median is %.2fs (saved %.2fs)",
+                    response_format, seconds, other, baseline[0], baseline[0] - seconds)
+        # Savings = baseline - delivery; both kept as counters so the difference can be negative.
+        metrics.inc("leon_response_format_auto_delivery_seconds_total", seconds, choice=response_format)
+        metrics.inc("leon_response_format_auto_baseline_seconds_total", baseline[0], choice=response_format)
+
+
+__all__ = ["resolve", "record", "history", "size_key", "history_key", "with_format", "AUTO", "FORMATS", "CHOICES"]
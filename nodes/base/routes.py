@@ -0,0 +1,71 @@
+# HTTP routes added to ComfyUI's PromptServer. Importing this module outside
+# ComfyUI (scripts, benchmarks) is a no-op. Handlers import the modules they
+# report on when first hit, so registering them doesn't pull the transport,
+# tenacity and sqlite into ComfyUI's startup (see nodes/registry.py).
+
+try:
+    from aiohttp import web
+    from server import PromptServer
+    _routes = PromptServer.instance.routes
+except Exception:
+    web = None
+    _routes = None
+
+
+if _routes is not None:
+
+    @_routes.get("/leon/metrics")
+    async def leon_metrics(request):
+        # Prometheus text exposition format; scrape with metrics_path: /leon/metrics
+        from . import metrics
+        return web.Response(
+            text=metrics.render_prometheus(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    @_routes.get("/leon/ledger/report")
+    async def leon_ledger_report(request):
+        # ?window=<seconds>&node_class=<class>; rolling p50/p95 and throughput per model
+        from . import ledger
+        try:
+            window = float(request.query.get("window", ledger.DEFAULT_WINDOW_SECONDS))
+        except ValueError:
+            return web.json_response({"error": "window must be a number of seconds"}, status=400)
+        rows = ledger.report(window, node_class=request.query.get("node_class") or None)
+        return web.json_response({"window_seconds": window, "models": rows})
+
+    @_routes.get("/leon/calls")
+    async def leon_calls(request):
+        # Outstanding Leon API calls, oldest first, plus per-host slot usage.
+        # Schema "leon.calls/v1": {calls: [{id, node_class, node_id, prompt_id,
+        # model, stage, started_at, elapsed, requests, retries, bytes_out,
+        # bytes_in, holding_slot, cancel_reason}], hosts: [{host, in_flight, queued, limit}]}
+        from . import timings, transport
+        return web.json_response({
+            "schema": "leon.calls/v1",
+            "calls": [t.snapshot() for t in timings.in_flight()],
+            "hosts": transport.host_slots(),
+        })
+
+    @_routes.post("/leon/calls/{call_id}/cancel")
+    async def leon_cancel_call(request):
+        # Optional JSON body {"reason": "..."}; the call raises at its next check (<= 0.25s).
+        from . import timings
+        try:
+            call_id = int(request.match_info["call_id"])
+        except ValueError:
+            return web.json_response({"error": "call_id must be an integer"}, status=400)
+        reason = "cancelled via /leon/calls"
+        if request.can_read_body:
+            try:
+                reason = (await request.json()).get("reason") or reason
+            except Exception:
+                pass
+        timing = timings.cancel(call_id, reason)
+        if timing is None:
+            return web.json_response({"error": f"no running call {call_id}"}, status=404)
+        print(f"Leon calls: cancel requested for call {call_id} ({timing.node_class}): {reason}")
+        return web.json_response({"cancelled": True, "call": timing.snapshot()})
+
+
+__all__ = []
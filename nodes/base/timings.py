@@ -0,0 +1,342 @@
+import collections
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+from . import metrics
+from .job_journal import STATE_DIR
+
+
+# Per-call latency breakdown.
+#
+# A node method decorated with @instrument opens a CallTiming for the duration
+# of the call; code underneath (the transport, decoders, the MJ poller) adds
+# stage durations to whichever timing is current without it being passed
+# around. Stages used so far:
+#   image_resize, image_encode, queue_wait, connect (DNS + TCP + TLS),
+#   upload, ttfb, download, b64_decode, stream_decode (overlaps download), image_decode,
+#   tensor_conversion, mj_polling
+# Finished timings go to an in-memory ring buffer, a JSONL file and the
+# leon_call_stage_seconds histogram.
+
+RING_SIZE = int(os.environ.get("LEON_TIMINGS_RING_SIZE", "512"))
+# Set LEON_TIMINGS_FILE to "" to disable the JSONL sink.
+SINK_PATH = os.environ.get("LEON_TIMINGS_FILE", os.path.join(STATE_DIR, "timings.jsonl"))
+SINK_MAX_BYTES = 10 * 1024 * 1024
+
+_current = contextvars.ContextVar("leon_call_timing", default=None)
+_ring = collections.deque(maxlen=RING_SIZE)
+_ids = itertools.count(1)
+# Calls that have started and not finished, by id (watchdog, in-flight inspector).
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_sink_lock = threading.Lock()
+_sinks = []
+
+SECRET_MARKERS = ("key", "token", "secret", "authorization", "password")
+
+
+_node_context = None  # resolved once: how to ask ComfyUI which node is executing
+
+
+def _executing_node():
+    """(prompt_id, node_id) of the ComfyUI node being executed, or (None, None)."""
+    global _node_context
+    if _node_context is None:
+        try:
+            from comfy_execution.utils import get_executing_context
+            _node_context = get_executing_context
+        except Exception:
+            try:
+                from server import PromptServer
+                _node_context = lambda: PromptServer.instance  # has last_prompt_id / last_node_id
+            except Exception:
+                _node_context = lambda: None
+    try:
+        context = _node_context()
+    except Exception:
+        context = None
+    if context is None:
+        return None, None
+    return (getattr(context, "prompt_id", None) or getattr(context, "last_prompt_id", None),
+            getattr(context, "node_id", None) or getattr(context, "last_node_id", None))
+
+
+class CallTiming:
+    def __init__(self, node_class, model="", params=None):
+        self.node_class = node_class
+        self.model = model
+        self.params = params or {}
+        self.usage = {}
+        self.started_at = time.time()
+        self.stages = {}
+        self.requests = 0
+        self.retries = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.success = None
+        self.total = None
+        self.id = next(_ids)
+        self.thread_id = threading.get_ident()
+        # Live state for the watchdog and in-flight inspector.
+        self.io_threads = set()
+        self.bytes_in_progress = 0
+        self.cancel_reason = None
+        self.slot_host = None
+        self.prompt_id, self.node_id = _executing_node()
+        self._activities = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def activity(self, name):
+        """Mark what the call is doing right now, without recording a duration."""
+        with self._lock:
+            self._activities.append(name)
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._activities.remove(name)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        with self.activity(name):
+            try:
+                yield self
+            finally:
+                self.add(name, time.perf_counter() - start)
+
+    @property
+    def active_stage(self):
+        with self._lock:
+            return self._activities[-1] if self._activities else ""
+
+    def elapsed(self):
+        return self.total if self.total is not None else time.perf_counter() - self._t0
+
+    def cancel(self, reason):
+        """Ask the call to stop; it raises CallCancelled at its next interrupt check."""
+        self.cancel_reason = reason or "cancelled"
+
+    def snapshot(self):
+        """Live view of a running call for the /leon/calls inspector."""
+        return {
+            "id": self.id,
+            "node_class": self.node_class,
+            "node_id": self.node_id,
+            "prompt_id": self.prompt_id,
+            "model": self.model,
+            "stage": self.active_stage,
+            "started_at": self.started_at,
+            "elapsed": round(self.elapsed(), 3),
+            "requests": self.requests,
+            "retries": self.retries,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in + self.bytes_in_progress,
+            "holding_slot": self.slot_host,
+            "cancel_reason": self.cancel_reason,
+        }
+
+    def add_request(self, model="", bytes_out=0, bytes_in=0):
+        with self._lock:
+            self.requests += 1
+            self.bytes_out += bytes_out
+            self.bytes_in += bytes_in
+            if not self.model and model:
+                self.model = model
+
+    def to_dict(self):
+        return {
+            "node_class": self.node_class,
+            "model": self.model,
+            "started_at": self.started_at,
+            "total": self.total,
+            "success": self.success,
+            "requests": self.requests,
+            "retries": self.retries,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "stages": {k: round(v, 6) for k, v in self.stages.items()},
+            "params": self.params,
+            "usage": self.usage,
+        }
+
+
+def current():
+    return _current.get()
+
+
+def set_usage(usage):
+    """Attach token usage from an OpenAI (`usage`) or Gemini (`usageMetadata`) response."""
+    timing = _current.get()
+    if timing is None or not isinstance(usage, dict):
+        return
+    input_tokens = usage.get("prompt_tokens", usage.get("promptTokenCount"))
+    output_tokens = usage.get("completion_tokens", usage.get("candidatesTokenCount"))
+    with timing._lock:
+        if input_tokens is not None:
+            timing.usage["input_tokens"] = timing.usage.get("input_tokens", 0) + int(input_tokens)
+        if output_tokens is not None:
+            timing.usage["output_tokens"] = timing.usage.get("output_tokens", 0) + int(output_tokens)
+
+
+def summarize_params(*args, **kwargs):
+    """Small, secret-free summary of call parameters: scalars and short strings only."""
+    summary = {}
+    sources = [a for a in args if isinstance(a, dict)] + [kwargs]
+    for source in sources:
+        for k, v in source.items():
+            if any(marker in str(k).lower() for marker in SECRET_MARKERS):
+                continue
+            if isinstance(v, (bool, int, float)) or v is None:
+                summary[k] = v
+            elif isinstance(v, str):
+                summary[k] = v if len(v) <= 120 else v[:120] + f"... [{len(v)} chars]"
+    return summary
+
+
+def add(stage, seconds):
+    timing = _current.get()
+    if timing is not None:
+        timing.add(stage, seconds)
+
+
+@contextlib.contextmanager
+def activity(name):
+    """Label the current call's activity (e.g. an HTTP request) for live inspection."""
+    timing = _current.get()
+    if timing is None:
+        yield None
+        return
+    with timing.activity(name):
+        yield timing
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a block into the current call's `name` stage; a no-op outside a call."""
+    timing = _current.get()
+    if timing is None:
+        yield None
+        return
+    with timing.stage(name):
+        yield timing
+
+
+@contextlib.contextmanager
+def call(node_class, model="", params=None):
+    """Open a CallTiming for one node call. Nested calls fold into the outer one."""
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+    timing = CallTiming(node_class, model, params)
+    token = _current.set(timing)
+    with _in_flight_lock:
+        _in_flight[timing.id] = timing
+    try:
+        yield timing
+        timing.success = True
+    except BaseException:
+        timing.success = False
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(timing.id, None)
+        _current.reset(token)
+        _finish(timing)
+
+
+def instrument(method):
+    """Decorator for node methods that make API calls; tags timings with the node class."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with call(type(self).__name__, params=summarize_params(*args, **kwargs)):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def count_retry(retry_state):
+    """tenacity before_sleep hook: count a retry against the current call."""
+    timing = _current.get()
+    labels = {"node_class": timing.node_class, "model": timing.model} if timing is not None else {}
+    if timing is not None:
+        with timing._lock:
+            timing.retries += 1
+    metrics.inc("leon_retries_total", **labels)
+
+
+def register_sink(sink):
+    """Register a callable receiving every finished CallTiming (e.g. the SQLite ledger)."""
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+
+def _finish(timing):
+    timing.total = time.perf_counter() - timing._t0
+    _ring.append(timing)
+    labels = {"node_class": timing.node_class, "model": timing.model}
+    metrics.observe("leon_call_seconds", timing.total, **labels)
+    for name, seconds in timing.stages.items():
+        metrics.observe("leon_call_stage_seconds", seconds, stage=name, **labels)
+    _write(timing.to_dict())
+    for sink in list(_sinks):
+        try:
+            sink(timing)
+        except Exception as e:
+            print(f"Leon timings: sink {sink!r} failed: {str(e)}")
+
+
+def _write(record):
+    if not SINK_PATH:
+        return
+    line = json.dumps(record) + "\n"
+    with _sink_lock:
+        try:
+            os.makedirs(os.path.dirname(SINK_PATH), exist_ok=True)
+            if os.path.exists(SINK_PATH) and os.path.getsize(SINK_PATH) > SINK_MAX_BYTES:
+                os.replace(SINK_PATH, SINK_PATH + ".1")
+            with open(SINK_PATH, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Leon timings: failed to write {SINK_PATH}: {str(e)}")
+
+
+def in_flight():
+    """Calls currently running, oldest first."""
+    with _in_flight_lock:
+        return sorted(_in_flight.values(), key=lambda t: t.id)
+
+
+def cancel(call_id, reason="cancelled"):
+    """Cancel one running call by id; returns its CallTiming, or None if it isn't running."""
+    with _in_flight_lock:
+        timing = _in_flight.get(call_id)
+    if timing is not None:
+        timing.cancel(reason)
+    return timing
+
+
+def recent(limit=None):
+    """Most recent finished call timings as dicts, oldest first."""
+    items = list(_ring)
+    if limit:
+        items = items[-limit:]
+    return [t.to_dict() for t in items]
+
+
+__all__ = [
+    "CallTiming", "call", "instrument", "stage", "activity", "add", "current", "recent", "in_flight", "cancel",
+    "count_retry", "set_usage", "summarize_params", "register_sink",
+]
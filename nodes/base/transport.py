@@ -0,0 +1,481 @@
+import collections
+import concurrent.futures
+import contextvars
+import json
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from . import cassette, interrupt, metrics, timings, watchdog
+from .circuit_breaker import CircuitOpenError, get_breaker
+
+
+# Shared HTTP transport for every Leon node.
+# All outbound API traffic goes through request() so cross-cutting behaviour
+# (circuit breaking, fallbacks, concurrency limits, cancellation, metrics) is
+# implemented once instead of per node.
+
+
+class _Call:
+    """
+    The connection one worker is using, so a cancel can shut its socket down
+    and wake a worker still blocked on connect, upload or the response headers.
+    """
+
+    __slots__ = ("connection", "aborted")
+
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.connection = None
+        self.aborted = False
+
+    def attach(self, connection):
+        with self._lock:
+            self.connection = connection
+            connection._leon_call = self
+            if self.aborted:
+                self._shutdown()
+
+    def abort(self):
+        with self._lock:
+            self.aborted = True
+            self._shutdown()
+
+    def _shutdown(self):
+        # Only while this call still owns the connection; once it is back in
+        # the pool and picked up by another request, it is none of ours.
+        connection = self.connection
+        sock = getattr(connection, "sock", None)
+        if sock is None or getattr(connection, "_leon_call", None) is not self:
+            return
+        try:
+            # The plain socket's shutdown: SSLSocket.shutdown would also drop
+            # the SSL object under the thread that is reading from it.
+            socket.socket.shutdown(sock, socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+_current_call = contextvars.ContextVar("leon_http_call", default=None)
+
+
+class _TimedConnectionMixin:
+    # Splits a request into connect (DNS + TCP + TLS), upload and time-to-first-byte
+    # stages of the current call timing. Connects that happen lazily inside
+    # request() are subtracted from its upload time. Also registers the
+    # connection with the worker's _Call so a cancel can close it.
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            elapsed = time.perf_counter() - start
+            self._leon_connect_seconds = getattr(self, "_leon_connect_seconds", 0.0) + elapsed
+            timings.add("connect", elapsed)
+            call = _current_call.get()
+            if call is not None:
+                call.attach(self)
+
+    def request(self, *args, **kwargs):
+        call = _current_call.get()
+        if call is not None:
+            call.attach(self)
+        start = time.perf_counter()
+        connect_before = getattr(self, "_leon_connect_seconds", 0.0)
+        try:
+            return super().request(*args, **kwargs)
+        finally:
+            connect_during = getattr(self, "_leon_connect_seconds", 0.0) - connect_before
+            timings.add("upload", time.perf_counter() - start - connect_during)
+
+    def getresponse(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            timings.add("ttfb", time.perf_counter() - start)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, urllib3.connection.HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, urllib3.connection.HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+_session = requests.Session()
+_session.mount("http://", _TimedAdapter())
+_session.mount("https://", _TimedAdapter())
+
+# Concurrent requests allowed per host; extra callers queue for a slot.
+MAX_CONCURRENCY_PER_HOST = max(1, int(os.environ.get("LEON_MAX_CONCURRENCY_PER_HOST", "4")))
+CHUNK_SIZE = 64 * 1024
+# Default (connect, read) timeouts for callers that don't pass their own. The
+# read timeout applies between bytes, so it must cover a provider's silent
+# generation time, not the whole transfer.
+CONNECT_TIMEOUT = float(os.environ.get("LEON_CONNECT_TIMEOUT", "15"))
+READ_TIMEOUT = float(os.environ.get("LEON_READ_TIMEOUT", "300"))
+
+# Inside ComfyUI, calls run on these workers while the caller waits in short
+# slices, so a cancelled prompt returns immediately instead of after the read
+# completes. An abandoned call has its socket shut down, so the worker exits
+# whether it was connecting, uploading, waiting for headers or reading the body.
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix="leon-http")
+
+# Optional alternate backends used while a circuit is open, e.g.
+# LEON_FALLBACK_ENDPOINTS='{"https://api.hyprlab.io/v1/images/generations": "https://backup.example/v1/images/generations"}'
+try:
+    FALLBACK_ENDPOINTS = json.loads(os.environ.get("LEON_FALLBACK_ENDPOINTS", "") or "{}")
+except json.JSONDecodeError as e:
+    print(f"Leon transport: ignoring invalid LEON_FALLBACK_ENDPOINTS: {str(e)}")
+    FALLBACK_ENDPOINTS = {}
+
+
+# Reroute whole origins, e.g. to the offline mock server in nodes/bench:
+# LEON_HOST_OVERRIDES='{"https://api.hyprlab.io": "http://127.0.0.1:8765"}'
+try:
+    HOST_OVERRIDES = {
+        k.rstrip('/'): v.rstrip('/')
+        for k, v in json.loads(os.environ.get("LEON_HOST_OVERRIDES", "") or "{}").items()
+    }
+except (json.JSONDecodeError, AttributeError) as e:
+    print(f"Leon transport: ignoring invalid LEON_HOST_OVERRIDES: {str(e)}")
+    HOST_OVERRIDES = {}
+
+
+def _apply_host_override(url):
+    if not HOST_OVERRIDES:
+        return url
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    if origin in HOST_OVERRIDES:
+        return HOST_OVERRIDES[origin] + url[len(origin):]
+    return url
+
+
+# Provider label for metrics, by host. Unknown hosts are labelled by host name.
+PROVIDERS = {
+    "api.hyprlab.io": "hyprlab",
+    "generativelanguage.googleapis.com": "google",
+    "api.tu-zi.com": "tuzi",
+    "api.imgbb.com": "imgbb",
+}
+
+
+def provider_for(url):
+    parts = urlsplit(url)
+    if parts.netloc in PROVIDERS:
+        return PROVIDERS[parts.netloc]
+    if "/mj/" in parts.path:
+        return "midjourney"
+    return parts.netloc
+
+
+def endpoint_key(url):
+    """Normalize a URL to scheme://host/path so query strings (API keys, ids) don't split breakers."""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip('/'), "", ""))
+
+
+def host_key(url):
+    """scheme://host, the breaker key for GETs (CDN assets, one URL per image)."""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, "", "", ""))
+
+
+class _HostSlots:
+    """Per-host concurrency limiter whose waits are interruptible."""
+
+    def __init__(self, limit=MAX_CONCURRENCY_PER_HOST):
+        self.limit = limit
+        self._cond = threading.Condition()
+        self._in_flight = collections.Counter()
+        self._waiting = collections.Counter()
+
+    def acquire(self, host):
+        with self._cond:
+            self._waiting[host] += 1
+            try:
+                while self._in_flight[host] >= self.limit:
+                    self._cond.wait(interrupt.CHECK_INTERVAL)
+                    if interrupt.is_interrupted():
+                        interrupt.check()
+                self._in_flight[host] += 1
+            finally:
+                self._waiting[host] -= 1
+
+    def release(self, host):
+        with self._cond:
+            self._in_flight[host] -= 1
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            hosts = set(self._in_flight) | set(self._waiting)
+            return [{"host": h, "in_flight": self._in_flight[h], "queued": self._waiting[h], "limit": self.limit}
+                    for h in sorted(hosts)]
+
+    def samples(self):
+        with self._cond:
+            hosts = set(self._in_flight) | set(self._waiting)
+            return [("leon_host_in_flight", self._in_flight[h], {"host": h}) for h in hosts] + \
+                   [("leon_host_queue_depth", self._waiting[h], {"host": h}) for h in hosts]
+
+
+_slots = _HostSlots()
+metrics.register_collector(_slots.samples)
+watchdog.start()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _cancellable_sleep(cancelled, seconds):
+    if seconds > 0 and cancelled.wait(seconds):
+        raise _Cancelled()
+
+
+def _replay(tape, method, url, cancelled, kwargs):
+    kwargs.pop("stream", None)
+    sink = kwargs.pop("sink", None)
+    start = time.perf_counter()
+    response, download_seconds = tape.replay(
+        _session, method, url, kwargs, lambda seconds: _cancellable_sleep(cancelled, seconds)
+    )
+    timings.add("ttfb", time.perf_counter() - start)
+    with timings.stage("download"):
+        _cancellable_sleep(cancelled, download_seconds)
+        if sink is not None and sink.start(response):
+            sink.write(response.content)
+    return response
+
+
+def _perform(method, url, cancelled, kwargs, call=None):
+    if call is not None:
+        _current_call.set(call)
+    timing = timings.current()
+    if timing is None:
+        return _perform_request(method, url, cancelled, kwargs, None)
+    # Let the watchdog find this thread's stack and the bytes read so far.
+    timing.io_threads.add(threading.get_ident())
+    try:
+        return _perform_request(method, url, cancelled, kwargs, timing)
+    finally:
+        timing.io_threads.discard(threading.get_ident())
+
+
+def _perform_request(method, url, cancelled, kwargs, timing):
+    tape = cassette.current()
+    if tape is not None and cassette.MODE == "replay":
+        return _replay(tape, method, url, cancelled, kwargs)
+    # Always stream so the body is read in chunks and a cancel can stop it
+    # between chunks; callers that didn't ask for a stream get .content filled in.
+    # A `sink` (see download.py) takes the chunks of a successful response as
+    # they arrive instead, leaving .content empty.
+    wants_stream = kwargs.pop("stream", False)
+    sink = kwargs.pop("sink", None)
+    start = time.perf_counter()
+    response = _session.request(method, url, stream=True, **kwargs)
+    if wants_stream:
+        return response
+    ttfb = time.perf_counter() - start
+    if sink is not None and not sink.start(response):
+        sink = None
+    chunks = []
+    received = 0
+    with timings.stage("download"):
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if cancelled.is_set():
+                response.close()
+                raise _Cancelled()
+            if sink is not None:
+                sink.write(chunk)
+            else:
+                chunks.append(chunk)
+            received += len(chunk)
+            if timing is not None:
+                timing.bytes_in_progress += len(chunk)
+    if timing is not None:
+        timing.bytes_in_progress = 0
+    if sink is not None:
+        response._content = sink.getvalue() if tape is not None else b""
+        response._leon_bytes_read = received
+    else:
+        response._content = b"".join(chunks)
+    response._content_consumed = True
+    if tape is not None:
+        try:
+            tape.record(response, ttfb, time.perf_counter() - start)
+        except OSError as e:
+            print(f"Leon cassette: failed to record {endpoint_key(url)}: {str(e)}")
+    return response
+
+
+def _close_abandoned(future):
+    try:
+        future.result().close()
+    except BaseException:
+        pass
+
+
+def _send(method, url, kwargs, release):
+    """
+    Perform the request; `release` is called once its worker no longer uses
+    the connection: when the result is returned, or, for a cancelled call,
+    when the abandoned worker has exited.
+    """
+    cancelled = threading.Event()
+    if not interrupt.AVAILABLE and timings.current() is None:
+        try:
+            return _perform(method, url, cancelled, kwargs)
+        finally:
+            release()
+    call = _Call()
+    # Run in a copy of the caller's context so stage timings land on its call.
+    future = _executor.submit(contextvars.copy_context().run, _perform, method, url, cancelled, kwargs, call)
+    abandoned = False
+    try:
+        while True:
+            try:
+                return future.result(timeout=interrupt.CHECK_INTERVAL)
+            except concurrent.futures.TimeoutError:
+                interrupt.check()
+    except interrupt.InterruptProcessingException:
+        abandoned = True
+        cancelled.set()
+        call.abort()
+        future.add_done_callback(_close_abandoned)
+        future.add_done_callback(lambda _: release())
+        metrics.inc("leon_requests_cancelled_total", host=urlsplit(url).netloc)
+        raise
+    finally:
+        if not abandoned:
+            release()
+
+
+def _is_failure(response):
+    # Server-side errors mean the upstream is unhealthy. 4xx are our own bad
+    # requests (or rate limiting) and say nothing about availability.
+    return response.status_code >= 500
+
+
+def request(method, url, model="", endpoint=None, allow_fallback=True, **kwargs):
+    """
+    Issue an HTTP request through the shared session, guarded by the circuit
+    breaker for (endpoint, model). `endpoint` overrides the breaker key for
+    URLs that embed per-request ids (e.g. task polling). GETs without one are
+    keyed by host: image downloads use a fresh URL each time, and a breaker
+    per URL would never trip and never go away.
+    """
+    provider = provider_for(url)
+    url = _apply_host_override(url)
+    endpoint = endpoint or (host_key(url) if method == "GET" else endpoint_key(url))
+    breaker = get_breaker(endpoint, model)
+
+    try:
+        breaker.before_call()
+    except CircuitOpenError:
+        metrics.inc("leon_circuit_rejections_total", endpoint=endpoint, model=model)
+        fallback_url = FALLBACK_ENDPOINTS.get(url.rstrip('/')) or FALLBACK_ENDPOINTS.get(endpoint)
+        if allow_fallback and fallback_url:
+            print(f"Leon transport: circuit open for {endpoint}, falling back to {endpoint_key(fallback_url)}")
+            return request(method, fallback_url, model=model, allow_fallback=False, **kwargs)
+        raise
+
+    timing = timings.current()
+    if timing is not None and model and not timing.model:
+        timing.model = model
+    labels = {
+        "provider": provider,
+        "model": model,
+        "node_class": timing.node_class if timing is not None else "",
+    }
+    host = urlsplit(url).netloc
+    try:
+        with timings.stage("queue_wait"):
+            _slots.acquire(host)
+    except BaseException:
+        breaker.release_probe()
+        raise
+    if timing is not None:
+        timing.slot_host = host
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+    start = time.perf_counter()
+    try:
+        with timings.activity(f"http {method} {provider}"):
+            response = _send(method, url, kwargs, lambda: _slots.release(host))
+    except requests.exceptions.RequestException as e:
+        breaker.record_failure(e)
+        metrics.inc("leon_requests_total", status="error", **labels)
+        raise
+    except BaseException:
+        # Not the upstream's fault (e.g. interrupted); don't leave a probe hanging.
+        breaker.release_probe()
+        raise
+    finally:
+        # The slot itself is released by _send once the worker is done with
+        # the connection; on cancel that is as soon as its socket is shut
+        # down, so a re-queued job can't push a host past its limit.
+        if timing is not None:
+            timing.slot_host = None
+
+    body = response.request.body
+    bytes_out = len(body) if isinstance(body, (bytes, str)) else 0
+    bytes_in = getattr(response, "_leon_bytes_read", None)
+    if bytes_in is None:
+        bytes_in = len(response._content) if response._content_consumed and response._content else 0
+    metrics.inc("leon_requests_total", status=str(response.status_code), **labels)
+    metrics.observe("leon_request_seconds", time.perf_counter() - start, **labels)
+    metrics.inc("leon_bytes_sent_total", bytes_out, **labels)
+    metrics.inc("leon_bytes_received_total", bytes_in, **labels)
+    if timing is not None:
+        timing.add_request(model=model, bytes_out=bytes_out, bytes_in=bytes_in)
+
+    if _is_failure(response):
+        breaker.record_failure(f"HTTP {response.status_code}")
+    else:
+        breaker.record_success()
+    return response
+
+
+def host_slots():
+    """Per-host in-flight/queued counts for the /leon/calls inspector."""
+    return _slots.snapshot()
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+__all__ = ["request", "get", "post", "host_slots", "endpoint_key", "host_key", "provider_for", "CircuitOpenError", "MAX_CONCURRENCY_PER_HOST"]
@@ -0,0 +1,241 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from . import log, metrics, transport
+from .circuit_breaker import CircuitOpenError
+from .interrupt import InterruptProcessingException
+from .job_journal import STATE_DIR
+
+
+# Upload-once for large image inputs.
+#
+# Tensor inputs travel as data:image/png;base64 strings inside the JSON body,
+# so a 4K reference adds ~20 MB to the request and again to every retry and
+# every re-run. Above THRESHOLD_BYTES, the image is uploaded once instead
+# (HyprLab /v1/uploads, or the Gemini Files API for Google's native
+# endpoint) and the request carries the returned reference. References are
+# cached by a hash of the image data in a small JSONL file, so repeat runs
+# with the same image skip the upload too. If an upload fails, the image is
+# sent inline as before.
+
+# Inline images larger than this (base64 characters) are uploaded; 0 disables.
+THRESHOLD_BYTES = int(os.environ.get("LEON_UPLOAD_THRESHOLD_BYTES", str(2 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.environ.get("LEON_UPLOAD_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Gemini deletes uploaded files after 48 hours.
+GEMINI_FILE_TTL_SECONDS = 47 * 3600
+CACHE_PATH = os.path.join(STATE_DIR, "uploads.jsonl")
+COMPACT_EVERY = 100
+
+logger = log.get_logger("uploads")
+
+
+class UploadCache:
+    """Content hash -> uploaded reference, persisted as JSONL and pruned by expiry."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None  # key -> record, loaded lazily
+        self._appends = 0
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn write from a crash
+                    self._entries[record.get("key")] = record
+        except OSError as e:
+            logger.warning("Leon upload cache: failed to read %s: %s", self.path, e)
+        self._compact()
+
+    def _compact(self):
+        now = time.time()
+        self._entries = {key: rec for key, rec in self._entries.items() if key and rec.get("expires_at", 0) > now}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for rec in self._entries.values():
+                    f.write(json.dumps(rec) + "\n")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Leon upload cache: failed to compact %s: %s", self.path, e)
+        self._appends = 0
+
+    def get(self, key):
+        with self._lock:
+            self._load()
+            rec = self._entries.get(key)
+            if rec is None or rec.get("expires_at", 0) <= time.time():
+                metrics.inc("leon_cache_misses_total", cache="uploads")
+                return None
+            metrics.inc("leon_cache_hits_total", cache="uploads")
+            return rec["ref"]
+
+    def put(self, key, ref, ttl_seconds):
+        record = {"key": key, "ref": ref, "expires_at": time.time() + ttl_seconds}
+        with self._lock:
+            self._load()
+            self._entries[key] = record
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                logger.warning("Leon upload cache: failed to append to %s: %s", self.path, e)
+            self._appends += 1
+            if self._appends >= COMPACT_EVERY:
+                self._compact()
+
+
+cache = UploadCache(CACHE_PATH)
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _split_data_uri(data_uri):
+    """(mime type, raw bytes) of a data:image/...;base64,... string."""
+    header, b64_data = data_uri.split(",", 1)
+    return header[len("data:"):].split(";")[0] or "image/png", base64.b64decode(b64_data)
+
+
+def _large(value):
+    return THRESHOLD_BYTES > 0 and isinstance(value, str) and len(value) > THRESHOLD_BYTES
+
+
+def _cached_upload(key, size, ttl_seconds, upload):
+    """The cached reference for key, or upload() it; None (send inline) if the upload fails."""
+    ref = cache.get(key)
+    outcome = "cached"
+    if ref is not None:
+        logger.info("Reusing uploaded image for a %d-byte inline image", size)
+    else:
+        outcome = "uploaded"
+        try:
+            ref = upload()
+        except (CircuitOpenError, InterruptProcessingException):
+            raise
+        except Exception as e:
+            logger.warning("Image upload failed, sending it inline: %s", e)
+            metrics.inc("leon_upload_offload_total", outcome="failed")
+            return None
+        cache.put(key, ref, ttl_seconds)
+        logger.info("Uploaded a %d-byte inline image once: %s", size, ref)
+    metrics.inc("leon_upload_offload_total", outcome=outcome)
+    metrics.inc("leon_upload_offload_bytes_total", size)
+    return ref
+
+
+# -- HyprLab ------------------------------------------------------------------
+
+def _hyprlab_upload(uploads_url, api_key, data_uri):
+    mime, raw = _split_data_uri(data_uri)
+    files = {"file": (f"image.{mime.split('/')[-1]}", raw, mime)}
+    response = transport.post(uploads_url, headers={"Authorization": f"Bearer {api_key.strip()}"}, files=files)
+    response.raise_for_status()
+    result = response.json()
+    for key in ("imageUrl", "url"):
+        if result.get(key):
+            return result[key]
+    raise ValueError(f"Unexpected HyprLab upload response: {result}")
+
+
+def offload(payload, api_url, api_key):
+    """
+    The payload with every data:image string above THRESHOLD_BYTES replaced by
+    the URL of a one-time HyprLab upload. Payloads for other providers, and
+    ones without large inline images, come back unchanged.
+    """
+    if THRESHOLD_BYTES <= 0 or transport.provider_for(api_url) != "hyprlab":
+        return payload
+    parts = urlsplit(api_url)
+    uploads_url = urlunsplit((parts.scheme, parts.netloc, "/v1/uploads", "", ""))
+    # Uploads belong to the key's account, so the key is part of the cache key.
+    scope = _digest(api_key)[:16]
+
+    def swap(value):
+        if isinstance(value, dict):
+            return {k: swap(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [swap(v) for v in value]
+        if _large(value) and value.startswith("data:image"):
+            ref = _cached_upload(f"hyprlab:{scope}:{_digest(value)}", len(value), CACHE_TTL_SECONDS,
+                                 lambda: _hyprlab_upload(uploads_url, api_key, value))
+            return ref or value
+        return value
+
+    return swap(payload)
+
+
+# -- Gemini Files API -----------------------------------------------------------
+
+def _gemini_upload(api_url, api_key, mime, b64_data, display_name):
+    raw = base64.b64decode(b64_data)
+    parts = urlsplit(api_url)
+    start = transport.post(
+        urlunsplit((parts.scheme, parts.netloc, "/upload" + parts.path.rstrip("/") + "/files", "", "")),
+        headers={
+            "x-goog-api-key": api_key,
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Length": str(len(raw)),
+            "X-Goog-Upload-Header-Content-Type": mime,
+            "Content-Type": "application/json",
+        },
+        json={"file": {"display_name": display_name}},
+    )
+    start.raise_for_status()
+    upload_url = start.headers.get("x-goog-upload-url")
+    if not upload_url:
+        raise ValueError("Gemini Files API did not return an upload URL")
+    response = transport.post(upload_url, headers={
+        "X-Goog-Upload-Offset": "0",
+        "X-Goog-Upload-Command": "upload, finalize",
+    }, data=raw)
+    response.raise_for_status()
+    return response.json()["file"]["uri"]
+
+
+def offload_gemini(payload, api_url, api_key):
+    """
+    The generateContent payload with inlineData parts above THRESHOLD_BYTES
+    replaced by fileData parts pointing at Gemini Files API uploads.
+    """
+    if THRESHOLD_BYTES <= 0:
+        return payload
+    # Uploaded files belong to the key's project, so the key is part of the cache key.
+    scope = _digest(api_key)[:16]
+    contents = []
+    for content in payload.get("contents", []):
+        parts = []
+        for part in content.get("parts", []):
+            inline = part.get("inlineData") if isinstance(part, dict) else None
+            if inline and _large(inline.get("data")):
+                digest = _digest(inline["data"])
+                uri = _cached_upload(
+                    f"gemini:{scope}:{digest}", len(inline["data"]), min(CACHE_TTL_SECONDS, GEMINI_FILE_TTL_SECONDS),
+                    lambda: _gemini_upload(api_url, api_key, inline["mimeType"], inline["data"], f"leon-{digest[:16]}"),
+                )
+                if uri:
+                    part = {"fileData": {"mimeType": inline["mimeType"], "fileUri": uri}}
+            parts.append(part)
+        contents.append(dict(content, parts=parts))
+    return dict(payload, contents=contents)
+
+
+__all__ = ["offload", "offload_gemini", "cache", "UploadCache", "THRESHOLD_BYTES"]
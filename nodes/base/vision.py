@@ -0,0 +1,143 @@
+import base64
+import io
+import json
+import os
+
+from PIL import Image
+
+from . import encoding, log, metrics, timings
+from .job_journal import STATE_DIR
+
+
+# Vision-input pre-sizing.
+#
+# Vision models don't look at a 4K image at 4K: each one scales inputs down to
+# its own working resolution before tiling them into tokens. Sending more than
+# that costs upload time and bytes (and, for models that bill by tile, prompt
+# tokens) for pixels the model throws away, and delays the first token. The
+# LLM and Official Gemini nodes therefore shrink image inputs to the model's
+# effective resolution before encoding them.
+#
+# A profile gives up to three limits; an image is scaled down (never up) until
+# it meets all of them:
+#   max_side        longest side in pixels
+#   max_short_side  shortest side in pixels
+#   max_pixels      total pixel count
+# Profiles are matched by the longest key contained in the model name, "*"
+# being the fallback. Entries in LEON_VISION_PROFILES (a JSON file of the same
+# shape as PROFILES) replace the built-in ones; LEON_VISION_PRESIZE=0 turns
+# pre-sizing off.
+
+ENABLED = os.environ.get("LEON_VISION_PRESIZE", "1") != "0"
+PROFILES_PATH = os.environ.get("LEON_VISION_PROFILES", os.path.join(STATE_DIR, "vision_profiles.json"))
+
+PROFILES = {
+    # Fit in 2048x2048, then shortest side 768 (high-detail 512px tiles).
+    "gpt-4": {"max_side": 2048, "max_short_side": 768},
+    "gpt-5": {"max_side": 2048, "max_short_side": 768},
+    "o3": {"max_side": 2048, "max_short_side": 768},
+    "o4": {"max_side": 2048, "max_short_side": 768},
+    # Long edge 1568, about 1.15 megapixels.
+    "claude": {"max_side": 1568, "max_pixels": 1_150_000},
+    # 768x768 tiles; 2x2 tiles is where extra detail stops paying off.
+    "gemini": {"max_side": 1536},
+    "*": {"max_side": 1568},
+}
+
+logger = log.get_logger("vision")
+
+_profiles = None
+_profiles_mtime = None
+
+
+def load_profiles():
+    """Built-in profiles with the LEON_VISION_PROFILES file on top, re-read when it changes."""
+    global _profiles, _profiles_mtime
+    try:
+        mtime = os.path.getmtime(PROFILES_PATH)
+    except OSError:
+        return PROFILES
+    if mtime != _profiles_mtime:
+        try:
+            with open(PROFILES_PATH, "r", encoding="utf-8") as f:
+                _profiles = dict(PROFILES, **json.load(f))
+        except (OSError, json.JSONDecodeError, TypeError) as e:
+            logger.warning("Leon vision: failed to read profiles %s: %s", PROFILES_PATH, e)
+            _profiles = PROFILES
+        _profiles_mtime = mtime
+    return _profiles
+
+
+def profile_for(model):
+    profiles = load_profiles()
+    name = (model or "").lower()
+    matches = [key for key in profiles if key != "*" and key.lower() in name]
+    return profiles[max(matches, key=len)] if matches else profiles.get("*", {})
+
+
+def fit(size, profile):
+    """The largest (width, height) no bigger than `size` that meets the profile's limits."""
+    width, height = size
+    scale = 1.0
+    if profile.get("max_side"):
+        scale = min(scale, profile["max_side"] / max(width, height))
+    if profile.get("max_short_side"):
+        scale = min(scale, profile["max_short_side"] / min(width, height))
+    if profile.get("max_pixels"):
+        scale = min(scale, (profile["max_pixels"] / (width * height)) ** 0.5)
+    if scale >= 1.0:
+        return size
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def presize(pil_image, model):
+    """The image scaled down to the model's effective resolution (unchanged if it already fits)."""
+    if not ENABLED:
+        return pil_image
+    size = fit(pil_image.size, profile_for(model))
+    if size == pil_image.size:
+        return pil_image
+    with timings.stage("image_resize"):
+        resized = pil_image.resize(size, Image.Resampling.LANCZOS)
+    logger.info("Vision pre-size for %s: %dx%d -> %dx%d", model, pil_image.width, pil_image.height, *size)
+    metrics.inc("leon_vision_presize_total", model=model)
+    metrics.inc("leon_vision_presize_pixels_saved_total",
+                pil_image.width * pil_image.height - size[0] * size[1], model=model)
+    return resized
+
+
+def encode_tensor(tensor_image, model, policy, mode=None):
+    """(bytes, mime type) of an IMAGE tensor, pre-sized for `model` and encoded under `policy`."""
+    pil_image = encoding.tensor_to_pil(tensor_image)
+    if mode is not None:
+        pil_image = pil_image.convert(mode)
+    return encoding.encode_pil(presize(pil_image, model), policy)
+
+
+def presize_base64(b64_data, mime, model, policy):
+    """
+    (base64, mime type) of an inline image, re-encoded under `policy` only if
+    it had to be scaled down for `model`; otherwise the input is returned as is.
+    """
+    if not ENABLED:
+        return b64_data, mime
+    try:
+        pil_image = Image.open(io.BytesIO(base64.b64decode(b64_data)))
+    except Exception:
+        return b64_data, mime  # not something PIL reads; let the provider judge it
+    if fit(pil_image.size, profile_for(model)) == pil_image.size:
+        return b64_data, mime
+    data, mime = encoding.encode_pil(presize(pil_image, model), policy)
+    return base64.b64encode(data).decode("utf-8"), mime
+
+
+def presize_data_uri(value, model, policy):
+    """An IMAGE_ARRAY entry pre-sized for `model`; URLs are passed through."""
+    if not isinstance(value, str) or not value.startswith("data:image"):
+        return value
+    header, b64_data = value.split(",", 1)
+    b64_resized, mime = presize_base64(b64_data, header[len("data:"):].split(";")[0], model, policy)
+    return value if b64_resized is b64_data else f"data:{mime};base64,{b64_resized}"
+
+
+__all__ = ["presize", "presize_base64", "presize_data_uri", "encode_tensor", "profile_for", "fit", "PROFILES"]
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+import traceback
+
+from . import metrics, timings
+
+
+# Slow-call watchdog.
+#
+# A daemon thread looks at the in-flight calls every CHECK_SECONDS. A call
+# running longer than LEON_SLOW_CALL_SECONDS gets one log entry per threshold
+# crossed (so at 2x, 3x, ... again) with its current stage, bytes moved so far
+# and the Python stacks of the node thread and any HTTP worker serving it.
+# With LEON_ABORT_CALL_SECONDS set, calls past that age are cancelled: they
+# raise CallCancelled at their next interrupt check, which closes the socket.
+
+SLOW_CALL_SECONDS = float(os.environ.get("LEON_SLOW_CALL_SECONDS", "120"))
+ABORT_AFTER_SECONDS = float(os.environ.get("LEON_ABORT_CALL_SECONDS", "0"))
+CHECK_SECONDS = 5.0
+
+_thread = None
+_thread_lock = threading.Lock()
+_warned = {}  # call id -> number of thresholds already reported
+
+
+def _format_stacks(timing):
+    frames = sys._current_frames()
+    lines = []
+    for label, ident in [("node thread", timing.thread_id)] + [("http worker", t) for t in sorted(timing.io_threads)]:
+        frame = frames.get(ident)
+        if frame is None:
+            continue
+        lines.append(f"  --- {label} {ident} ---")
+        lines.extend("  " + line.rstrip("\n") for line in traceback.format_stack(frame))
+    return "\n".join(lines)
+
+
+def describe(timing):
+    return (
+        f"{timing.node_class} (model={timing.model or '?'}) running {timing.elapsed():.0f}s,"
+        f" stage={timing.active_stage or '?'}, sent={timing.bytes_out / 1024:.0f} KiB,"
+        f" received={(timing.bytes_in + timing.bytes_in_progress) / 1024:.0f} KiB,"
+        f" requests={timing.requests}, retries={timing.retries}"
+    )
+
+
+def check_once():
+    live = timings.in_flight()
+    live_ids = {t.id for t in live}
+    for call_id in list(_warned):
+        if call_id not in live_ids:
+            del _warned[call_id]
+
+    for timing in live:
+        elapsed = timing.elapsed()
+        if ABORT_AFTER_SECONDS and elapsed > ABORT_AFTER_SECONDS and timing.cancel_reason is None:
+            print(f"Leon watchdog: aborting {describe(timing)}")
+            timing.cancel(f"aborted by watchdog after {ABORT_AFTER_SECONDS:.0f}s")
+            metrics.inc("leon_calls_aborted_total", node_class=timing.node_class, model=timing.model)
+            continue
+        if not SLOW_CALL_SECONDS:
+            continue
+        crossed = int(elapsed // SLOW_CALL_SECONDS)
+        if crossed > _warned.get(timing.id, 0):
+            _warned[timing.id] = crossed
+            metrics.inc("leon_slow_calls_total", node_class=timing.node_class, model=timing.model)
+            print(f"Leon watchdog: slow call {describe(timing)}\n{_format_stacks(timing)}")
+
+
+def _run():
+    while True:
+        try:
+            check_once()
+        except Exception as e:
+            print(f"Leon watchdog: check failed: {str(e)}")
+        threading.Event().wait(CHECK_SECONDS)
+
+
+def start():
+    """Start the watchdog thread once; does nothing if both thresholds are disabled."""
+    global _thread
+    if not SLOW_CALL_SECONDS and not ABORT_AFTER_SECONDS:
+        return
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="leon-watchdog", daemon=True)
+            _thread.start()
+
+
+__all__ = ["start", "check_once", "describe", "SLOW_CALL_SECONDS", "ABORT_AFTER_SECONDS"]
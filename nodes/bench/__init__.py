@@ -0,0 +1,3 @@
+# Offline benchmarking tools (mock provider server, load and codec benchmarks).
+# Not imported by ComfyUI; run from the repository root, e.g.
+#   python -m nodes.bench.mock_server --port 8765
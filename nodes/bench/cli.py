@@ -0,0 +1,26 @@
+import argparse
+
+
+# leon-bench entry point; see the leon-bench script in the repository root.
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="leon-bench", description="Benchmarks for the Leon nodes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    from . import codec, load, startup
+    load.add_arguments(subparsers.add_parser("load", help="Throughput/latency of real nodes against the mock server"))
+    codec.add_arguments(subparsers.add_parser("codec", help="Micro-benchmarks of local image encode/decode paths"))
+    startup.add_arguments(subparsers.add_parser("startup", help="Package import time and /object_info latency"))
+
+    args = parser.parse_args(argv)
+    if args.command == "load":
+        return load.run(args)
+    if args.command == "codec":
+        return codec.run(args)
+    if args.command == "startup":
+        return startup.run(args)
+    return 2
+
+
+__all__ = ["main"]
@@ -0,0 +1,264 @@
+import gc
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+
+# Codec micro-benchmarks: the local image paths every node call goes through
+# (tensor -> data URI, base64 -> tensor, 4-grid split, yellow-tint clean).
+# Cases run the node code itself wherever it exists as a callable, so a
+# change to those methods shows up here. Timing uses warmup + repeats and
+# reports median/MAD; memory is measured in a separate pass so tracemalloc
+# doesn't skew the timings.
+
+DEFAULT_CASES = ["encode_png", "encode_jpeg", "encode_webp", "decode_b64", "decode_b64_batch", "pil_to_rgba_tensor", "split_4grid", "auto_adjust"]
+DEFAULT_SIZES = [512, 1024, 2048, 4096]
+DEFAULT_BATCHES = [1, 8, 32]
+DEFAULT_CHANNELS = [3, 4]
+COMPARED_METRICS = {"median_ms": "lower"}
+
+
+def make_batch(size, batch, channels, kind="gradient", seed=0):
+    """Deterministic (B, H, W, C) float32 tensor in ComfyUI's IMAGE layout."""
+    import numpy as np
+    import torch
+
+    rng = np.random.default_rng(seed)
+    if kind == "noise":
+        array = rng.random((batch, size, size, channels), dtype=np.float32)
+    else:
+        # Photo-like: smooth gradients with mild grain, so codecs see realistic entropy.
+        ramp = np.linspace(0.0, 1.0, size, dtype=np.float32)
+        base = np.empty((size, size, channels), dtype=np.float32)
+        for c in range(channels):
+            base[..., c] = np.add.outer(ramp * (0.3 + 0.2 * c), ramp[::-1] * 0.4) % 1.0
+        array = np.repeat(base[None], batch, axis=0)
+        array += rng.normal(0.0, 0.02, size=array.shape).astype(np.float32)
+        np.clip(array, 0.0, 1.0, out=array)
+    if channels == 4:
+        array[..., 3] = 1.0
+    return torch.from_numpy(array)
+
+
+def _decode_b64_to_tensor(b64_data):
+    # The inline-base64 path every engine-backed node takes.
+    from ..base import engine
+
+    return engine.load_image(engine.ParsedResponse(data=b64_data))
+
+
+def build_case(name, images):
+    """Return a zero-argument callable processing every image in the batch once."""
+    from ..base import encoding
+    from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
+    from ..img.midjourney_proxy_node import Leon_Midjourney_Describe_API_Node
+    from ..util.utility_nodes import Leon_Image_Split_4Grid_Node
+    from ..util.yellow_tint_cleaner_node import Leon_Yellow_Tint_Cleaner_Node
+
+    frames = [images[i:i + 1] for i in range(images.shape[0])]
+    if name == "encode_png":
+        encode = HyprLabImageGenerationNodeBase()._tensor_to_base64_data_uri
+        return lambda: [encode(f) for f in frames]
+    if name == "encode_jpeg":
+        encode = Leon_Midjourney_Describe_API_Node()._tensor_to_base64
+        return lambda: [encode(f) for f in frames]
+    if name == "encode_webp":
+        webp = encoding.Policy.parse("webp:90")
+        return lambda: [encoding.to_data_uri(f, webp) for f in frames]
+    if name == "decode_b64":
+        encoded = [HyprLabImageGenerationNodeBase()._tensor_to_base64_data_uri(f).split(",", 1)[1] for f in frames]
+        return lambda: [_decode_b64_to_tensor(b) for b in encoded]
+    if name == "decode_b64_batch":
+        from ..base import engine
+
+        parsed = [engine.ParsedResponse(data=HyprLabImageGenerationNodeBase()._tensor_to_base64_data_uri(f).split(",", 1)[1])
+                  for f in frames]
+        return lambda: engine.load_images(parsed)
+    if name == "pil_to_rgba_tensor":
+        node = Leon_Image_Split_4Grid_Node()
+        pil_images = [node._tensor_to_pil(f) for f in frames]
+        return lambda: [node._pil_to_rgba_tensor(p) for p in pil_images]
+    if name == "split_4grid":
+        node = Leon_Image_Split_4Grid_Node()
+        return lambda: [node.split_image_grid(f) for f in frames]
+    if name == "auto_adjust":
+        node = Leon_Yellow_Tint_Cleaner_Node()
+        return lambda: node.clean_yellow_tint(images)
+    raise ValueError(f"Unknown case: {name}")
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _RssSampler(threading.Thread):
+    """Polls resident memory while a case runs; PIL and torch allocate outside tracemalloc."""
+
+    def __init__(self, interval=0.001):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.start_rss = _rss_bytes()
+        self.peak_rss = self.start_rss
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            rss = _rss_bytes()
+            if rss is not None and rss > self.peak_rss:
+                self.peak_rss = rss
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return (self.peak_rss - self.start_rss) if self.start_rss is not None else None
+
+
+def measure_memory(call):
+    """(python_peak_mb, rss_growth_mb) for one run of call."""
+    gc.collect()
+    sampler = _RssSampler()
+    sampler.start()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        growth = sampler.stop()
+    return peak / 2**20, (growth / 2**20 if growth is not None else None)
+
+
+def run_case(name, size, batch, channels, warmup=2, repeats=7, kind="gradient"):
+    images = make_batch(size, batch, channels, kind)
+    call = build_case(name, images)
+    for _ in range(warmup):
+        call()
+
+    samples = []
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    median = statistics.median(samples)
+    mad = statistics.median(abs(s - median) for s in samples)
+    python_peak_mb, rss_growth_mb = measure_memory(call)
+    return {
+        "case": name, "size": size, "batch": batch, "channels": channels, "repeats": repeats,
+        "median_ms": median * 1000, "mad_ms": mad * 1000, "min_ms": min(samples) * 1000,
+        "per_image_ms": median * 1000 / batch,
+        "mpix_per_s": (size * size * batch / 1e6) / median if median else 0.0,
+        "python_peak_mb": python_peak_mb, "rss_growth_mb": rss_growth_mb,
+    }
+
+
+def case_key(result):
+    return f"{result['case']}|{result['size']}|b{result['batch']}|c{result['channels']}"
+
+
+def compare(results, baseline, tolerance):
+    """Return regressions beyond tolerance that also exceed 3x the combined MAD (noise floor)."""
+    previous = {case_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if not old:
+            continue
+        for metric, better in COMPARED_METRICS.items():
+            new_value, old_value = result.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            noise = 3 * (result.get("mad_ms", 0) + old.get("mad_ms", 0))
+            worse = change > tolerance if better == "lower" else -change > tolerance
+            if worse and abs(new_value - old_value) > noise:
+                regressions.append(f"{case_key(result)} {metric}: {old_value:.2f} -> {new_value:.2f} ({change:+.0%})")
+    return regressions
+
+
+def format_table(results):
+    header = f"{'case':<36} {'median ms':>10} {'mad ms':>8} {'ms/img':>8} {'Mpix/s':>8} {'py MB':>8} {'rss MB':>8}"
+    lines = [header]
+    for r in results:
+        rss = f"{r['rss_growth_mb']:.0f}" if r["rss_growth_mb"] is not None else "-"
+        lines.append(
+            f"{case_key(r):<36} {r['median_ms']:>10.1f} {r['mad_ms']:>8.2f} {r['per_image_ms']:>8.1f}"
+            f" {r['mpix_per_s']:>8.1f} {r['python_peak_mb']:>8.0f} {rss:>8}"
+        )
+    return "\n".join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument("--case", nargs="+", default=DEFAULT_CASES, choices=DEFAULT_CASES)
+    parser.add_argument("--size", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--batch", nargs="+", type=int, default=DEFAULT_BATCHES)
+    parser.add_argument("--channels", nargs="+", type=int, default=DEFAULT_CHANNELS, choices=DEFAULT_CHANNELS)
+    parser.add_argument("--image-kind", default="gradient", choices=["gradient", "noise"])
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--max-input-mb", type=float, default=1024.0,
+                        help="Skip cases whose float32 input batch would exceed this size")
+    parser.add_argument("--output", default=None, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+
+
+def run(args):
+    from ..base.job_journal import STATE_DIR
+
+    results = []
+    skipped = []
+    for size in args.size:
+        for batch in args.batch:
+            for channels in args.channels:
+                input_mb = size * size * channels * 4 * batch / 2**20
+                if input_mb > args.max_input_mb:
+                    skipped.append(f"{size}|b{batch}|c{channels} ({input_mb:.0f} MB input)")
+                    continue
+                for name in args.case:
+                    result = run_case(name, size, batch, channels, args.warmup, args.repeats, args.image_kind)
+                    results.append(result)
+                    print(format_table([result]).splitlines()[1], flush=True)
+
+    print()
+    print(format_table(results))
+    if skipped:
+        print(f"\nSkipped {len(skipped)} shape(s) above --max-input-mb {args.max_input_mb:.0f}: {', '.join(skipped)}")
+    report = {"kind": "codec", "created_at": time.time(), "python": sys.version.split()[0],
+              "settings": {"warmup": args.warmup, "repeats": args.repeats, "image_kind": args.image_kind},
+              "results": results}
+    output = args.output or os.path.join(STATE_DIR, "results", f"codec-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+__all__ = ["run", "run_case", "compare", "add_arguments", "make_batch", "build_case", "measure_memory"]
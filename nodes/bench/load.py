@@ -0,0 +1,229 @@
+import concurrent.futures
+import contextlib
+import io
+import json
+import math
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+# Load benchmark: runs real node classes headlessly against the mock server
+# (started in a child process so its CPU and memory don't count) and sweeps
+# concurrency x image size x response format. Reports requests/sec, latency
+# percentiles, CPU seconds per request and peak RSS, and stores the results as
+# a JSON baseline that later runs are compared against.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_SCENARIOS = ["flux", "llm_chat", "image_array"]
+DEFAULT_CONCURRENCY = [1, 4, 16]
+DEFAULT_SIZES = [512, 1024, 2048]
+DEFAULT_FORMATS = ["url", "b64_json"]
+COMPARED_METRICS = {"rps": "higher", "p50_ms": "lower", "p95_ms": "lower", "cpu_ms_per_request": "lower"}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def mock_server_process(image_size, latency_ms, extra_args=()):
+    port = _free_port()
+    # Run the file directly so the child doesn't import the node package (torch etc.).
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, "nodes", "bench", "mock_server.py"), "--port", str(port),
+         "--image-size", str(image_size), "--latency-ms", str(latency_ms), *extra_args],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 15
+        while True:
+            try:
+                urllib.request.urlopen(f"{base_url}/__mock__/stats", timeout=1).read()
+                break
+            except OSError:
+                if proc.poll() is not None or time.time() > deadline:
+                    raise RuntimeError(f"Mock server failed to start: {proc.stderr.read().decode(errors='replace')}")
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def _scenario_call(name, base_url, image_size, response_format, index):
+    """Return a zero-argument callable running one node execution."""
+    import torch
+    from ..img.flux_nodes import Leon_Flux_Image_API_Node
+    from ..llm.llm_api_nodes import Leon_LLM_Chat_API_Node
+    from ..util.utility_nodes import Leon_Image_Array_Builder_Node
+
+    if name == "flux":
+        node = Leon_Flux_Image_API_Node()
+        side = min(1440, image_size - image_size % 32)
+        return lambda: node.generate_flux_image(
+            model_choice="FLUX 1.1 Pro", prompt=f"benchmark {index}", response_format=response_format,
+            output_format="png", seed=index, api_url=f"{base_url}/v1/images/generations", api_key="bench",
+            width=side, height=side,
+        )
+    if name == "llm_chat":
+        node = Leon_LLM_Chat_API_Node()
+        return lambda: node.chat_completion(
+            model="mock-gpt", user_message=f"benchmark {index}", api_url=f"{base_url}/v1/chat/completions",
+            api_key="bench", max_tokens=256,
+        )
+    if name == "image_array":
+        node = Leon_Image_Array_Builder_Node()
+        images = {f"image_{i}": torch.rand(1, image_size, image_size, 3) for i in range(1, 5)}
+        output_mode = "url" if response_format == "url" else "base64"
+        return lambda: node.build_image_array(output_mode=output_mode, api_key="bench", **images)
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024.0 if sys.platform != "darwin" else peak / (1024.0 * 1024.0)
+
+
+def run_case(scenario, base_url, image_size, response_format, concurrency, requests, warmup=2):
+    calls = [_scenario_call(scenario, base_url, image_size, response_format, i) for i in range(requests + warmup)]
+    for call in calls[:warmup]:
+        call()
+
+    latencies = []
+    errors = 0
+
+    def timed(call):
+        start = time.perf_counter()
+        call()
+        return time.perf_counter() - start
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    wall_start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in concurrent.futures.as_completed([pool.submit(timed, c) for c in calls[warmup:]]):
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    wall = time.perf_counter() - wall_start
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+
+    latencies.sort()
+    ok = len(latencies)
+    return {
+        "scenario": scenario, "image_size": image_size, "response_format": response_format,
+        "concurrency": concurrency, "requests": requests, "errors": errors,
+        "rps": ok / wall if wall else 0.0,
+        "p50_ms": _percentile(latencies, 0.50) * 1000 if ok else None,
+        "p95_ms": _percentile(latencies, 0.95) * 1000 if ok else None,
+        "p99_ms": _percentile(latencies, 0.99) * 1000 if ok else None,
+        "mean_ms": statistics.mean(latencies) * 1000 if ok else None,
+        "cpu_ms_per_request": cpu * 1000 / max(ok, 1),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def case_key(result):
+    return f"{result['scenario']}|{result['image_size']}|{result['response_format']}|c{result['concurrency']}"
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions against a stored baseline."""
+    previous = {case_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if not old:
+            continue
+        for metric, better in COMPARED_METRICS.items():
+            new_value, old_value = result.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            if (better == "lower" and change > tolerance) or (better == "higher" and -change > tolerance):
+                regressions.append(f"{case_key(result)} {metric}: {old_value:.2f} -> {new_value:.2f} ({change:+.0%})")
+    return regressions
+
+
+def format_table(results):
+    header = f"{'case':<40} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cpu ms/req':>11} {'rss MB':>8} {'err':>4}"
+    lines = [header]
+    for r in results:
+        fmt = lambda v: f"{v:.1f}" if v is not None else "-"
+        lines.append(
+            f"{case_key(r):<40} {r['rps']:>8.2f} {fmt(r['p50_ms']):>9} {fmt(r['p95_ms']):>9} {fmt(r['p99_ms']):>9}"
+            f" {r['cpu_ms_per_request']:>11.1f} {r['peak_rss_mb']:>8.0f} {r['errors']:>4}"
+        )
+    return "\n".join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument("--scenario", nargs="+", default=DEFAULT_SCENARIOS, choices=DEFAULT_SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--image-size", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--response-format", nargs="+", default=DEFAULT_FORMATS, choices=DEFAULT_FORMATS)
+    parser.add_argument("--requests", type=int, default=32, help="Measured node executions per case")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mock server latency per response")
+    parser.add_argument("--output", default=None, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--verbose", action="store_true", help="Show node console output")
+
+
+def run(args):
+    from ..base import transport
+    from ..base.job_journal import STATE_DIR
+
+    # Rows are printed as cases finish, under one header; that is the summary.
+    print(format_table([]), flush=True)
+    results = []
+    for image_size in args.image_size:
+        with mock_server_process(image_size, args.latency_ms) as base_url:
+            # Upload endpoints are hard-coded in the nodes; send them to the mock too.
+            transport.HOST_OVERRIDES["https://api.hyprlab.io"] = base_url
+            for scenario in args.scenario:
+                formats = args.response_format if scenario != "llm_chat" else args.response_format[:1]
+                for response_format in formats:
+                    for concurrency in args.concurrency:
+                        sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+                        with sink:
+                            result = run_case(scenario, base_url, image_size, response_format, concurrency, args.requests)
+                        results.append(result)
+                        print(format_table([result]).splitlines()[1], flush=True)
+
+    report = {"kind": "load", "created_at": time.time(), "python": sys.version.split()[0],
+              "settings": {"requests": args.requests, "latency_ms": args.latency_ms}, "results": results}
+    output = args.output or os.path.join(STATE_DIR, "results", f"load-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+__all__ = ["run", "run_case", "compare", "add_arguments", "mock_server_process"]
@@ -0,0 +1,392 @@
+import argparse
+import asyncio
+import base64
+import io
+import json
+import random
+import threading
+import time
+import uuid
+
+try:
+    from aiohttp import web
+except ImportError:  # aiohttp ships with ComfyUI; standalone runs need `pip install aiohttp`
+    web = None
+
+from PIL import Image
+
+
+# Local stand-in for the providers the Leon nodes talk to, so nodes can be
+# exercised and benchmarked without paid network calls.
+#
+#   OpenAI-compatible (HyprLab):  POST /v1/images/generations, POST /v1/chat/completions
+#                                 (incl. "stream": true SSE), POST /v1/uploads, GET /v1/models
+#   Google:                       POST /v1beta/models/{model}:generateContent
+#   Midjourney proxy:             POST /mj/submit/imagine, POST /mj/submit/describe,
+#                                 POST /mj/submit/upload-discord-images, GET /mj/task/{id}/fetch
+#   Control:                      GET /__mock__/stats, POST /__mock__/config
+#
+# Point the nodes at it with their api_url / endpoint inputs, or reroute the
+# hard-coded hosts through the transport:
+#   LEON_HOST_OVERRIDES='{"https://api.hyprlab.io": "http://127.0.0.1:8765",
+#                         "https://generativelanguage.googleapis.com": "http://127.0.0.1:8765"}'
+
+DEFAULT_CONFIG = {
+    "latency_ms": 50.0,         # added before every response
+    "jitter_ms": 0.0,           # uniform +/- jitter on top of latency_ms
+    "image_size": 1024,         # square side of generated images, px
+    "image_kind": "noise",      # "noise" (incompressible, realistic size) or "gradient" (tiny)
+    "error_rate": 0.0,          # fraction of requests answered with HTTP 500
+    "rate_limit_rate": 0.0,     # fraction of requests answered with HTTP 429
+    "rate_limit_rps": 0.0,      # token-bucket limit across all routes; 0 disables
+    "retry_after": 1,           # Retry-After header on 429s, seconds
+    "stream_chunk_ms": 20.0,    # delay between SSE chunks
+    "mj_task_seconds": 5.0,     # time for an MJ task to reach SUCCESS
+    "mj_failure_rate": 0.0,     # fraction of MJ tasks that end in FAILURE
+    "seed": 0,
+}
+
+MOCK_MODELS = ["mock-flux", "mock-gpt", "mock-gemini", "gemini-flash-latest", "gpt-4o-mini"]
+MAX_STORED_FILES = 64
+
+
+class MockState:
+    def __init__(self, config):
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.rng = random.Random(self.config["seed"])
+        self.images = {}          # (size, kind, fmt) -> encoded bytes
+        self.files = {}           # name -> (content_type, bytes)
+        self.tasks = {}           # MJ task id -> task dict
+        self.stats = {"requests": {}, "statuses": {}, "bytes_out": 0}
+        self._tokens = 0.0
+        self._token_ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, changes):
+        with self._lock:
+            self.config.update({k: v for k, v in changes.items() if k in DEFAULT_CONFIG})
+            if "seed" in changes:
+                self.rng = random.Random(self.config["seed"])
+
+    def count(self, route, status, nbytes):
+        with self._lock:
+            self.stats["requests"][route] = self.stats["requests"].get(route, 0) + 1
+            self.stats["statuses"][str(status)] = self.stats["statuses"].get(str(status), 0) + 1
+            self.stats["bytes_out"] += nbytes
+
+    def take_token(self):
+        rps = self.config["rate_limit_rps"]
+        if not rps:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(rps, self._tokens + (now - self._token_ts) * rps)
+            self._token_ts = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def image_bytes(self, fmt="png", size=None):
+        size = int(size or self.config["image_size"])
+        kind = self.config["image_kind"]
+        key = (size, kind, fmt)
+        if key not in self.images:
+            if kind == "noise":
+                img = Image.frombytes("RGB", (size, size), random.Random(size).randbytes(size * size * 3))
+            else:
+                img = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG" if fmt in ("jpg", "jpeg") else fmt.upper())
+            self.images[key] = buffer.getvalue()
+        return self.images[key]
+
+    def store_file(self, data, content_type="image/png", ext="png"):
+        name = f"{uuid.uuid4().hex}.{ext}"
+        with self._lock:
+            self.files[name] = (content_type, data)
+            while len(self.files) > MAX_STORED_FILES:
+                self.files.pop(next(iter(self.files)))
+        return name
+
+
+def _base_url(request):
+    return f"{request.scheme}://{request.host}"
+
+
+def _image_url(request, state, fmt="png", size=None):
+    size = int(size or state.config["image_size"])
+    return f"{_base_url(request)}/files/generated-{size}.{fmt}"
+
+
+def _make_middleware(state):
+    @web.middleware
+    async def faults(request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        if request.path.startswith("/__mock__"):
+            return await handler(request)
+        cfg = state.config
+        delay = cfg["latency_ms"] + state.rng.uniform(-cfg["jitter_ms"], cfg["jitter_ms"])
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+        if not state.take_token() or state.rng.random() < cfg["rate_limit_rate"]:
+            response = web.json_response(
+                {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit"}},
+                status=429, headers={"Retry-After": str(cfg["retry_after"])},
+            )
+        elif state.rng.random() < cfg["error_rate"]:
+            response = web.json_response({"error": {"message": "Internal error (mock)"}}, status=500)
+        else:
+            response = await handler(request)
+        body = getattr(response, "body", None)
+        state.count(route, response.status, len(body) if isinstance(body, (bytes, bytearray)) else 0)
+        return response
+    return faults
+
+
+def build_app(config=None):
+    if web is None:
+        raise RuntimeError("The mock server needs aiohttp: pip install aiohttp")
+    state = MockState(config)
+    app = web.Application(middlewares=[_make_middleware(state)], client_max_size=256 * 1024 * 1024)
+    app["state"] = state
+    routes = web.RouteTableDef()
+
+    # ---- OpenAI-compatible ---------------------------------------------------
+
+    @routes.post("/v1/images/generations")
+    async def images_generations(request):
+        body = await request.json()
+        fmt = (body.get("output_format") or "png").lower()
+        fmt = "jpeg" if fmt == "jpg" else fmt
+        size = None
+        if isinstance(body.get("size"), str) and "x" in body["size"]:
+            size = max(int(v) for v in body["size"].split("x") if v.isdigit())
+        data = []
+        for _ in range(int(body.get("n") or 1)):
+            if body.get("response_format") == "url":
+                data.append({"url": _image_url(request, state, fmt, size), "revised_prompt": body.get("prompt", "")})
+            else:
+                b64 = base64.b64encode(state.image_bytes(fmt, size)).decode("ascii")
+                data.append({"b64_json": b64, "revised_prompt": body.get("prompt", "")})
+        return web.json_response({"created": int(time.time()), "data": data})
+
+    @routes.post("/v1/chat/completions")
+    async def chat_completions(request):
+        body = await request.json()
+        model = body.get("model", "mock-gpt")
+        words = f"This is a mock reply from {model}.".split()
+        if body.get("response_format", {}).get("type") in ("json_object", "json_schema"):
+            words = ['{"mock":', "true}"]
+        usage = {"prompt_tokens": 12, "completion_tokens": len(words), "total_tokens": 12 + len(words)}
+        if not body.get("stream"):
+            return web.json_response({
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        for i, word in enumerate(words):
+            chunk = {"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(state.config["stream_chunk_ms"] / 1000.0)
+        final = {"object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        await response.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+        await response.write_eof()
+        return response
+
+    @routes.post("/v1/uploads")
+    async def uploads(request):
+        if request.content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            data, content_type = b"", "application/octet-stream"
+            async for part in reader:
+                if part.filename:
+                    content_type = part.headers.get("Content-Type", content_type)
+                    data = await part.read()
+        else:
+            body = await request.json()
+            raw = body.get("file") or body.get("base64") or body.get("data") or ""
+            data = base64.b64decode(raw.split(",", 1)[-1]) if raw else b""
+            content_type = "image/png"
+        ext = content_type.split("/")[-1] or "bin"
+        name = state.store_file(data, content_type, ext)
+        key = "videoUrl" if content_type.startswith("video/") else "imageUrl"
+        return web.json_response({key: f"{_base_url(request)}/files/{name}"})
+
+    @routes.get("/v1/models")
+    async def models(request):
+        return web.json_response({"object": "list", "data": [{"id": m, "object": "model"} for m in MOCK_MODELS]})
+
+    @routes.get("/files/{name}")
+    async def files(request):
+        name = request.match_info["name"]
+        if name.startswith("generated-"):
+            size, fmt = name[len("generated-"):].rsplit(".", 1)
+            return web.Response(body=state.image_bytes(fmt, int(size)), content_type=f"image/{fmt}")
+        if name not in state.files:
+            raise web.HTTPNotFound()
+        content_type, data = state.files[name]
+        return web.Response(body=data, content_type=content_type)
+
+    # ---- Google generateContent ----------------------------------------------
+
+    @routes.post("/v1beta/models/{model_action}")
+    async def generate_content(request):
+        model, _, action = request.match_info["model_action"].partition(":")
+        if action != "generateContent":
+            raise web.HTTPNotFound()
+        body = await request.json()
+        modalities = body.get("generationConfig", {}).get("responseModalities", ["TEXT"])
+        parts = [{"text": f"Mock response from {model}."}]
+        if "IMAGE" in modalities:
+            image_size = body.get("generationConfig", {}).get("imageConfig", {}).get("imageSize", "1K")
+            size = {"1K": 1024, "2K": 2048, "4K": 4096}.get(str(image_size).upper(), state.config["image_size"])
+            b64 = base64.b64encode(state.image_bytes("png", size)).decode("ascii")
+            parts.append({"inlineData": {"mimeType": "image/png", "data": b64}})
+        return web.json_response({
+            "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": 12, "candidatesTokenCount": 8, "totalTokenCount": 20},
+            "modelVersion": model,
+        })
+
+    # ---- Midjourney proxy ----------------------------------------------------
+
+    def _submit(action, body):
+        task_id = str(int(time.time() * 1000)) + str(state.rng.randint(100, 999))
+        state.tasks[task_id] = {
+            "id": task_id, "action": action, "prompt": body.get("prompt", ""),
+            "botType": body.get("botType", "MID_JOURNEY"), "submitTime": time.time(),
+            "fails": state.rng.random() < state.config["mj_failure_rate"],
+        }
+        return web.json_response({"code": 1, "description": "Submit success", "result": task_id})
+
+    @routes.post("/mj/submit/imagine")
+    async def mj_imagine(request):
+        return _submit("IMAGINE", await request.json())
+
+    @routes.post("/mj/submit/describe")
+    async def mj_describe(request):
+        return _submit("DESCRIBE", await request.json())
+
+    @routes.post("/mj/submit/upload-discord-images")
+    async def mj_upload(request):
+        body = await request.json()
+        urls = []
+        for item in body.get("base64Array", []):
+            data = base64.b64decode(item.split(",", 1)[-1])
+            urls.append(f"{_base_url(request)}/files/{state.store_file(data)}")
+        return web.json_response({"code": 1, "description": "Success", "result": urls})
+
+    @routes.get("/mj/task/{task_id}/fetch")
+    async def mj_fetch(request):
+        task = state.tasks.get(request.match_info["task_id"])
+        if task is None:
+            return web.json_response({}, status=404)
+        fraction = (time.time() - task["submitTime"]) / max(state.config["mj_task_seconds"], 0.001)
+        result = {"id": task["id"], "action": task["action"], "botType": task["botType"],
+                  "prompt": task["prompt"], "submitTime": int(task["submitTime"] * 1000)}
+        if fraction < 0.1:
+            result.update(status="SUBMITTED", progress="0%")
+        elif fraction < 1.0:
+            result.update(status="IN_PROGRESS", progress=f"{int(fraction * 100)}%")
+        elif task["fails"]:
+            result.update(status="FAILURE", progress="", failReason="Mock failure")
+        else:
+            result.update(status="SUCCESS", progress="100%",
+                          imageUrl=_image_url(request, state, "png", state.config["image_size"] * 2),
+                          properties={"messageHash": uuid.uuid4().hex})
+            if task["action"] == "DESCRIBE":
+                result["prompt"] = "\n\n".join(f"{n}️⃣ Mock description {n} --ar 1:1" for n in range(1, 5))
+            else:
+                result["finalPrompt"] = task["prompt"]
+        return web.json_response(result)
+
+    # ---- control -------------------------------------------------------------
+
+    @routes.get("/__mock__/stats")
+    async def mock_stats(request):
+        return web.json_response({"config": state.config, **state.stats})
+
+    @routes.post("/__mock__/config")
+    async def mock_config(request):
+        state.update(await request.json())
+        return web.json_response(state.config)
+
+    app.add_routes(routes)
+    return app
+
+
+class MockServer:
+    """Run the mock server on a background event loop, e.g. from a benchmark."""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.app = build_app(config)
+        self.host = host
+        self.port = port
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def state(self):
+        return self.app["state"]
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._runner = web.AppRunner(self.app, access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, self.host, self.port)
+            self._loop.run_until_complete(site.start())
+            self.port = self._runner.addresses[0][1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="leon-mock-server", daemon=True)
+        self._thread.start()
+        ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline stand-in for HyprLab, Google and Midjourney proxy APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    for key, default in DEFAULT_CONFIG.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args(argv)
+    config = {key: getattr(args, key) for key in DEFAULT_CONFIG}
+    print(f"Leon mock server on http://{args.host}:{args.port} with {json.dumps(config)}")
+    web.run_app(build_app(config), host=args.host, port=args.port, access_log=None)
+
+
+__all__ = ["build_app", "MockServer", "DEFAULT_CONFIG", "main"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Startup benchmark: how long `import nodes` takes and how long ComfyUI's
+# /object_info takes to describe every Leon node. Each sample runs in a fresh
+# interpreter that first imports what ComfyUI has loaded before any custom
+# node (torch, numpy, PIL, requests, aiohttp), so only our own cost is timed.
+# Modes (see nodes/registry.py):
+#   cold   no registry snapshot: everything is imported and the snapshot written
+#   warm   current snapshot: stand-in classes, provider modules not imported
+#   eager  LEON_LAZY_NODES=0
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_MODES = ["cold", "warm", "eager"]
+DEFAULT_PRELOAD = ["torch", "numpy", "PIL.Image", "requests", "aiohttp.web"]
+COMPARED_METRICS = {"import_ms": "lower", "object_info_first_ms": "lower", "object_info_ms": "lower"}
+
+# Runs in the child; mirrors what server.node_info() reads for each node.
+_PROBE = r"""
+import importlib, json, statistics, sys, time
+repo_root, preload, repeats = sys.argv[1], [m for m in sys.argv[2].split(",") if m], int(sys.argv[3])
+for name in preload:
+    importlib.import_module(name)
+sys.path.insert(0, repo_root)
+
+start = time.perf_counter()
+import nodes
+import_ms = (time.perf_counter() - start) * 1000
+providers = sorted(m for m in sys.modules if m.startswith(("nodes.img.", "nodes.llm.", "nodes.util.")))
+
+def object_info():
+    out = {}
+    for name, cls in nodes.NODE_CLASS_MAPPINGS.items():
+        info = {"input": cls.INPUT_TYPES(), "input_order": {k: list(v) for k, v in cls.INPUT_TYPES().items()},
+                "output": cls.RETURN_TYPES, "output_is_list": getattr(cls, "OUTPUT_IS_LIST", [False] * len(cls.RETURN_TYPES)),
+                "output_name": getattr(cls, "RETURN_NAMES", cls.RETURN_TYPES), "name": name,
+                "display_name": nodes.NODE_DISPLAY_NAME_MAPPINGS.get(name, name),
+                "description": getattr(cls, "DESCRIPTION", ""), "category": getattr(cls, "CATEGORY", "sd"),
+                "output_node": getattr(cls, "OUTPUT_NODE", False) is True}
+        out[name] = info
+    return json.dumps(out)
+
+start = time.perf_counter()
+object_info()
+first_ms = (time.perf_counter() - start) * 1000
+samples = []
+for _ in range(repeats):
+    start = time.perf_counter()
+    object_info()
+    samples.append((time.perf_counter() - start) * 1000)
+print(json.dumps({"import_ms": import_ms, "object_info_first_ms": first_ms,
+                  "object_info_ms": statistics.median(samples), "nodes": len(nodes.NODE_CLASS_MAPPINGS),
+                  "provider_modules": len(providers)}))
+"""
+
+
+def probe(mode, state_dir, preload, object_info_repeats=5):
+    """One fresh-interpreter sample of import and /object_info cost in the given mode."""
+    env = dict(os.environ, LEON_STATE_DIR=state_dir, LEON_LAZY_NODES="0" if mode == "eager" else "1")
+    if mode == "cold":
+        try:
+            os.remove(os.path.join(state_dir, "registry.json"))
+        except FileNotFoundError:
+            pass
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE, REPO_ROOT, ",".join(preload), str(object_info_repeats)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup probe failed ({mode}): {completed.stderr.strip()[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_case(mode, state_dir, preload, repeats=7):
+    if mode == "warm":
+        probe("cold", state_dir, preload, 1)  # make sure a current snapshot exists
+    samples = [probe(mode, state_dir, preload) for _ in range(repeats)]
+    result = {"mode": mode, "repeats": repeats, "nodes": samples[-1]["nodes"],
+              "provider_modules": samples[-1]["provider_modules"]}
+    for metric in COMPARED_METRICS:
+        values = [s[metric] for s in samples]
+        median = statistics.median(values)
+        result[metric] = median
+        result[metric.replace("_ms", "_mad_ms")] = statistics.median(abs(v - median) for v in values)
+    return result
+
+
+def case_key(result):
+    return result["mode"]
+
+
+def compare(results, baseline, tolerance):
+    """Return regressions beyond tolerance that also exceed 3x the combined MAD (noise floor)."""
+    previous = {case_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if not old:
+            continue
+        for metric, better in COMPARED_METRICS.items():
+            new_value, old_value = result.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            mad = metric.replace("_ms", "_mad_ms")
+            noise = 3 * (result.get(mad, 0) + old.get(mad, 0))
+            worse = change > tolerance if better == "lower" else -change > tolerance
+            if worse and abs(new_value - old_value) > noise:
+                regressions.append(f"{case_key(result)} {metric}: {old_value:.2f} -> {new_value:.2f} ({change:+.0%})")
+    return regressions
+
+
+def format_table(results):
+    header = f"{'mode':<8} {'import ms':>10} {'mad':>6} {'object_info 1st ms':>19} {'object_info ms':>15} {'nodes':>6} {'modules':>8}"
+    lines = [header]
+    for r in results:
+        lines.append(
+            f"{r['mode']:<8} {r['import_ms']:>10.1f} {r['import_mad_ms']:>6.1f} {r['object_info_first_ms']:>19.2f}"
+            f" {r['object_info_ms']:>15.2f} {r['nodes']:>6} {r['provider_modules']:>8}"
+        )
+    return "\n".join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument("--mode", nargs="+", default=DEFAULT_MODES, choices=DEFAULT_MODES)
+    parser.add_argument("--repeats", type=int, default=7, help="Fresh interpreters per mode")
+    parser.add_argument("--preload", nargs="*", default=DEFAULT_PRELOAD,
+                        help="Modules imported before the nodes, as ComfyUI would have (none with no value)")
+    parser.add_argument("--output", default=None, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+
+
+def run(args):
+    from ..base.job_journal import STATE_DIR
+
+    # A scratch state dir, so cold runs don't throw away the real snapshot.
+    state_dir = tempfile.mkdtemp(prefix="leon-startup-")
+    results = []
+    try:
+        for mode in args.mode:
+            result = run_case(mode, state_dir, args.preload, args.repeats)
+            results.append(result)
+            print(format_table([result]).splitlines()[1], flush=True)
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    print()
+    print(format_table(results))
+    report = {"kind": "startup", "created_at": time.time(), "python": sys.version.split()[0],
+              "settings": {"repeats": args.repeats, "preload": args.preload}, "results": results}
+    output = args.output or os.path.join(STATE_DIR, "results", f"startup-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+__all__ = ["run", "run_case", "probe", "compare", "add_arguments"]
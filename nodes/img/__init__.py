@@ -1,17 +1,30 @@
-from .flux_nodes import FLUX_NODE_CLASS_MAPPINGS, FLUX_NODE_DISPLAY_NAME_MAPPINGS
-from .google_nodes import GOOGLE_NODE_CLASS_MAPPINGS, GOOGLE_NODE_DISPLAY_NAME_MAPPINGS
-from .luma_nodes import LUMA_NODE_CLASS_MAPPINGS, LUMA_NODE_DISPLAY_NAME_MAPPINGS
-from .bytedance_nodes import BYTEDANCE_NODE_CLASS_MAPPINGS, BYTEDANCE_NODE_DISPLAY_NAME_MAPPINGS
-from .ideogram_nodes import IDEOGRAM_NODE_CLASS_MAPPINGS, IDEOGRAM_NODE_DISPLAY_NAME_MAPPINGS
-from .recraft_nodes import RECRAFT_NODE_CLASS_MAPPINGS, RECRAFT_NODE_DISPLAY_NAME_MAPPINGS
-from .qwen_nodes import QWEN_NODE_CLASS_MAPPINGS, QWEN_NODE_DISPLAY_NAME_MAPPINGS
-from .nano_banana_nodes import NANO_BANANA_NODE_CLASS_MAPPINGS, NANO_BANANA_NODE_DISPLAY_NAME_MAPPINGS
-from .xai_nodes import XAI_NODE_CLASS_MAPPINGS, XAI_NODE_DISPLAY_NAME_MAPPINGS
-from .midjourney_proxy_node import MJ_PROXY_NODE_CLASS_MAPPINGS, MJ_PROXY_NODE_DISPLAY_NAME_MAPPINGS
-from .openai_image_nodes import OPENAI_IMAGE_NODE_CLASS_MAPPINGS, OPENAI_IMAGE_NODE_DISPLAY_NAME_MAPPINGS
-from .stable_diffusion_nodes import STABLE_DIFFUSION_NODE_CLASS_MAPPINGS, STABLE_DIFFUSION_NODE_DISPLAY_NAME_MAPPINGS
-from .google_official_nodes import GOOGLE_OFFICIAL_NODE_CLASS_MAPPINGS, GOOGLE_OFFICIAL_NODE_DISPLAY_NAME_MAPPINGS
-from .pruna_nodes import PRUNA_NODE_CLASS_MAPPINGS, PRUNA_NODE_DISPLAY_NAME_MAPPINGS
+import importlib
+
+# Provider modules are imported on first access, so importing one of them
+# (the lazy registry does, on first execution) doesn't load the rest.
+_MODULES = {
+    "FLUX": "flux_nodes",
+    "GOOGLE": "google_nodes",
+    "LUMA": "luma_nodes",
+    "BYTEDANCE": "bytedance_nodes",
+    "IDEOGRAM": "ideogram_nodes",
+    "RECRAFT": "recraft_nodes",
+    "QWEN": "qwen_nodes",
+    "NANO_BANANA": "nano_banana_nodes",
+    "XAI": "xai_nodes",
+    "MJ_PROXY": "midjourney_proxy_node",
+    "OPENAI_IMAGE": "openai_image_nodes",
+    "STABLE_DIFFUSION": "stable_diffusion_nodes",
+    "GOOGLE_OFFICIAL": "google_official_nodes",
+    "PRUNA": "pruna_nodes",
+}
+
+
+def __getattr__(name):
+    for suffix in ("_NODE_CLASS_MAPPINGS", "_NODE_DISPLAY_NAME_MAPPINGS"):
+        if name.endswith(suffix) and name[:-len(suffix)] in _MODULES:
+            return getattr(importlib.import_module(f".{_MODULES[name[:-len(suffix)]]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     "FLUX_NODE_CLASS_MAPPINGS", "FLUX_NODE_DISPLAY_NAME_MAPPINGS",
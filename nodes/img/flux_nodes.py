@@ -1,21 +1,40 @@
+from ..base import capabilities
+from ..base.capabilities import ALWAYS, IF_SET, UNLESS_DEFAULT, WITH_IMAGES
 from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
 
 # FLUX Image Generation Nodes
 
+# Every HyprLab image request carries these two.
+_FORMATS = {"response_format": ALWAYS, "output_format": ALWAYS}
+_SIZED = {"steps": ALWAYS, "height": {"multiple_of": 32}, "width": {"multiple_of": 32}}
+
 class Leon_Flux_Image_API_Node(HyprLabImageGenerationNodeBase):
     CATEGORY = "Leon_API"
     RETURN_TYPES = ("IMAGE", "STRING", "INT")
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_flux_image"
 
-    MODEL_MAPPING = {
-        "FLUX 1.1 Pro Ultra": "flux-1.1-pro-ultra",
-        "FLUX 1.1 Pro": "flux-1.1-pro",
-        "FLUX Pro Canny": "flux-pro-canny",
-        "FLUX Dev": "flux-dev",
-        "FLUX Schnell": "flux-schnell",
-        "FLUX Krea Dev": "flux-krea-dev"
-    }
+    CAPABILITIES = capabilities.Table(common=_FORMATS, models={
+        "FLUX 1.1 Pro Ultra": {
+            "id": "flux-1.1-pro-ultra",
+            "params": {"image_prompt_strength": ALWAYS, "aspect_ratio": UNLESS_DEFAULT, "raw": ALWAYS},
+            "images": {"image_prompt": 1},
+        },
+        "FLUX 1.1 Pro": {"id": "flux-1.1-pro", "params": _SIZED, "images": {"image_prompt": 1}},
+        "FLUX Pro Canny": {"id": "flux-pro-canny", "params": _SIZED, "images": {"image_prompt": 1}},
+        "FLUX Dev": {"id": "flux-dev", "params": _SIZED},
+        "FLUX Schnell": {"id": "flux-schnell", "params": _SIZED},
+        "FLUX Krea Dev": {
+            "id": "flux-krea-dev",
+            "params": {
+                "prompt_strength": {"send": WITH_IMAGES, "slot": "image_prompt"},
+                "aspect_ratio": UNLESS_DEFAULT,
+                "num_inference_steps": ALWAYS,
+                "guidance": ALWAYS,
+            },
+            "images": {"image_prompt": {"field": "image", "max": 1}},
+        },
+    })
     ASPECT_RATIOS_ULTRA = ["21:9", "16:9", "3:2", "4:3", "5:4", "1:1", "4:5", "3:4", "2:3", "9:16", "9:21"]
 
     def __init__(self):
@@ -25,9 +44,9 @@ class Leon_Flux_Image_API_Node(HyprLabImageGenerationNodeBase):
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "model_choice": (list(cls.MODEL_MAPPING.keys()), {"default": "FLUX 1.1 Pro"}),
+                "model_choice": (list(cls.CAPABILITIES), {"default": "FLUX 1.1 Pro"}),
                 "prompt": ("STRING", {"multiline": True, "default": "A stunning artistic photo"}),
-                "response_format": (["url", "b64_json"], {"default": "url"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "png"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations"}),
@@ -53,50 +72,14 @@ class Leon_Flux_Image_API_Node(HyprLabImageGenerationNodeBase):
                               input_image_prompt_socket=None, input_image_prompt_url="", image_prompt_strength=0.5, aspect_ratio="1:1", raw=False,
                               steps=30, height=1024, width=1024, prompt_strength=0.8, num_inference_steps=28, guidance=4.5):
 
-        actual_model_name = self.MODEL_MAPPING.get(model_choice)
-        if not actual_model_name:
-            raise ValueError(f"Invalid model choice: {model_choice}.")
-
-        payload = {
-            "model": actual_model_name, "prompt": prompt,
+        params = {
             "response_format": response_format, "output_format": output_format,
+            "image_prompt_strength": image_prompt_strength, "aspect_ratio": aspect_ratio, "raw": raw,
+            "steps": steps, "height": height, "width": width, "prompt_strength": prompt_strength,
+            "num_inference_steps": num_inference_steps, "guidance": guidance,
         }
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string.")
-
-        actual_image_prompt_payload = self._resolve_image_input(
-            input_image_prompt_socket, input_image_prompt_url, field_name="image_prompt"
-        )
-
-        if model_choice == "FLUX 1.1 Pro Ultra":
-            if actual_image_prompt_payload: 
-                payload["image_prompt"] = actual_image_prompt_payload
-            payload["image_prompt_strength"] = image_prompt_strength
-            if aspect_ratio != self.INPUT_TYPES()["optional"]["aspect_ratio"][1]["default"]: 
-                 payload["aspect_ratio"] = aspect_ratio
-            payload["raw"] = raw
-        elif model_choice in ["FLUX 1.1 Pro", "FLUX Pro Canny"]:
-            if actual_image_prompt_payload: 
-                payload["image_prompt"] = actual_image_prompt_payload
-            payload["steps"] = steps
-            payload["height"] = height
-            payload["width"] = width
-        elif model_choice in ["FLUX Dev", "FLUX Schnell"]:
-            payload["steps"] = steps
-            payload["height"] = height
-            payload["width"] = width
-        elif model_choice == "FLUX Krea Dev":
-            if actual_image_prompt_payload:
-                payload["image"] = actual_image_prompt_payload
-                payload["prompt_strength"] = prompt_strength
-            if aspect_ratio != self.INPUT_TYPES()["optional"]["aspect_ratio"][1]["default"]:
-                payload["aspect_ratio"] = aspect_ratio
-            payload["num_inference_steps"] = num_inference_steps
-            payload["guidance"] = guidance
-
-        if model_choice in ["FLUX 1.1 Pro", "FLUX Pro Canny", "FLUX Dev", "FLUX Schnell"]:
-            if height % 32 != 0: raise ValueError(f"Height must be a multiple of 32. Got {height}.")
-            if width % 32 != 0: raise ValueError(f"Width must be a multiple of 32. Got {width}.")
+        images = {"image_prompt": self._image_source(input_image_prompt_socket, input_image_prompt_url, field_name="image_prompt")}
+        payload = capabilities.for_node(self, model_choice).build(prompt, params, images, encode=self._encode_image_source)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
@@ -107,11 +90,15 @@ class Leon_Flux_2_Image_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_flux2_image"
 
-    MODEL_MAPPING = {
-        "FLUX 2 Pro": "flux-2-pro",
-        "FLUX 2 Max": "flux-2-max",
-        "FLUX 2 Flex": "flux-2-flex"
-    }
+    CAPABILITIES = capabilities.Table(common=dict(_FORMATS, aspect_ratio=UNLESS_DEFAULT, resolution=UNLESS_DEFAULT), models={
+        "FLUX 2 Pro": {"id": "flux-2-pro", "images": {"input_images": 8}},
+        "FLUX 2 Max": {"id": "flux-2-max", "images": {"input_images": 10}},
+        "FLUX 2 Flex": {
+            "id": "flux-2-flex",
+            "params": {"steps": ALWAYS, "guidance": {"min": 1.5, "max": 10.0}},
+            "images": {"input_images": 10},
+        },
+    })
     ASPECT_RATIOS = ["match_input_image", "1:1", "16:9", "3:2", "2:3", "4:5", "5:4", "9:16", "3:4", "4:3"]
     RESOLUTION_CHOICES = ["match_input_image", "0.5 MP", "1 MP", "2 MP", "4 MP"]
 
@@ -122,9 +109,9 @@ class Leon_Flux_2_Image_API_Node(HyprLabImageGenerationNodeBase):
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "model_choice": (list(cls.MODEL_MAPPING.keys()), {"default": "FLUX 2 Pro"}),
+                "model_choice": (list(cls.CAPABILITIES), {"default": "FLUX 2 Pro"}),
                 "prompt": ("STRING", {"multiline": True, "default": "A stunning artistic photo"}),
-                "response_format": (["url", "b64_json"], {"default": "url"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "png"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations"}),
@@ -143,42 +130,12 @@ class Leon_Flux_2_Image_API_Node(HyprLabImageGenerationNodeBase):
                              input_images_array=None, aspect_ratio="1:1", resolution="1 MP",
                              steps=30, guidance=3.5):
 
-        actual_model_name = self.MODEL_MAPPING.get(model_choice)
-        if not actual_model_name:
-            raise ValueError(f"Invalid model choice: {model_choice}.")
-
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string.")
-
-        payload = {
-            "model": actual_model_name,
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format,
+        params = {
+            "response_format": response_format, "output_format": output_format,
+            "aspect_ratio": aspect_ratio, "resolution": resolution, "steps": steps, "guidance": guidance,
         }
-
-        # Handle multi-image input
-        if input_images_array is not None and isinstance(input_images_array, list):
-            max_images = 8 if model_choice == "FLUX 2 Pro" else 10
-            input_images = input_images_array[:max_images]
-            
-            if input_images:
-                payload["input_images"] = input_images
-                print(f"🟢 {model_choice}: Using {len(input_images)} input image(s) (preserving original dimensions)")
-
-        # Add aspect_ratio and resolution
-        if aspect_ratio and aspect_ratio != "1:1":
-            payload["aspect_ratio"] = aspect_ratio
-        if resolution and resolution != "1 MP":
-            payload["resolution"] = resolution
-
-        # FLUX 2 Flex specific parameters
-        if model_choice == "FLUX 2 Flex":
-            payload["steps"] = steps
-            if guidance < 1.5 or guidance > 10.0:
-                raise ValueError(f"FLUX 2 Flex guidance must be between 1.5 and 10.0. Got {guidance}.")
-            payload["guidance"] = guidance
-            print(f"🟢 FLUX 2 Flex: steps={steps}, guidance={guidance}")
+        images = {"input_images": input_images_array if isinstance(input_images_array, list) else None}
+        payload = capabilities.for_node(self, model_choice).build(prompt, params, images)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
@@ -189,7 +146,14 @@ class Leon_Flux_Kontext_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_flux_kontext_image"
 
-    MODEL_CHOICES = ["flux-kontext-max", "flux-kontext-pro", "flux-kontext-dev"]
+    CAPABILITIES = capabilities.Table(common=dict(_FORMATS, aspect_ratio=IF_SET), models={
+        "flux-kontext-max": {"images": {"input_image": 1}},
+        "flux-kontext-pro": {"images": {"input_image": 1}},
+        "flux-kontext-dev": {
+            "params": {"num_inference_steps": ALWAYS, "guidance": ALWAYS},
+            "images": {"input_image": {"min": 1, "max": 1}},
+        },
+    })
     ASPECT_RATIO_CHOICES = [
         "match_input_image", "1:1", "16:9", "9:16", "4:3", "3:4", 
         "3:2", "2:3", "4:5", "5:4", "21:9", "9:21", "2:1", "1:2"
@@ -202,9 +166,9 @@ class Leon_Flux_Kontext_API_Node(HyprLabImageGenerationNodeBase):
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "model": (cls.MODEL_CHOICES, {"default": "flux-kontext-pro"}),
+                "model": (list(cls.CAPABILITIES), {"default": "flux-kontext-pro"}),
                 "prompt": ("STRING", {"multiline": True, "default": "A detailed artistic scene"}),
-                "response_format": (["url", "b64_json"], {"default": "url"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "png"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations"}),
@@ -223,36 +187,12 @@ class Leon_Flux_Kontext_API_Node(HyprLabImageGenerationNodeBase):
                                       api_url, api_key, input_image=None, input_image_url="", aspect_ratio="1:1", 
                                       num_inference_steps=20, guidance=3.5):
 
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string.")
-
-        # Validate model-specific requirements
-        resolved_input_image = self._resolve_image_input(
-            input_image, input_image_url, field_name="input_image"
-        )
-
-        if model == "flux-kontext-dev" and not resolved_input_image:
-            raise ValueError("flux-kontext-dev model requires an input image")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format,
+        params = {
+            "response_format": response_format, "output_format": output_format, "aspect_ratio": aspect_ratio,
+            "num_inference_steps": num_inference_steps, "guidance": guidance,
         }
-
-        if resolved_input_image:
-            payload["input_image"] = resolved_input_image
-        
-        if aspect_ratio:
-            payload["aspect_ratio"] = aspect_ratio
-            if not resolved_input_image and aspect_ratio == "match_input_image":
-                 pass
-
-        # Add flux-kontext-dev specific parameters
-        if model == "flux-kontext-dev":
-            payload["num_inference_steps"] = num_inference_steps
-            payload["guidance"] = guidance
+        images = {"input_image": self._image_source(input_image, input_image_url, field_name="input_image")}
+        payload = capabilities.for_node(self, model).build(prompt, params, images, encode=self._encode_image_source)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
@@ -1,12 +1,11 @@
-import tenacity
 import base64
-from PIL import Image
-import io
 import requests
 import json
 import random
-import torch
-import numpy as np
+
+from ..base import capabilities, encoding, engine, log, timings, uploads, vision
+from ..base.circuit_breaker import CircuitOpenError
+from ..base.interrupt import InterruptProcessingException
 
 
 # ===========================================================================
@@ -16,44 +15,38 @@ import numpy as np
 
 GOOGLE_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
 
-# ---- helpers shared by both nodes -----------------------------------------
+logger = log.get_logger("google")
 
-def _sanitize_for_log(obj):
-    """Truncate long base64 strings so logs stay readable."""
-    if isinstance(obj, dict):
-        return {k: _sanitize_for_log(v) for k, v in obj.items()}
-    elif isinstance(obj, (list, tuple)):
-        return [_sanitize_for_log(v) for v in obj]
-    elif isinstance(obj, str) and len(obj) > 200:
-        if len(obj) > 1000:
-            return obj[:50] + f"... [truncated {len(obj)} chars]"
-    return obj
+# How image inputs are encoded (LEON_ENCODE_GOOGLE); the chat node's vision
+# inputs follow the LLM nodes' policy instead (LEON_ENCODE_LLM).
+ENCODING = encoding.profile("google", "png:6")
+VISION_ENCODING = encoding.profile("llm", "auto:90")
 
+# ---- helpers shared by both nodes -----------------------------------------
 
 def _format_error(err_text):
     try:
         parsed = json.loads(err_text)
-        return json.dumps(_sanitize_for_log(parsed))
+        return json.dumps(engine.sanitize_for_logging(parsed))
     except Exception:
         if len(err_text) > 5000:
             return err_text[:5000] + "...[truncated]"
         return err_text
 
 
-def _tensor_to_base64(tensor_image):
-    """Convert a ComfyUI IMAGE tensor (B,H,W,C) to raw base64 PNG string."""
+def _tensor_to_base64(tensor_image, vision_model=None):
+    """
+    (raw base64, mime type) of a ComfyUI IMAGE tensor (B,H,W,C), without alpha.
+    With vision_model, pre-sized to that model's effective input resolution
+    and encoded like the other vision (LLM) inputs.
+    """
     if tensor_image is None:
-        return None
-    if tensor_image.ndim == 4:
-        tensor_image = tensor_image[0]
-    np_image = (tensor_image.cpu().numpy() * 255).astype(np.uint8)
-    mode = "RGBA" if np_image.shape[-1] == 4 else "RGB"
-    pil_image = Image.fromarray(np_image, mode)
-    if mode == "RGBA":
-        pil_image = pil_image.convert("RGB")
-    buf = io.BytesIO()
-    pil_image.save(buf, format="PNG")
-    return base64.b64encode(buf.getvalue()).decode("utf-8")
+        return None, None
+    if vision_model:
+        data, mime = vision.encode_tensor(tensor_image, vision_model, VISION_ENCODING, mode="RGB")
+    else:
+        data, mime = encoding.encode_pil(encoding.tensor_to_pil(tensor_image).convert("RGB"), ENCODING)
+    return base64.b64encode(data).decode("utf-8"), mime
 
 
 # ===========================================================================
@@ -79,6 +72,8 @@ class Leon_Official_Gemini_Node:
 
     THINKING_LEVELS = ["high", "medium", "low", "minimal"]
 
+    ENGINE = engine.ProviderEngine(engine.GoogleGenerateContent("Official Gemini"), engine.GoogleParts(), logger)
+
     def __init__(self):
         pass
 
@@ -100,34 +95,9 @@ class Leon_Official_Gemini_Node:
             }
         }
 
-    @tenacity.retry(
-        wait=tenacity.wait_exponential(multiplier=1.25, min=5, max=30),
-        stop=tenacity.stop_after_attempt(5),
-    )
-    def _call_google_api(self, model, payload, api_key):
-        url = f"{GOOGLE_API_BASE}/models/{model}:generateContent"
-        headers = {
-            "Content-Type": "application/json",
-            "x-goog-api-key": api_key,
-        }
-
-        print(f"🌐 Official Gemini – POST {url}")
-        print(f"🌐 Payload: {json.dumps(_sanitize_for_log(payload), indent=2)}")
-
-        response = requests.post(url, json=payload, headers=headers)
-        print(f"🌐 HTTP {response.status_code}")
-
-        if not response.ok:
-            # Drop out of the retry loop manually for 400s since it's likely a bad request payload
-            print(f"🌐 Error response body from Google API: {response.text}")
-            if response.status_code == 400:
-                raise tenacity.TryAgain if False else ValueError(f"Google API HTTP 400: {response.text}")
-
-        response.raise_for_status()
-        return response.json()
-
     # ---- main entry point ---------------------------------------------------
 
+    @timings.instrument
     def generate(
         self,
         model,
@@ -150,9 +120,9 @@ class Leon_Official_Gemini_Node:
 
         # Single tensor image
         if input_image is not None:
-            b64 = _tensor_to_base64(input_image)
+            b64, mime = _tensor_to_base64(input_image, vision_model=active_model)
             if b64:
-                parts.append({"inlineData": {"mimeType": "image/png", "data": b64}})
+                parts.append({"inlineData": {"mimeType": mime, "data": b64}})
 
         # IMAGE_ARRAY (base64 data-URI strings or plain base64)
         if image_array is not None and len(image_array) > 0:
@@ -165,6 +135,7 @@ class Leon_Official_Gemini_Node:
                     else:
                         raw_b64 = img_data
                         mime = "image/png"
+                    raw_b64, mime = vision.presize_base64(raw_b64, mime, active_model, VISION_ENCODING)
                     parts.append({"inlineData": {"mimeType": mime, "data": raw_b64}})
             print(f"🌐 Official Gemini: Added {len(image_array)} image(s) from IMAGE_ARRAY")
 
@@ -182,28 +153,24 @@ class Leon_Official_Gemini_Node:
                 "parts": [{"text": system_message}]
             }
 
+        payload = uploads.offload_gemini(payload, GOOGLE_API_BASE, api_key)
+
         try:
-            resp_json = self._call_google_api(active_model, payload, api_key)
-            print(f"🌐 Response: {json.dumps(_sanitize_for_log(resp_json), indent=2)}")
-
-            # Extract text from candidates
-            text_parts = []
-            candidates = resp_json.get("candidates", [])
-            if candidates:
-                for part in candidates[0].get("content", {}).get("parts", []):
-                    if "text" in part:
-                        text_parts.append(part["text"])
-
-            if not text_parts:
+            resp_json = self.ENGINE.call(payload, GOOGLE_API_BASE, api_key, model=active_model)
+
+            # Text parts of the first candidate
+            text = self.ENGINE.parser.parse(resp_json).text
+            if not text:
                 raise Exception(f"No text in response: {resp_json}")
 
-            return ("\n".join(text_parts),)
+            return (text,)
 
+        except (CircuitOpenError, InterruptProcessingException):
+            raise
         except requests.exceptions.RequestException as e:
             raise Exception(f"Google Gemini API request failed: {str(e)}")
         except Exception as e:
-            err_text = response.text if "response" in dir() else "N/A"
-            print(f"🌐 Error response: {_format_error(str(e))}")
+            logger.error("🌐 Error response: %s", log.Lazy(_format_error, str(e)))
             raise Exception(f"Google Gemini API call failed: {str(e)}")
 
 
@@ -236,11 +203,22 @@ class Leon_Official_Nano_Banana_Node:
 
     IMAGE_SIZE_CHOICES = ["1K", "2K", "4K"]
 
+    # Only the checks come from here; the payload is Gemini's nested generateContent body.
+    CAPABILITIES = capabilities.Table(
+        common={"aspect_ratio": capabilities.ALWAYS, "image_size": capabilities.ALWAYS, "response_modalities": capabilities.ALWAYS},
+        models={model: {"images": {"images": 14}} for model in MODEL_CHOICES},
+    )
+
     RESPONSE_MODALITY_CHOICES = [
         "TEXT_AND_IMAGE",
         "IMAGE_ONLY",
     ]
 
+    ENGINE = engine.ImageEngine(
+        engine.GoogleGenerateContent("Official Nano Banana"), engine.GoogleParts(), logger,
+        request_failed="Google Nano Banana API request failed", failed="Google Nano Banana image generation failed",
+    )
+
     def __init__(self):
         pass
 
@@ -263,39 +241,9 @@ class Leon_Official_Nano_Banana_Node:
             }
         }
 
-    @tenacity.retry(
-        wait=tenacity.wait_exponential(multiplier=1.25, min=5, max=30),
-        stop=tenacity.stop_after_attempt(5),
-    )
-    def _call_google_api(self, model, payload, api_key):
-        url = f"{GOOGLE_API_BASE}/models/{model}:generateContent"
-        headers = {
-            "Content-Type": "application/json",
-            "x-goog-api-key": api_key,
-        }
-
-        print(f"🌐 Official Nano Banana – POST {url}")
-        print(f"🌐 Payload: {json.dumps(_sanitize_for_log(payload), indent=2)}")
-
-        response = requests.post(url, json=payload, headers=headers)
-        print(f"🌐 HTTP {response.status_code}")
-
-        if not response.ok:
-            print(f"🌐 Error response body from Google API: {response.text}")
-            if response.status_code == 400:
-                raise tenacity.TryAgain if False else ValueError(f"Google API HTTP 400: {response.text}")
-
-        resp_text = response.text
-        if "data" in resp_text and len(resp_text) > 1000:
-            print(f"🌐 Response: {resp_text[:500]}... (truncated)")
-        else:
-            print(f"🌐 Response: {resp_text}")
-
-        response.raise_for_status()
-        return response.json()
-
     # ---- main entry point ---------------------------------------------------
 
+    @timings.instrument
     def generate_image(
         self,
         prompt,
@@ -309,8 +257,11 @@ class Leon_Official_Nano_Banana_Node:
         image_array=None,
         custom_model="",
     ):
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
+        given = ([input_image] if input_image is not None else []) + list(image_array or [])
+        capabilities.for_node(self, model).validate(
+            prompt, {"aspect_ratio": aspect_ratio, "image_size": image_size, "response_modalities": response_modalities},
+            {"images": given},
+        )
 
         random.seed(seed)
         active_model = custom_model.strip() if custom_model.strip() else model
@@ -320,9 +271,9 @@ class Leon_Official_Nano_Banana_Node:
 
         # Single tensor image for editing
         if input_image is not None:
-            b64 = _tensor_to_base64(input_image)
+            b64, mime = _tensor_to_base64(input_image)
             if b64:
-                parts.append({"inlineData": {"mimeType": "image/png", "data": b64}})
+                parts.append({"inlineData": {"mimeType": mime, "data": b64}})
                 print(f"🌐 Official Nano Banana: Added 1 input image tensor")
 
         # IMAGE_ARRAY for multi-image reference
@@ -353,46 +304,9 @@ class Leon_Official_Nano_Banana_Node:
             },
         }
 
-        try:
-            resp_json = self._call_google_api(active_model, payload, api_key)
-
-            # Parse response – iterate parts for text and image
-            description_parts = []
-            pil_img = None
-
-            candidates = resp_json.get("candidates", [])
-            if not candidates:
-                raise Exception(f"No candidates in response: {resp_json}")
-
-            for part in candidates[0].get("content", {}).get("parts", []):
-                if "text" in part:
-                    description_parts.append(part["text"])
-                elif "inlineData" in part:
-                    img_b64 = part["inlineData"]["data"]
-                    img_bytes = base64.b64decode(img_b64)
-                    pil_img = Image.open(io.BytesIO(img_bytes))
-
-            if pil_img is None:
-                raise Exception(f"No image data found in response parts")
-
-            # Convert to RGBA tensor for ComfyUI
-            pil_img = pil_img.convert("RGBA")
-            img_array = np.array(pil_img).astype(np.float32) / 255.0
-
-            if img_array.ndim == 3 and img_array.shape[-1] == 3:
-                alpha = np.ones_like(img_array[..., :1])
-                img_array = np.concatenate((img_array, alpha), axis=-1)
-
-            img_tensor = torch.from_numpy(img_array).unsqueeze(0)
-            description = "\n".join(description_parts) if description_parts else ""
-
-            return (img_tensor, description, seed)
-
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Google Nano Banana API request failed: {str(e)}")
-        except Exception as e:
-            print(f"🌐 Error: {_format_error(str(e))}")
-            raise Exception(f"Google Nano Banana image generation failed: {str(e)}")
+        payload = uploads.offload_gemini(payload, GOOGLE_API_BASE, api_key)
+        img_tensor, parsed = self.ENGINE.generate(payload, GOOGLE_API_BASE, api_key, model=active_model)
+        return (img_tensor, parsed.text, seed)
 
 
 # ===========================================================================
@@ -1,3 +1,5 @@
+from ..base import capabilities
+from ..base.capabilities import ALWAYS, IF_SET
 from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
 
 # Ideogram Image Generation Nodes
@@ -8,6 +10,16 @@ class Leon_Ideogram_Image_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_ideogram_image"
 
+    CAPABILITIES = capabilities.Table(
+        common={
+            "response_format": ALWAYS, "output_format": ALWAYS,
+            "negative_prompt": {"send": IF_SET, "max_chars": 10000},
+            "aspect_ratio": IF_SET, "style_type": IF_SET, "magic_prompt_option": IF_SET,
+        },
+        prompt={"max_chars": 10000},
+        models={"ideogram-v2": {}, "ideogram-v2-turbo": {}},
+    )
+
     def __init__(self):
         pass
 
@@ -16,12 +28,12 @@ class Leon_Ideogram_Image_API_Node(HyprLabImageGenerationNodeBase):
         return {
             "required": {
                 "prompt": ("STRING", {"multiline": True, "default": "cat", "tooltip": "Main text input to guide the generation process (max 10,000 characters)"}),
-                "model": (["ideogram-v2", "ideogram-v2-turbo"], {"default": "ideogram-v2", "tooltip": "Ideogram AI model to use for generation"}),
+                "model": (list(cls.CAPABILITIES), {"default": "ideogram-v2", "tooltip": "Ideogram AI model to use for generation"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "webp", "tooltip": "Format of the output image"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your HyprLab API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "How the response data should be formatted"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "How the response data should be formatted"}),
             },
             "optional": {
                 "negative_prompt": ("STRING", {"multiline": True, "default": "", "tooltip": "Input that defines what NOT to include during generation (max 10,000 characters)"}),
@@ -45,31 +57,12 @@ class Leon_Ideogram_Image_API_Node(HyprLabImageGenerationNodeBase):
         style_type="Auto",
         magic_prompt_option="Auto"
     ):
-        if len(prompt) > 10000:
-            raise ValueError("Prompt must not exceed 10,000 characters")
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-        
-        if negative_prompt and len(negative_prompt) > 10000:
-            raise ValueError("Negative prompt must not exceed 10,000 characters")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format
+        params = {
+            "response_format": response_format, "output_format": output_format, "negative_prompt": negative_prompt,
+            "aspect_ratio": aspect_ratio, "style_type": style_type, "magic_prompt_option": magic_prompt_option,
         }
+        payload = capabilities.for_node(self, model).build(prompt, params)
 
-        # Add optional parameters
-        if negative_prompt.strip():
-            payload["negative_prompt"] = negative_prompt
-        if aspect_ratio:
-            payload["aspect_ratio"] = aspect_ratio
-        if style_type:
-            payload["style_type"] = style_type
-        if magic_prompt_option:
-            payload["magic_prompt_option"] = magic_prompt_option
-        
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
 
@@ -1,3 +1,5 @@
+from ..base import capabilities
+from ..base.capabilities import ALWAYS, IF_SET, WITH_IMAGES
 from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
 
 # Luma Image Generation Nodes
@@ -8,6 +10,19 @@ class Leon_Luma_AI_Image_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_luma_image"
 
+    CAPABILITIES = capabilities.Table(
+        common={
+            "response_format": ALWAYS, "output_format": ALWAYS, "aspect_ratio": IF_SET,
+            "image_reference_weight": {"send": WITH_IMAGES, "slot": "image_reference_url"},
+            "style_reference_weight": {"send": WITH_IMAGES, "slot": "style_reference_url"},
+        },
+        prompt={"max_chars": 10000, "required": "unless_images"},
+        models={
+            model: {"images": {"image_reference_url": 1, "style_reference_url": 1, "character_reference_url": 1}}
+            for model in ("photon", "photon-flash")
+        },
+    )
+
     def __init__(self):
         pass
 
@@ -16,12 +31,12 @@ class Leon_Luma_AI_Image_API_Node(HyprLabImageGenerationNodeBase):
         return {
             "required": {
                 "prompt": ("STRING", {"multiline": True, "default": "A stunning fantasy landscape", "tooltip": "Main text input to guide the generation process (max 10,000 characters)"}),
-                "model": (["photon", "photon-flash"], {"default": "photon", "tooltip": "Luma AI model to use for generation"}),
+                "model": (list(cls.CAPABILITIES), {"default": "photon", "tooltip": "Luma AI model to use for generation"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "png", "tooltip": "Format of the output image"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results (may not be used by Luma API via HyprLab)"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your HyprLab API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "How the response data should be formatted"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "How the response data should be formatted"}),
             },
             "optional": {
                 "aspect_ratio": (["1:1", "3:4", "4:3", "9:16", "16:9", "9:21", "21:9"], {"default": "1:1", "tooltip": "Aspect ratio of the output. If not specified, model default may be used."}),
@@ -55,42 +70,16 @@ class Leon_Luma_AI_Image_API_Node(HyprLabImageGenerationNodeBase):
         input_char_ref_socket=None,
         input_char_ref_url=""
     ):
-        if len(prompt) > 10000:
-            raise ValueError("Prompt must not exceed 10,000 characters")
-        
-        actual_image_ref_url = self._resolve_image_input(
-            input_image_ref_socket, input_image_ref_url, field_name="image_reference_url"
-        )
-        actual_style_ref_url = self._resolve_image_input(
-            input_style_ref_socket, input_style_ref_url, field_name="style_reference_url"
-        )
-        actual_char_ref_url = self._resolve_image_input(
-            input_char_ref_socket, input_char_ref_url, field_name="character_reference_url"
-        )
-
-        if not prompt.strip() and not actual_image_ref_url and not actual_style_ref_url and not actual_char_ref_url:
-             raise ValueError("Prompt is required for Luma AI, or at least one reference Image (Socket) must be provided.")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format
+        params = {
+            "response_format": response_format, "output_format": output_format, "aspect_ratio": aspect_ratio,
+            "image_reference_weight": image_reference_weight, "style_reference_weight": style_reference_weight,
         }
-
-        if aspect_ratio:
-             payload["aspect_ratio"] = aspect_ratio
-        
-        if actual_image_ref_url:
-            payload["image_reference_url"] = actual_image_ref_url
-            payload["image_reference_weight"] = image_reference_weight
-        
-        if actual_style_ref_url:
-            payload["style_reference_url"] = actual_style_ref_url
-            payload["style_reference_weight"] = style_reference_weight
-
-        if actual_char_ref_url:
-            payload["character_reference_url"] = actual_char_ref_url
+        images = {
+            "image_reference_url": self._image_source(input_image_ref_socket, input_image_ref_url, field_name="image_reference_url"),
+            "style_reference_url": self._image_source(input_style_ref_socket, input_style_ref_url, field_name="style_reference_url"),
+            "character_reference_url": self._image_source(input_char_ref_socket, input_char_ref_url, field_name="character_reference_url"),
+        }
+        payload = capabilities.for_node(self, model).build(prompt, params, images, encode=self._encode_image_source)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
@@ -1,28 +1,42 @@
-import torch
-import numpy as np
-from PIL import Image
-import io
 import json
-import time
-import requests # Ensure requests is imported if not already via other means
-
-# Note: Specific imports like base64 might be needed if Leon_Midjourney_Proxy_API_Node uses them directly
-# and they are not covered by the common imports above.
-# For now, assuming the standard set (torch, numpy, PIL, io, json, time, requests) covers most needs.
-# If base64 is used by Midjourney node specifically and not by others, it should be here.
-import base64 # Leon_Midjourney_Proxy_API_Node uses json.loads for base64_array_json, but not direct base64 ops.
-             # However, it might be good practice to keep it if similar ops are added later.
-             # More critically, the original file had it at the top.
-
-def __sanitize_payload_for_logging(obj):
-    if isinstance(obj, dict):
-        return {k: __sanitize_payload_for_logging(v) for k, v in obj.items()}
-    elif isinstance(obj, list) or isinstance(obj, tuple):
-        return [__sanitize_payload_for_logging(v) for v in obj]
-    elif isinstance(obj, str) and len(obj) > 200:
-        if obj.startswith("data:image") or len(obj) > 1000:
-            return obj[:50] + f"... [truncated {len(obj)} chars]"
-    return obj
+
+from ..base import encoding, engine, log, timings
+
+logger = log.get_logger("midjourney")
+
+# How image inputs are encoded; describe only needs a faithful look at the image.
+_ENCODING = encoding.profile("midjourney", "jpeg:95")
+
+_IMAGINE = engine.ImageEngine(
+    engine.MJProxyTask("/mj/submit/imagine", "task submission", kind="mj_imagine", label="task"),
+    engine.MJTask(), logger, failed=None,
+)
+_DESCRIBE = engine.ImageEngine(
+    engine.MJProxyTask("/mj/submit/describe", "describe submission", kind="mj_describe", label="describe task"),
+    engine.MJTask(), logger, failed=None,
+)
+_UPLOAD = engine.ImageEngine(
+    engine.MJProxyTask("/mj/submit/upload-discord-images", "image upload"),
+    engine.MJTask(), logger, failed=None,
+)
+
+
+def _tensor_to_data_uri(image_tensor):
+    """Convert ComfyUI image tensor to a base64 data URI (JPEG q95 unless LEON_ENCODE_MIDJOURNEY says otherwise)."""
+    return encoding.to_data_uri(image_tensor, _ENCODING)
+
+
+def _resolve_image_input(image_tensor, image_url="", field_name="image"):
+    """Prefer an explicit URL when provided, otherwise convert the tensor to base64."""
+    url = (image_url or "").strip()
+    if image_tensor is not None and url:
+        raise ValueError(f"{field_name}: provide either an image tensor or an image URL, not both.")
+    if url:
+        return url
+    if image_tensor is not None:
+        return _tensor_to_data_uri(image_tensor)
+    return None
+
 
 class Leon_Midjourney_Proxy_API_Node:
     CATEGORY = "Leon_API"
@@ -41,29 +55,24 @@ class Leon_Midjourney_Proxy_API_Node:
                 "api_key": ("STRING", {"multiline": False, "default": "sk-midjourney", "tooltip": "Your API key for the proxy (used for both mj-api-secret and X-Api-Key headers)"}),
                 "prompt": ("STRING", {"multiline": True, "default": "dog playing ball --v 7 --ar 1:1"}),
                 "bot_type": (["MID_JOURNEY", "NIJI_JOURNEY"], {"default": "MID_JOURNEY"}),
-                "polling_interval_seconds": ("INT", {"default": 5, "min": 1, "max": 60, "tooltip": "How often to check task status (seconds)"}),
-                "max_polling_attempts": ("INT", {"default": 30, "min": 1, "max": 120, "tooltip": "Max attempts to poll for result before timeout"}),
+                "polling_interval_seconds": ("INT", {"default": 5, "min": 1, "max": 60, "tooltip": "Base polling interval (seconds). Adaptive polling checks less often early on and down to every second near the predicted finish while progress moves; a queued, stalled or late task is polled at this interval, backing off to 3x"}),
+                "max_polling_attempts": ("INT", {"default": 30, "min": 1, "max": 120, "tooltip": "Timeout budget: the task is abandoned after polling_interval_seconds x max_polling_attempts seconds"}),
             },
             "optional": {
                 "account_filter_remark": ("STRING", {"multiline": False, "default": "", "tooltip": "Optional: Remark for account filtering (e.g., lzn)"}),
                 "base64_array_json": ("STRING", {"multiline": True, "default": "", "tooltip": "Optional: JSON string for base64Array, e.g., [\"data:image/png;base64,YOUR_BASE64\"]"}),
+                "adaptive_polling": ("BOOLEAN", {"default": True, "tooltip": "Poll based on reported progress and recent task durations instead of a fixed interval"}),
             }
         }
 
     def _pil_to_rgba_tensor(self, pil_img):
-        pil_img = pil_img.convert("RGBA")
-        img_array = np.array(pil_img).astype(np.float32) / 255.0
-        if img_array.ndim == 3 and img_array.shape[-1] == 3:
-            alpha_channel = np.ones_like(img_array[..., :1])
-            img_array = np.concatenate((img_array, alpha_channel), axis=-1)
-        return torch.from_numpy(img_array).unsqueeze(0)
+        return engine.pil_to_rgba_tensor(pil_img)
 
+    @timings.instrument
     def generate_mj_image(self, mj_proxy_endpoint, api_key, prompt, bot_type, 
                           polling_interval_seconds, max_polling_attempts, 
-                          account_filter_remark="", base64_array_json=""):
+                          account_filter_remark="", base64_array_json="", adaptive_polling=True):
         
-        submit_url = f"{mj_proxy_endpoint.rstrip('/')}/mj/submit/imagine"
-        headers = {'Content-Type': 'application/json', 'mj-api-secret': api_key, 'X-Api-Key': api_key}
         payload = {"prompt": prompt, "botType": bot_type}
 
         if account_filter_remark.strip():
@@ -74,74 +83,13 @@ class Leon_Midjourney_Proxy_API_Node:
             except json.JSONDecodeError as e:
                 raise ValueError(f"Invalid JSON in base64_array_json: {str(e)}.")
 
-        print(f"MJ Proxy: Submitting to {submit_url}")
-        headers_to_print = {k: (v if k not in ['mj-api-secret', 'X-Api-Key'] else '***') for k, v in headers.items()}
-        print(f"MJ Proxy: Headers: {json.dumps(headers_to_print)}")
-        print(f"MJ Proxy: Payload: {json.dumps(__sanitize_payload_for_logging(payload))}")
-
-        try:
-            response = requests.post(submit_url, json=payload, headers=headers)
-            response.raise_for_status()
-            submit_response_json = response.json()
-            print(f"MJ Proxy: Submit Response: {json.dumps(submit_response_json)}")
-        except requests.exceptions.RequestException as e:
-            response_text = e.response.text if e.response else "No response text"
-            raise Exception(f"Midjourney task submission failed (RequestException): {str(e)}, Response: {response_text}")
-        except Exception as e:
-            response_content = response.text if 'response' in locals() else 'No response object'
-            raise Exception(f"Midjourney task submission failed (Other Exception): {str(e)}, Response: {response_content}")
-
-        if submit_response_json.get("code") != 1:
-            raise Exception(f"Midjourney task submission error: {submit_response_json.get('description', 'Unknown error')}, Code: {submit_response_json.get('code')}")
-        
-        task_id = submit_response_json.get("result")
-        if not task_id:
-            raise Exception("Midjourney task ID not found in submission response.")
-        
-        print(f"MJ Proxy: Task {task_id} submitted. Polling...")
-        fetch_url = f"{mj_proxy_endpoint.rstrip('/')}/mj/task/{task_id}/fetch"
-        
-        for attempt in range(max_polling_attempts):
-            print(f"MJ Proxy: Polling attempt {attempt + 1}/{max_polling_attempts} for task {task_id}")
-            try:
-                fetch_response = requests.get(fetch_url, headers=headers)
-                fetch_response.raise_for_status()
-                task_data = fetch_response.json()
-            except requests.exceptions.RequestException as e:
-                print(f"MJ Proxy: Polling failed (RequestException): {str(e)}. Retrying...")
-                time.sleep(polling_interval_seconds)
-                continue
-            except Exception as e:
-                print(f"MJ Proxy: Polling failed (Other Exception): {str(e)}. Retrying...")
-                time.sleep(polling_interval_seconds)
-                continue
-
-            status = task_data.get("status")
-            image_url = task_data.get("imageUrl")
-            final_prompt_from_api = task_data.get("finalPrompt", task_data.get("promptEn", prompt))
-            message_hash = task_data.get("properties", {}).get("messageHash", task_data.get("messageHash", ""))
-
-            print(f"MJ Proxy: Task {task_id} status: {status}, Progress: {task_data.get('progress', 'N/A')}")
-
-            if status == "SUCCESS":
-                if not image_url:
-                    raise Exception(f"Midjourney task {task_id} Succeeded but no imageUrl found.")
-                img_download_response = requests.get(image_url)
-                img_download_response.raise_for_status()
-                pil_img = Image.open(io.BytesIO(img_download_response.content))
-                img_tensor = self._pil_to_rgba_tensor(pil_img)
-                return (img_tensor, image_url, task_id, final_prompt_from_api, message_hash)
-            elif status == "FAILURE":
-                raise Exception(f"Midjourney task {task_id} failed: {task_data.get('failReason', 'Unknown reason')}.")
-            elif status == "MODAL":
-                 raise Exception(f"Midjourney task {task_id} is in MODAL state.")
-
-            if attempt < max_polling_attempts - 1:
-                time.sleep(polling_interval_seconds)
-            else:
-                raise Exception(f"Midjourney task {task_id} timed out. Last status: {status}.")
-        
-        raise Exception("Midjourney polling loop finished unexpectedly.")
+        img_tensor, parsed = _IMAGINE.generate(
+            payload, mj_proxy_endpoint, api_key, model=bot_type,
+            polling_interval_seconds=polling_interval_seconds,
+            max_polling_attempts=max_polling_attempts, adaptive_polling=adaptive_polling,
+        )
+        final_prompt_from_api = parsed.text or prompt
+        return (img_tensor, parsed.image_url, parsed.extra["task_id"], final_prompt_from_api, parsed.extra["message_hash"])
 
 
 class Leon_Midjourney_Describe_API_Node:
@@ -160,57 +108,19 @@ class Leon_Midjourney_Describe_API_Node:
                 "mj_proxy_endpoint": ("STRING", {"multiline": False, "default": "http://localhost:8080", "tooltip": "Base URL of your Midjourney Proxy (e.g., http://localhost:8080)"}),
                 "api_key": ("STRING", {"multiline": False, "default": "sk-midjourney", "tooltip": "Your API key for the proxy (used for both mj-api-secret and X-Api-Key headers)"}),
                 "bot_type": (["MID_JOURNEY", "NIJI_JOURNEY"], {"default": "MID_JOURNEY"}),
-                "polling_interval_seconds": ("INT", {"default": 5, "min": 1, "max": 60, "tooltip": "How often to check task status (seconds)"}),
-                "max_polling_attempts": ("INT", {"default": 30, "min": 1, "max": 120, "tooltip": "Max attempts to poll for result before timeout"}),
+                "polling_interval_seconds": ("INT", {"default": 5, "min": 1, "max": 60, "tooltip": "Base polling interval (seconds). Adaptive polling checks less often early on and down to every second near the predicted finish while progress moves; a queued, stalled or late task is polled at this interval, backing off to 3x"}),
+                "max_polling_attempts": ("INT", {"default": 30, "min": 1, "max": 120, "tooltip": "Timeout budget: the task is abandoned after polling_interval_seconds x max_polling_attempts seconds"}),
             },
             "optional": {
                 "image": ("IMAGE", {"tooltip": "Input image to describe"}),
                 "image_url": ("STRING", {"multiline": False, "default": "", "tooltip": "Optional hosted image URL to describe (use instead of socket input)"}),
                 "account_filter_remark": ("STRING", {"multiline": False, "default": "", "tooltip": "Optional: Remark for account filtering (e.g., lzn)"}),
+                "adaptive_polling": ("BOOLEAN", {"default": True, "tooltip": "Poll based on reported progress and recent task durations instead of a fixed interval"}),
             }
         }
 
     def _tensor_to_base64(self, image_tensor):
-        """Convert ComfyUI image tensor to base64 string."""
-        # Convert tensor to PIL Image
-        # Tensor shape: (batch, height, width, channels)
-        if len(image_tensor.shape) == 4:
-            image_tensor = image_tensor[0]  # Take first image from batch
-        
-        # Convert from 0-1 range to 0-255
-        if image_tensor.max() <= 1.0:
-            image_tensor = image_tensor * 255.0
-        
-        # Convert to numpy array and ensure it's uint8
-        img_array = image_tensor.cpu().numpy().astype(np.uint8)
-        
-        # Create PIL image
-        if img_array.shape[-1] == 4:  # RGBA
-            pil_img = Image.fromarray(img_array, 'RGBA')
-        elif img_array.shape[-1] == 3:  # RGB
-            pil_img = Image.fromarray(img_array, 'RGB')
-        else:
-            raise ValueError(f"Unsupported image shape: {img_array.shape}")
-        
-        # Convert to JPEG format for base64 encoding
-        buffer = io.BytesIO()
-        pil_img.convert('RGB').save(buffer, format='JPEG', quality=95)
-        buffer.seek(0)
-        
-        # Encode to base64
-        img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        return f"data:image/jpeg;base64,{img_base64}"
-
-    def _resolve_image_input(self, image_tensor, image_url="", field_name="image"):
-        """Prefer an explicit URL when provided, otherwise convert the tensor to base64."""
-        url = (image_url or "").strip()
-        if image_tensor is not None and url:
-            raise ValueError(f"{field_name}: provide either an image tensor or an image URL, not both.")
-        if url:
-            return url
-        if image_tensor is not None:
-            return self._tensor_to_base64(image_tensor)
-        return None
+        return _tensor_to_data_uri(image_tensor)
 
     def _parse_descriptions(self, prompt_text):
         """Parse the prompt text and extract 4 descriptions."""
@@ -238,84 +148,30 @@ class Leon_Midjourney_Describe_API_Node:
         
         return tuple(descriptions[:4])
 
+    @timings.instrument
     def describe_mj_image(self, mj_proxy_endpoint, api_key, bot_type,
                           polling_interval_seconds, max_polling_attempts,
-                          image=None, image_url="", account_filter_remark=""):
+                          image=None, image_url="", account_filter_remark="", adaptive_polling=True):
         
-        image_payload_value = self._resolve_image_input(image, image_url, field_name="image")
+        image_payload_value = _resolve_image_input(image, image_url, field_name="image")
         if not image_payload_value:
             raise ValueError("An image tensor or image URL must be provided for Midjourney describe.")
         
-        submit_url = f"{mj_proxy_endpoint.rstrip('/')}/mj/submit/describe"
-        headers = {'Content-Type': 'application/json', 'mj-api-secret': api_key, 'X-Api-Key': api_key}
         payload = {"botType": bot_type, "base64": image_payload_value}
 
         if account_filter_remark.strip():
             payload["accountFilter"] = {"remark": account_filter_remark.strip()}
 
-        print(f"MJ Proxy: Submitting describe to {submit_url}")
-        headers_to_print = {k: (v if k not in ['mj-api-secret', 'X-Api-Key'] else '***') for k, v in headers.items()}
-        print(f"MJ Proxy: Headers: {json.dumps(headers_to_print)}")
-        payload_to_print = {k: (v if k != 'base64' else f"data:image/jpeg;base64,[{len(v.split(',')[1]) if ',' in v else 0} chars]") for k, v in payload.items()}
-        print(f"MJ Proxy: Payload: {json.dumps(__sanitize_payload_for_logging(payload_to_print))}")
-
-        try:
-            response = requests.post(submit_url, json=payload, headers=headers)
-            response.raise_for_status()
-            submit_response_json = response.json()
-            print(f"MJ Proxy: Submit Response: {json.dumps(submit_response_json)}")
-        except requests.exceptions.RequestException as e:
-            response_text = e.response.text if e.response else "No response text"
-            raise Exception(f"Midjourney describe submission failed (RequestException): {str(e)}, Response: {response_text}")
-        except Exception as e:
-            response_content = response.text if 'response' in locals() else 'No response object'
-            raise Exception(f"Midjourney describe submission failed (Other Exception): {str(e)}, Response: {response_content}")
-
-        if submit_response_json.get("code") != 1:
-            raise Exception(f"Midjourney describe submission error: {submit_response_json.get('description', 'Unknown error')}, Code: {submit_response_json.get('code')}")
-        
-        task_id = submit_response_json.get("result")
-        if not task_id:
-            raise Exception("Midjourney describe task ID not found in submission response.")
-        
-        print(f"MJ Proxy: Describe task {task_id} submitted. Polling...")
-        fetch_url = f"{mj_proxy_endpoint.rstrip('/')}/mj/task/{task_id}/fetch"
-        
-        for attempt in range(max_polling_attempts):
-            print(f"MJ Proxy: Polling attempt {attempt + 1}/{max_polling_attempts} for describe task {task_id}")
-            try:
-                fetch_response = requests.get(fetch_url, headers=headers)
-                fetch_response.raise_for_status()
-                task_data = fetch_response.json()
-            except requests.exceptions.RequestException as e:
-                print(f"MJ Proxy: Polling failed (RequestException): {str(e)}. Retrying...")
-                time.sleep(polling_interval_seconds)
-                continue
-            except Exception as e:
-                print(f"MJ Proxy: Polling failed (Other Exception): {str(e)}. Retrying...")
-                time.sleep(polling_interval_seconds)
-                continue
-
-            status = task_data.get("status")
-            image_url = task_data.get("imageUrl", "")
-            prompt_text = task_data.get("prompt", task_data.get("promptEn", ""))
-
-            print(f"MJ Proxy: Describe task {task_id} status: {status}, Progress: {task_data.get('progress', 'N/A')}")
-
-            if status == "SUCCESS":
-                descriptions = self._parse_descriptions(prompt_text)
-                return (*descriptions, task_id, image_url)
-            elif status == "FAILURE":
-                raise Exception(f"Midjourney describe task {task_id} failed: {task_data.get('failReason', 'Unknown reason')}.")
-            elif status == "MODAL":
-                raise Exception(f"Midjourney describe task {task_id} is in MODAL state.")
-
-            if attempt < max_polling_attempts - 1:
-                time.sleep(polling_interval_seconds)
-            else:
-                raise Exception(f"Midjourney describe task {task_id} timed out. Last status: {status}.")
-        
-        raise Exception("Midjourney describe polling loop finished unexpectedly.")
+        task_data = _DESCRIBE.call(
+            payload, mj_proxy_endpoint, api_key, model=bot_type,
+            polling_interval_seconds=polling_interval_seconds,
+            max_polling_attempts=max_polling_attempts, adaptive_polling=adaptive_polling,
+        )
+
+        image_url = task_data.get("imageUrl", "")
+        prompt_text = task_data.get("prompt", task_data.get("promptEn", ""))
+        descriptions = self._parse_descriptions(prompt_text)
+        return (*descriptions, task_data["id"], image_url)
 
 
 class Leon_Midjourney_Upload_API_Node:
@@ -341,80 +197,19 @@ class Leon_Midjourney_Upload_API_Node:
             }
         }
 
-    def _tensor_to_base64(self, image_tensor):
-        """Convert ComfyUI image tensor to base64 string."""
-        # Convert tensor to PIL Image
-        # Tensor shape: (batch, height, width, channels)
-        if len(image_tensor.shape) == 4:
-            image_tensor = image_tensor[0]  # Take first image from batch
-        
-        # Convert from 0-1 range to 0-255
-        if image_tensor.max() <= 1.0:
-            image_tensor = image_tensor * 255.0
-        
-        # Convert to numpy array and ensure it's uint8
-        img_array = image_tensor.cpu().numpy().astype(np.uint8)
-        
-        # Create PIL image
-        if img_array.shape[-1] == 4:  # RGBA
-            pil_img = Image.fromarray(img_array, 'RGBA')
-        elif img_array.shape[-1] == 3:  # RGB
-            pil_img = Image.fromarray(img_array, 'RGB')
-        else:
-            raise ValueError(f"Unsupported image shape: {img_array.shape}")
-        
-        # Convert to JPEG format for base64 encoding
-        buffer = io.BytesIO()
-        pil_img.convert('RGB').save(buffer, format='JPEG', quality=95)
-        buffer.seek(0)
-        
-        # Encode to base64
-        img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        return f"data:image/jpeg;base64,{img_base64}"
-
-    def _resolve_image_input(self, image_tensor, image_url=""):
-        url = (image_url or "").strip()
-        if image_tensor is not None and url:
-            raise ValueError("image: provide either an image tensor or an image URL, not both.")
-        if url:
-            return url
-        if image_tensor is not None:
-            return self._tensor_to_base64(image_tensor)
-        return None
-
+    @timings.instrument
     def upload_mj_image(self, mj_proxy_endpoint, api_key, image=None, image_url="", account_filter_remark=""):
-        image_payload_value = self._resolve_image_input(image, image_url)
+        image_payload_value = _resolve_image_input(image, image_url)
         if not image_payload_value:
             raise ValueError("Provide an image tensor or an image URL for Midjourney upload.")
         
-        submit_url = f"{mj_proxy_endpoint.rstrip('/')}/mj/submit/upload-discord-images"
-        headers = {'Content-Type': 'application/json', 'mj-api-secret': api_key, 'X-Api-Key': api_key}
         payload = {"base64Array": [image_payload_value]}
 
         if account_filter_remark.strip():
             payload["filter"] = {"remark": account_filter_remark.strip()}
 
-        print(f"MJ Proxy: Uploading image to {submit_url}")
-        headers_to_print = {k: (v if k not in ['mj-api-secret', 'X-Api-Key'] else '***') for k, v in headers.items()}
-        print(f"MJ Proxy: Headers: {json.dumps(headers_to_print)}")
-        payload_to_print = {k: (v if k != 'base64Array' else f"[image base64 data: {len(v[0].split(',')[1]) if v and ',' in v[0] else 0} chars]") for k, v in payload.items()}
-        print(f"MJ Proxy: Payload: {json.dumps(__sanitize_payload_for_logging(payload_to_print))}")
-
-        try:
-            response = requests.post(submit_url, json=payload, headers=headers)
-            response.raise_for_status()
-            upload_response_json = response.json()
-            print(f"MJ Proxy: Upload Response: {json.dumps(upload_response_json)}")
-        except requests.exceptions.RequestException as e:
-            response_text = e.response.text if e.response else "No response text"
-            raise Exception(f"Midjourney image upload failed (RequestException): {str(e)}, Response: {response_text}")
-        except Exception as e:
-            response_content = response.text if 'response' in locals() else 'No response object'
-            raise Exception(f"Midjourney image upload failed (Other Exception): {str(e)}, Response: {response_content}")
-
-        if upload_response_json.get("code") != 1:
-            raise Exception(f"Midjourney image upload error: {upload_response_json.get('description', 'Unknown error')}, Code: {upload_response_json.get('code')}")
-        
+        upload_response_json = _UPLOAD.call(payload, mj_proxy_endpoint, api_key)
+
         result_urls = upload_response_json.get("result", [])
         if not result_urls or len(result_urls) == 0:
             raise Exception("No image URLs returned from upload response.")
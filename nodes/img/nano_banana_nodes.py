@@ -1,7 +1,18 @@
 from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
+from ..base import capabilities, encoding, engine, log, timings
+from ..base.capabilities import ALWAYS, IF_SET
+
+logger = log.get_logger("nano_banana")
 
 # Nano Banana Image Generation Nodes
 
+_TUZI_MODELS = {
+    model: {"images": {"image": {"max": 4, "collapse": True}}}
+    for model in ("nano-banana-pro", "nano-banana-pro-2k", "nano-banana-pro-vip", "nano-banana-2")
+}
+# The edit endpoint needs something to edit.
+_TUZI_EDIT_MODELS = {model: {"images": {"image": {"min": 1, "max": 4}}} for model in _TUZI_MODELS}
+
 class Leon_Nano_Banana_API_Node(HyprLabImageGenerationNodeBase):
     CATEGORY = "Leon_API"
     RETURN_TYPES = ("IMAGE", "STRING", "INT")
@@ -21,6 +32,19 @@ class Leon_Nano_Banana_API_Node(HyprLabImageGenerationNodeBase):
         "21:9",
     ]
 
+    _IMAGES = {"image_input": {"max": 4, "collapse": True}}
+    CAPABILITIES = capabilities.Table(
+        common={
+            "response_format": ALWAYS, "output_format": ALWAYS,
+            "aspect_ratio": {"send": IF_SET, "needs_images": ["match_input_image"]},
+        },
+        models={
+            "nano-banana-2": {"images": _IMAGES},
+            "nano-banana-pro": {"params": {"resolution": IF_SET}, "images": _IMAGES},
+            "nano-banana": {"images": _IMAGES},
+        },
+    )
+
     def __init__(self):
         pass
 
@@ -29,12 +53,12 @@ class Leon_Nano_Banana_API_Node(HyprLabImageGenerationNodeBase):
         return {
             "required": {
                 "prompt": ("STRING", {"multiline": True, "default": "Make the cat jump.", "tooltip": "Main text prompt that influences the output generation"}),
-                "model": (["nano-banana-2", "nano-banana-pro", "nano-banana"], {"default": "nano-banana-2", "tooltip": "Nano Banana model: pro version supports resolution control"}),
+                "model": (list(cls.CAPABILITIES), {"default": "nano-banana-2", "tooltip": "Nano Banana model: pro version supports resolution control"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "png", "tooltip": "Format of the output image"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your HyprLab API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "Format in which the response will be returned"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "Format in which the response will be returned"}),
             },
             "optional": {
                 "input_images_array": ("IMAGE_ARRAY", {"tooltip": "Array of input images (up to 4). Connect Image Array Builder node output here."}),
@@ -56,47 +80,12 @@ class Leon_Nano_Banana_API_Node(HyprLabImageGenerationNodeBase):
         aspect_ratio="1:1",
         resolution="2K"
     ):
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format
+        params = {
+            "response_format": response_format, "output_format": output_format,
+            "aspect_ratio": aspect_ratio, "resolution": resolution,
         }
-
-        # Handle image inputs from IMAGE_ARRAY
-        image_inputs = []
-        if input_images_array is not None and isinstance(input_images_array, list):
-            image_inputs = input_images_array[:4]  # Max 4 images
-
-        # Set image_input in payload based on number of images
-        if len(image_inputs) == 1:
-            # Single image input - send as string
-            payload["image_input"] = image_inputs[0]
-            print(f"🟢 {model}: Using 1 input image")
-        elif len(image_inputs) > 1:
-            # Multiple image inputs - send as array
-            payload["image_input"] = image_inputs
-            print(f"🟢 {model}: Using {len(image_inputs)} input images")
-        # If no image inputs, don't add image_input to payload (text-only mode)
-
-        if aspect_ratio:
-            if aspect_ratio == "match_input_image":
-                if image_inputs:
-                    payload["aspect_ratio"] = aspect_ratio
-                else:
-                    print(f"⚠️ {model}: 'match_input_image' requires at least one image_input, skipping aspect_ratio")
-            else:
-                payload["aspect_ratio"] = aspect_ratio
-
-        # Resolution parameter (nano-banana-pro only)
-        if model == "nano-banana-pro" and resolution:
-            payload["resolution"] = resolution
-            print(f"🟢 nano-banana-pro: Using resolution '{resolution}'")
-        elif model == "nano-banana" and resolution != "2K":
-            print(f"⚠️ nano-banana: 'resolution' parameter only supported by nano-banana-pro")
+        images = {"image_input": input_images_array if isinstance(input_images_array, list) else None}
+        payload = capabilities.for_node(self, model).build(prompt, params, images)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
@@ -107,6 +96,11 @@ class Leon_Nano_Banana_Tuzi_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_TYPES = ("IMAGE", "STRING", "INT")
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_tuzi_image"
+    CAPABILITIES = capabilities.Table(
+        common={"response_format": ALWAYS, "size": IF_SET, "quality": IF_SET},
+        prompt={"max_chars": 1000},
+        models=_TUZI_MODELS,
+    )
     SIZE_CHOICES = [
         "1x1",    # 1024x1024
         "2x3",    # 832x1248
@@ -128,10 +122,10 @@ class Leon_Nano_Banana_Tuzi_API_Node(HyprLabImageGenerationNodeBase):
         return {
             "required": {
                 "prompt": ("STRING", {"multiline": True, "default": "a cat.", "tooltip": "Text description of the desired image. Maximum length 1000 characters."}),
-                "model": (["nano-banana-pro", "nano-banana-pro-2k", "nano-banana-pro-vip", "nano-banana-2"], {"default": "nano-banana-pro", "tooltip": "Nano Banana 2 model variants"}),
+                "model": (list(cls.CAPABILITIES), {"default": "nano-banana-pro", "tooltip": "Nano Banana 2 model variants"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your Tuzi API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "Format for returning the generated image. Must be either url or b64_json."}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "Format for returning the generated image: url, b64_json, or auto (whichever has been faster for this model and size)."}),
             },
             "optional": {
                 "input_images_array": ("IMAGE_ARRAY", {"tooltip": "Array of input images (up to 4). Connect Image Array Builder node output here."}),
@@ -151,33 +145,9 @@ class Leon_Nano_Banana_Tuzi_API_Node(HyprLabImageGenerationNodeBase):
         size="1x1",
         quality="2k"
     ):
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "response_format": response_format,
-        }
-
-        if size:
-            payload["size"] = size
-
-        if quality:
-            payload["quality"] = quality
-
-        # Handle image inputs from IMAGE_ARRAY
-        image_inputs = []
-        if input_images_array is not None and isinstance(input_images_array, list):
-            image_inputs = input_images_array[:4]  # Max 4 images
-
-        # Set image in payload based on number of images
-        if len(image_inputs) == 1:
-            payload["image"] = image_inputs[0]
-            print(f"🐰 Tuzi {model}: Using 1 input image")
-        elif len(image_inputs) > 1:
-            payload["image"] = image_inputs
-            print(f"🐰 Tuzi {model}: Using {len(image_inputs)} input images")
+        params = {"response_format": response_format, "size": size, "quality": quality}
+        images = {"image": input_images_array if isinstance(input_images_array, list) else None}
+        payload = capabilities.for_node(self, model).build(prompt, params, images)
 
         api_url = "https://api.tu-zi.com/v1/images/generations"
         return self._make_api_call(payload, api_url, api_key, response_format, "png", seed)
@@ -189,6 +159,13 @@ class Leon_Nano_Banana_Edit_Tuzi_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_TYPES = ("IMAGE", "STRING", "INT")
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "edit_tuzi_image"
+    # The edit endpoint takes multipart form data; the response is OpenAI-style.
+    ENGINE = engine.ImageEngine(engine.BearerMultipart(), engine.OpenAIImages(), logger, failed="Image edit failed")
+    CAPABILITIES = capabilities.Table(
+        common={"response_format": ALWAYS, "size": IF_SET, "quality": IF_SET},
+        prompt={"max_chars": 1000},
+        models=_TUZI_EDIT_MODELS,
+    )
     SIZE_CHOICES = [
         "1x1",    # 1024x1024
         "2x3",    # 832x1248
@@ -210,10 +187,10 @@ class Leon_Nano_Banana_Edit_Tuzi_API_Node(HyprLabImageGenerationNodeBase):
         return {
             "required": {
                 "prompt": ("STRING", {"multiline": True, "default": "merge two images", "tooltip": "Text description of the desired image. Maximum length 1000 characters."}),
-                "model": (["nano-banana-pro", "nano-banana-pro-2k", "nano-banana-pro-vip", "nano-banana-2"], {"default": "nano-banana-pro", "tooltip": "Nano Banana 2 model variants"}),
+                "model": (list(cls.CAPABILITIES), {"default": "nano-banana-pro", "tooltip": "Nano Banana 2 model variants"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your Tuzi API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "Format for returning the generated image. Must be either url or b64_json."}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "Format for returning the generated image: url, b64_json, or auto (whichever has been faster for this model and size)."}),
             },
             "optional": {
                 "input_images_array": ("IMAGE_ARRAY", {"tooltip": "Array of input images to edit. Connect Image Array Builder node output here. REQUIRED for edit."}),
@@ -223,6 +200,7 @@ class Leon_Nano_Banana_Edit_Tuzi_API_Node(HyprLabImageGenerationNodeBase):
             }
         }
 
+    @timings.instrument
     def edit_tuzi_image(
         self,
         prompt,
@@ -235,25 +213,20 @@ class Leon_Nano_Banana_Edit_Tuzi_API_Node(HyprLabImageGenerationNodeBase):
         size="1x1",
         quality="2k"
     ):
-        import requests
         import random
         import io
         import base64
-        import numpy as np
-        from PIL import Image
-        import torch
 
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
+        # The edit endpoint takes multipart form data, so only the checks come from the table.
+        capabilities.for_node(self, model).validate(
+            prompt, {"response_format": response_format, "size": size, "quality": quality},
+            {"image": input_images_array if isinstance(input_images_array, list) else None},
+        )
 
         random.seed(seed)
 
         api_url = "https://api.tu-zi.com/v1/images/edits"
 
-        headers = {
-            "Authorization": f"Bearer {api_key}"
-        }
-
         # Build multipart form data
         form_data = {
             "model": (None, model),
@@ -271,7 +244,7 @@ class Leon_Nano_Banana_Edit_Tuzi_API_Node(HyprLabImageGenerationNodeBase):
         # The Tuzi edit API supports multiple images via multipart form
         image_files = []
         if input_images_array is not None and isinstance(input_images_array, list):
-            for i, img_data in enumerate(input_images_array[:4]):
+            for i, img_data in enumerate(input_images_array):
                 # img_data could be a base64 data URI or URL
                 if isinstance(img_data, str):
                     if img_data.startswith("data:image"):
@@ -290,70 +263,17 @@ class Leon_Nano_Banana_Edit_Tuzi_API_Node(HyprLabImageGenerationNodeBase):
 
         # Handle mask image if provided
         if mask_image is not None:
-            mask_base64 = self._tensor_to_base64_data_uri(mask_image)
-            if mask_base64 and mask_base64.startswith("data:image"):
-                base64_str = mask_base64.split(",", 1)[1]
-                mask_bytes = base64.b64decode(base64_str)
-                form_data["mask"] = ("mask.png", io.BytesIO(mask_bytes), "image/png")
-
-        try:
-            # Combine form_data and image_files for the multipart request
-            # Convert form_data dict to list of tuples and append image files
-            all_files = [(k, v) for k, v in form_data.items()] + image_files
-            response = requests.post(api_url, headers=headers, files=all_files)
-
-            print(f"API Request URL: {api_url}")
-            print(f"HTTP status: {response.status_code}")
-            response_text_to_print = response.text
-            if "b64_json" in response_text_to_print and len(response_text_to_print) > 1000:
-                response_text_to_print = response_text_to_print[:500] + "... (response truncated)"
-            print(f"Response: {response_text_to_print}")
-
-            response.raise_for_status()
-            response_json = response.json()
-
-            pil_img = None
-            actual_image_url = ""
-
-            if response_format == "b64_json":
-                b64_data = response_json["data"][0]["b64_json"]
-                img_data = base64.b64decode(b64_data)
-                pil_img = Image.open(io.BytesIO(img_data))
-                actual_image_url = f"data:image/png;base64,{b64_data}"
-            else:
-                actual_image_url = response_json["data"][0]["url"]
-                if not actual_image_url:
-                    raise Exception(f"Image URL not found in response: {response_json}")
-
-                img_response = requests.get(actual_image_url)
-                if img_response.status_code != 200:
-                    raise Exception(f"Failed to download the image from {actual_image_url}, status: {img_response.status_code}")
-                pil_img = Image.open(io.BytesIO(img_response.content))
-
-            if pil_img is None:
-                raise Exception("Failed to load image from API response")
-
-            pil_img = pil_img.convert("RGBA")
-            img_array = np.array(pil_img).astype(np.float32) / 255.0
-
-            if img_array.ndim == 3 and img_array.shape[-1] == 3:
-                alpha_channel = np.ones_like(img_array[..., :1])
-                img_array = np.concatenate((img_array, alpha_channel), axis=-1)
-
-            img_tensor = torch.from_numpy(img_array).unsqueeze(0)
-
-            return (img_tensor, actual_image_url, seed)
-
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"API request failed: {str(e)}")
-        except KeyError as e:
-            err_text = response.text if 'response' in locals() else 'Response object not available'
-            print(f"Full error response for KeyError: {self._format_error_response(err_text)}")
-            raise Exception(f"Unexpected response format (KeyError): {str(e)}. Check API documentation and response structure.")
-        except Exception as e:
-            err_text = response.text if 'response' in locals() else 'Response object not available'
-            print(f"Full error response for other Exception: {self._format_error_response(err_text)}")
-            raise Exception(f"Image edit failed: {str(e)}")
+            # Masks stay lossless PNG whatever the encoding policy is.
+            mask_bytes, _ = encoding.encode(mask_image, encoding.Policy("png"))
+            form_data["mask"] = ("mask.png", io.BytesIO(mask_bytes), "image/png")
+
+        # Combine form_data and image_files for the multipart request
+        # Convert form_data dict to list of tuples and append image files
+        all_files = [(k, v) for k, v in form_data.items()] + image_files
+        img_tensor, parsed = self.ENGINE.generate(
+            all_files, api_url, api_key, model=model, response_format=response_format, output_format="png",
+        )
+        return (img_tensor, parsed.image_url, seed)
 
 
 # Node mappings for ComfyUI
@@ -1,3 +1,5 @@
+from ..base import capabilities
+from ..base.capabilities import ALWAYS
 from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
 
 class Leon_GPT_Image_API_Node(HyprLabImageGenerationNodeBase):
@@ -6,6 +8,17 @@ class Leon_GPT_Image_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_gpt_image"
 
+    _IMAGES = {"image": None, "mask": 1}
+    CAPABILITIES = capabilities.Table(
+        common={"quality": ALWAYS, "size": ALWAYS, "response_format": ALWAYS, "output_format": ALWAYS},
+        models={
+            "gpt-image-2": {"images": _IMAGES},
+            "gpt-image-1.5": {"params": {"background": ALWAYS, "input_fidelity": ALWAYS}, "images": _IMAGES},
+            "gpt-image-1": {"params": {"background": ALWAYS, "input_fidelity": ALWAYS}, "images": _IMAGES},
+            "gpt-image-1-mini": {"params": {"background": ALWAYS}, "images": _IMAGES},
+        },
+    )
+
     def __init__(self):
         super().__init__()
 
@@ -13,11 +26,11 @@ class Leon_GPT_Image_API_Node(HyprLabImageGenerationNodeBase):
     def INPUT_TYPES(cls):
         return {
             "required": {
-                "model": (["gpt-image-2", "gpt-image-1.5", "gpt-image-1", "gpt-image-1-mini"], {"default": "gpt-image-2"}),
+                "model": (list(cls.CAPABILITIES), {"default": "gpt-image-2"}),
                 "prompt": ("STRING", {"multiline": True, "default": "A cute cat.", "tooltip": "Text description of the image to generate"}),
                 "quality": (["high", "medium", "low"], {"default": "medium", "tooltip": "Image generation quality"}),
                 "size": (["auto", "1024x1024", "1536x1024", "1024x1536", "2048x2048", "2048x1152", "3840x2160", "2160x3840"], {"default": "1024x1024", "tooltip": "Size of the generated image"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "Format of the response"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "Format of the response"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "png", "tooltip": "Output image format"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
@@ -49,33 +62,15 @@ class Leon_GPT_Image_API_Node(HyprLabImageGenerationNodeBase):
         background="auto",
         input_fidelity="low"
     ):
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "quality": quality,
-            "size": size,
-            "response_format": response_format,
-            "output_format": output_format
+        params = {
+            "quality": quality, "size": size, "response_format": response_format, "output_format": output_format,
+            "background": background, "input_fidelity": input_fidelity,
         }
-
-        # Handle multiple image inputs
-        if input_images_array is not None and isinstance(input_images_array, list) and len(input_images_array) > 0:
-            payload["image"] = input_images_array
-
-        # Handle mask image
-        resolved_mask = self._resolve_image_input(mask_image, mask_image_url, field_name="mask")
-        if resolved_mask:
-            payload["mask"] = resolved_mask
-
-        # Apply model-specific parameters
-        if model in ["gpt-image-1.5", "gpt-image-1", "gpt-image-1-mini"]:
-            payload["background"] = background
-        
-        if model in ["gpt-image-1.5", "gpt-image-1"]:
-            payload["input_fidelity"] = input_fidelity
+        images = {
+            "image": input_images_array if isinstance(input_images_array, list) else None,
+            "mask": self._image_source(mask_image, mask_image_url, field_name="mask"),
+        }
+        payload = capabilities.for_node(self, model).build(prompt, params, images, encode=self._encode_image_source)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
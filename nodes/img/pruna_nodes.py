@@ -1,5 +1,9 @@
+from ..base import capabilities
+from ..base.capabilities import ALWAYS
 from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
 
+_FORMATS = {"response_format": ALWAYS, "output_format": ALWAYS}
+
 class Leon_Pruna_API_Node(HyprLabImageGenerationNodeBase):
     """Pruna AI p-image generation model."""
     CATEGORY = "Leon_API"
@@ -7,6 +11,8 @@ class Leon_Pruna_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_pruna_image"
 
+    CAPABILITIES = capabilities.Table(common=_FORMATS, models={"p-image": {"params": {"aspect_ratio": ALWAYS}}})
+
     ASPECT_RATIO_CHOICES = [
         "1:1", "3:4", "4:3", "9:16", "16:9", "2:3", "3:2", "21:9", "9:21"
     ]
@@ -23,7 +29,7 @@ class Leon_Pruna_API_Node(HyprLabImageGenerationNodeBase):
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your HyprLab/Pruna API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "How the response data should be formatted"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "How the response data should be formatted"}),
             },
             "optional": {
                 "aspect_ratio": (cls.ASPECT_RATIO_CHOICES, {"default": "1:1", "tooltip": "Aspect ratio of the generated image"}),
@@ -40,16 +46,8 @@ class Leon_Pruna_API_Node(HyprLabImageGenerationNodeBase):
         response_format,
         aspect_ratio="1:1"
     ):
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-
-        payload = {
-            "model": "p-image",
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format,
-            "aspect_ratio": aspect_ratio
-        }
+        params = {"response_format": response_format, "output_format": output_format, "aspect_ratio": aspect_ratio}
+        payload = capabilities.for_node(self, "p-image").build(prompt, params)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
@@ -61,6 +59,10 @@ class Leon_Pruna_Image_Edit_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_pruna_image_edit"
 
+    CAPABILITIES = capabilities.Table(common=_FORMATS, models={
+        "p-image-edit": {"params": {"aspect_ratio": ALWAYS}, "images": {"images": {"min": 1}}},
+    })
+
     ASPECT_RATIO_CHOICES = [
         "1:1", "3:4", "4:3", "9:16", "16:9", "2:3", "3:2", "21:9", "9:21"
     ]
@@ -77,7 +79,7 @@ class Leon_Pruna_Image_Edit_Node(HyprLabImageGenerationNodeBase):
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your HyprLab/Pruna API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "How the response data should be formatted"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "How the response data should be formatted"}),
             },
             "optional": {
                 "input_images_array": ("IMAGE_ARRAY", {"tooltip": "Array of input images for guidance. Connect Image Array Builder node output here."}),
@@ -96,24 +98,9 @@ class Leon_Pruna_Image_Edit_Node(HyprLabImageGenerationNodeBase):
         input_images_array=None,
         aspect_ratio="1:1"
     ):
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-
-        payload = {
-            "model": "p-image-edit",
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format,
-            "aspect_ratio": aspect_ratio
-        }
-
-        # Handle image inputs from IMAGE_ARRAY
-        if input_images_array is not None and isinstance(input_images_array, list):
-            # Pass all images
-            payload["images"] = input_images_array
-            print(f"🟢 p-image-edit: Using {len(input_images_array)} input image(s)")
-        else:
-            raise ValueError("p-image-edit requires an input image array (images parameter)")
+        params = {"response_format": response_format, "output_format": output_format, "aspect_ratio": aspect_ratio}
+        images = {"images": input_images_array if isinstance(input_images_array, list) else None}
+        payload = capabilities.for_node(self, "p-image-edit").build(prompt, params, images)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
@@ -125,6 +112,15 @@ class Leon_Pruna_Image_Upscale_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_pruna_image_upscale"
 
+    CAPABILITIES = capabilities.Table(common=_FORMATS, models={
+        "p-image-upscale": {
+            "prompt": None,
+            "params": {"upscale_mode": ALWAYS, "target": ALWAYS, "factor": ALWAYS,
+                       "enhance_details": ALWAYS, "enhance_realism": ALWAYS},
+            "images": {"image": {"min": 1, "max": 1}},
+        },
+    })
+
     UPSCALE_MODES = ["target", "factor"]
 
     def __init__(self):
@@ -143,7 +139,7 @@ class Leon_Pruna_Image_Upscale_Node(HyprLabImageGenerationNodeBase):
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your HyprLab/Pruna API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "How the response data should be formatted"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "How the response data should be formatted"}),
             },
             "optional": {
                 "image": ("IMAGE", {"tooltip": "Single input image"}),
@@ -166,22 +162,13 @@ class Leon_Pruna_Image_Upscale_Node(HyprLabImageGenerationNodeBase):
         image=None,
         image_url=""
     ):
-        payload = {
-            "model": "p-image-upscale",
-            "upscale_mode": upscale_mode,
-            "target": target,
-            "factor": factor,
-            "enhance_details": enhance_details,
-            "enhance_realism": enhance_realism,
-            "response_format": response_format,
-            "output_format": output_format
+        params = {
+            "upscale_mode": upscale_mode, "target": target, "factor": factor,
+            "enhance_details": enhance_details, "enhance_realism": enhance_realism,
+            "response_format": response_format, "output_format": output_format,
         }
-
-        # Handle image inputs
-        resolved_image = self._resolve_image_input(image, image_url, field_name="image")
-        if not resolved_image:
-            raise ValueError("p-image-upscale requires an input image or image_url")
-        payload["image"] = resolved_image
+        images = {"image": self._image_source(image, image_url, field_name="image")}
+        payload = capabilities.for_node(self, "p-image-upscale").build(params=params, images=images, encode=self._encode_image_source)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
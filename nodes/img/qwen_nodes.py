@@ -1,3 +1,5 @@
+from ..base import capabilities
+from ..base.capabilities import ALWAYS, IF_SET
 from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
 
 # Qwen Image Generation Nodes
@@ -8,6 +10,11 @@ class Leon_Qwen_Image_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_qwen_image"
 
+    CAPABILITIES = capabilities.Table(
+        common={"response_format": ALWAYS, "output_format": ALWAYS, "aspect_ratio": ALWAYS},
+        models={"qwen-image-max": {"images": {"image": None}}, "qwen-image": {"images": {"image": None}}},
+    )
+
     def __init__(self):
         pass
 
@@ -16,12 +23,12 @@ class Leon_Qwen_Image_API_Node(HyprLabImageGenerationNodeBase):
         return {
             "required": {
                 "prompt": ("STRING", {"multiline": True, "default": "A cute cat", "tooltip": "Text description of the image to generate"}),
-                "model": (["qwen-image-max","qwen-image"], {"default": "qwen-image-max", "tooltip": "Qwen image generation model"}),
+                "model": (list(cls.CAPABILITIES), {"default": "qwen-image-max", "tooltip": "Qwen image generation model"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "png", "tooltip": "Format of the output image"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your HyprLab API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "Format of the response data"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "Format of the response data"}),
                 "aspect_ratio": (["1:1", "16:9", "9:16", "4:3", "3:4"], {"default": "1:1", "tooltip": "Aspect ratio of the generated image"}),
             },
             "optional": {
@@ -45,25 +52,13 @@ class Leon_Qwen_Image_API_Node(HyprLabImageGenerationNodeBase):
         image_url="",
         input_images_array=None
     ):
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format,
-            "aspect_ratio": aspect_ratio
-        }
-
-        if input_images_array is not None and isinstance(input_images_array, list):
-            payload["image"] = input_images_array
-            print(f"🟢 {model}: Using {len(input_images_array)} input image(s)")
+        params = {"response_format": response_format, "output_format": output_format, "aspect_ratio": aspect_ratio}
+        if isinstance(input_images_array, list):
+            images = {"image": input_images_array}
         else:
-            resolved_image = self._resolve_image_input(image, image_url, field_name="image")
-            if resolved_image:
-                payload["image"] = resolved_image
-        
+            images = {"image": self._image_source(image, image_url, field_name="image")}
+        payload = capabilities.for_node(self, model).build(prompt, params, images, encode=self._encode_image_source)
+
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 class Leon_Qwen_Image_Edit_API_Node(HyprLabImageGenerationNodeBase):
     CATEGORY = "Leon_API"
@@ -71,6 +66,11 @@ class Leon_Qwen_Image_Edit_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_qwen_image_edit"
 
+    CAPABILITIES = capabilities.Table(
+        common={"response_format": ALWAYS, "output_format": ALWAYS, "aspect_ratio": IF_SET},
+        models={"qwen-image-edit": {"images": {"input_image": {"field": "image", "min": 1, "max": 1}}}},
+    )
+
     def __init__(self):
         pass
 
@@ -79,8 +79,8 @@ class Leon_Qwen_Image_Edit_API_Node(HyprLabImageGenerationNodeBase):
         return {
             "required": {
                 "prompt": ("STRING", {"multiline": True, "default": "Edit the image to look like a watercolor painting", "tooltip": "Text instruction for editing"}),
-                "model": (["qwen-image-edit"], {"default": "qwen-image-edit", "tooltip": "Qwen image edit model"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "Format of the response data"}),
+                "model": (list(cls.CAPABILITIES), {"default": "qwen-image-edit", "tooltip": "Qwen image edit model"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "Format of the response data"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "png", "tooltip": "Output image format"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
@@ -106,25 +106,9 @@ class Leon_Qwen_Image_Edit_API_Node(HyprLabImageGenerationNodeBase):
         input_image_url="",
         aspect_ratio="1:1",
     ):
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-
-        resolved_input_image = self._resolve_image_input(
-            input_image, input_image_url, field_name="input_image"
-        )
-        if not resolved_input_image:
-            raise ValueError("input_image (tensor or URL) is required for qwen-image-edit")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format,
-            "image": resolved_input_image,
-        }
-
-        if aspect_ratio:
-            payload["aspect_ratio"] = aspect_ratio
+        params = {"response_format": response_format, "output_format": output_format, "aspect_ratio": aspect_ratio}
+        images = {"input_image": self._image_source(input_image, input_image_url, field_name="input_image")}
+        payload = capabilities.for_node(self, model).build(prompt, params, images, encode=self._encode_image_source)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
@@ -1,3 +1,5 @@
+from ..base import capabilities
+from ..base.capabilities import ALWAYS, IF_SET
 from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
 
 # Recraft Image Generation Nodes
@@ -8,6 +10,12 @@ class Leon_Recraft_Image_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_recraft_image"
 
+    CAPABILITIES = capabilities.Table(
+        common={"response_format": ALWAYS, "output_format": ALWAYS, "size": IF_SET, "style": IF_SET},
+        prompt={"max_chars": 10000},
+        models={"recraft-v3": {}},
+    )
+
     def __init__(self):
         pass
 
@@ -16,12 +24,12 @@ class Leon_Recraft_Image_API_Node(HyprLabImageGenerationNodeBase):
         return {
             "required": {
                 "prompt": ("STRING", {"multiline": True, "default": "cat", "tooltip": "Main text that influences the image generation (max 10,000 characters)"}),
-                "model": (["recraft-v3"], {"default": "recraft-v3", "tooltip": "Recraft AI model to use for generation"}),
+                "model": (list(cls.CAPABILITIES), {"default": "recraft-v3", "tooltip": "Recraft AI model to use for generation"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "webp", "tooltip": "Format of the output image"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your HyprLab API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "How the response data should be formatted"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "How the response data should be formatted"}),
             },
             "optional": {
                 "size": ([
@@ -54,24 +62,9 @@ class Leon_Recraft_Image_API_Node(HyprLabImageGenerationNodeBase):
         size="1024x1024",
         style="realistic_image"
     ):
-        if len(prompt) > 10000:
-            raise ValueError("Prompt must not exceed 10,000 characters")
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "response_format": response_format,
-            "output_format": output_format
-        }
+        params = {"response_format": response_format, "output_format": output_format, "size": size, "style": style}
+        payload = capabilities.for_node(self, model).build(prompt, params)
 
-        # Add optional parameters
-        if size:
-            payload["size"] = size
-        if style:
-            payload["style"] = style
-        
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
 
@@ -1,3 +1,5 @@
+from ..base import capabilities
+from ..base.capabilities import ALWAYS
 from ..base.hyprlab_base import HyprLabImageGenerationNodeBase
 
 # Grok Image Generation Nodes
@@ -8,6 +10,11 @@ class Leon_Grok2_Image_API_Node(HyprLabImageGenerationNodeBase):
     RETURN_NAMES = ("image", "image_url", "seed")
     FUNCTION = "generate_grok_image"
 
+    CAPABILITIES = capabilities.Table(
+        common={"aspect_ratio": ALWAYS, "resolution": ALWAYS, "response_format": ALWAYS, "output_format": ALWAYS},
+        models={"grok-imagine-image": {"images": {"image": None}}, "grok-imagine-image-pro": {"images": {"image": None}}},
+    )
+
     def __init__(self):
         pass
 
@@ -16,14 +23,14 @@ class Leon_Grok2_Image_API_Node(HyprLabImageGenerationNodeBase):
         return {
             "required": {
                 "prompt": ("STRING", {"multiline": True, "default": "A cute cat.", "tooltip": "Text description of the image to generate"}),
-                "model": (["grok-imagine-image", "grok-imagine-image-pro"], {"default": "grok-imagine-image", "tooltip": "Grok image generation model"}),
+                "model": (list(cls.CAPABILITIES), {"default": "grok-imagine-image", "tooltip": "Grok image generation model"}),
                 "aspect_ratio": (["1:1", "3:4", "4:3", "9:16", "16:9", "2:3", "3:2", "21:9", "9:21"], {"default": "1:1", "tooltip": "Aspect ratio of the generated image"}),
                 "resolution": (["1K", "2K"], {"default": "1K", "tooltip": "Resolution for the generated image"}),
                 "output_format": (["png", "jpeg", "webp"], {"default": "png", "tooltip": "Format of the output image"}),
                 "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff, "tooltip": "Random seed for reproducible results"}),
                 "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/images/generations", "tooltip": "API URL"}),
                 "api_key": ("STRING", {"multiline": False, "default": "YOUR_API_KEY_HERE", "tooltip": "Your HyprLab API key"}),
-                "response_format": (["url", "b64_json"], {"default": "url", "tooltip": "Format of the response data"}),
+                "response_format": (["url", "b64_json", "auto"], {"default": "url", "tooltip": "Format of the response data"}),
             },
             "optional": {
                 "image": ("IMAGE_ARRAY", {"tooltip": "Array of input images (optional)"}),
@@ -43,20 +50,12 @@ class Leon_Grok2_Image_API_Node(HyprLabImageGenerationNodeBase):
         response_format,
         image=None
     ):
-        if not prompt.strip():
-            raise ValueError("Prompt must be a non-empty string")
-
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "aspect_ratio": aspect_ratio,
-            "resolution": resolution,
-            "response_format": response_format,
-            "output_format": output_format
+        params = {
+            "aspect_ratio": aspect_ratio, "resolution": resolution,
+            "response_format": response_format, "output_format": output_format,
         }
-
-        if image is not None and isinstance(image, list):
-            payload["image"] = image
+        images = {"image": image if isinstance(image, list) else None}
+        payload = capabilities.for_node(self, model).build(prompt, params, images)
 
         return self._make_api_call(payload, api_url, api_key, response_format, output_format, seed)
 
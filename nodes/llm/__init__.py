@@ -1,3 +1,16 @@
-from .llm_api_nodes import LLM_NODE_CLASS_MAPPINGS, LLM_NODE_DISPLAY_NAME_MAPPINGS
+import importlib
+
+
+# Imported on first access; see nodes/img/__init__.py.
+def __getattr__(name):
+    if name in ("LLM_NODE_CLASS_MAPPINGS", "LLM_NODE_DISPLAY_NAME_MAPPINGS"):
+        chat = importlib.import_module(".llm_api_nodes", __name__)
+        selector = importlib.import_module(".model_selector_node", __name__)
+        return {
+            **getattr(chat, name),
+            **getattr(selector, name.replace("LLM_", "MODEL_SELECTOR_", 1))
+        }
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["LLM_NODE_CLASS_MAPPINGS", "LLM_NODE_DISPLAY_NAME_MAPPINGS"]
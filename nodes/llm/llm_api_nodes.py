@@ -1,93 +1,48 @@
-import tenacity
 import base64
-from PIL import Image
-import io
 import requests
 import json
-import os
 
+from ..base import encoding, engine, log, timings, uploads, vision
+from ..base.circuit_breaker import CircuitOpenError
+from ..base.interrupt import InterruptProcessingException
+
+logger = log.get_logger("llm")
 
 
 # Base class for HyprLab LLM Nodes
 class HyprLabLLMNodeBase:
     CATEGORY = "Leon_API"
-    
-    @tenacity.retry(
-        wait=tenacity.wait_exponential(multiplier=1.25, min=5, max=30),
-        stop=tenacity.stop_after_attempt(5)
-    )
-    def _make_llm_api_call(self, payload, api_url, api_key):
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
+    # Vision inputs: lossless PNG buys nothing here (LEON_ENCODE_LLM).
+    ENCODING = encoding.profile("llm", "auto:90")
+    # Same request path as the HyprLab image nodes: idempotency key, journal
+    # and retries come from the engine. The answer is parsed once, after them.
+    ENGINE = engine.ProviderEngine(engine.BearerJSON(), engine.OpenAIChat(), logger)
 
+    @timings.instrument
+    def _make_llm_api_call(self, payload, api_url, api_key):
+        payload = uploads.offload(payload, api_url, api_key)
         try:
-            response = requests.post(api_url.rstrip('/'), json=payload, headers=headers)
-            
-            print(f"LLM API Request URL: {api_url.rstrip('/')}")
-            print(f"LLM API Request Payload: {json.dumps(self._sanitize_payload_for_logging(payload), indent=2)}")
-            print(f"HTTP status: {response.status_code}")
-            
-            response.raise_for_status()
-            response_json = response.json()
-            
-            print(f"LLM API Response: {json.dumps(self._sanitize_payload_for_logging(response_json), indent=2)}")
-            
-            # Extract the response text
-            if "choices" in response_json and len(response_json["choices"]) > 0:
-                choice = response_json["choices"][0]
-                if "message" in choice and "content" in choice["message"]:
-                    return choice["message"]["content"]
-                elif "text" in choice:
-                    return choice["text"]
-            
-            raise Exception(f"Unexpected response format: {response_json}")
+            response_json = self.ENGINE.call(payload, api_url, api_key, model=payload.get("model", ""))
+            logger.debug("LLM API Response: %s",
+                         log.Lazy(lambda: json.dumps(engine.sanitize_for_logging(response_json), indent=2)))
+            return self.ENGINE.parser.parse(response_json).text
 
+        except (CircuitOpenError, InterruptProcessingException):
+            raise
         except requests.exceptions.RequestException as e:
             raise Exception(f"LLM API request failed: {str(e)}")
         except Exception as e:
-            err_text = response.text if 'response' in locals() else 'Response object not available'
-            print(f"Full error response: {self._format_error_response(err_text)}")
-            raise Exception(f"LLM API call failed: {str(e)}")
+            logger.error("LLM API call failed: %s", e)
+            # Keep the type so an unusable answer is still recognisable as one.
+            wrap = engine.BadResponse if isinstance(e, engine.BadResponse) else Exception
+            raise wrap(f"LLM API call failed: {str(e)}")
 
-    def _format_error_response(self, err_text):
-        try:
-            parsed = json.loads(err_text)
-            sanitized = self._sanitize_payload_for_logging(parsed)
-            return json.dumps(sanitized)
-        except Exception:
-            if len(err_text) > 5000:
-                return err_text[:5000] + '...[truncated]'
-            return err_text
-
-    def _sanitize_payload_for_logging(self, obj):
-        if isinstance(obj, dict):
-            return {k: self._sanitize_payload_for_logging(v) for k, v in obj.items()}
-        elif isinstance(obj, list) or isinstance(obj, tuple):
-            return [self._sanitize_payload_for_logging(v) for v in obj]
-        elif isinstance(obj, str) and len(obj) > 200:
-            if obj.startswith("data:image") or len(obj) > 1000:
-                return obj[:50] + f"... [truncated {len(obj)} chars]"
-        return obj
-
-    def _tensor_to_base64_data_uri(self, tensor_image):
+    def _tensor_to_base64_data_uri(self, tensor_image, model):
+        """The image as a data URI, pre-sized to what `model` actually looks at."""
         if tensor_image is None:
             return None
-        
-        if tensor_image.ndim == 4:
-            tensor_image = tensor_image[0]
-        
-        import torch
-        import numpy as np
-        
-        np_image = (tensor_image.cpu().numpy() * 255).astype(np.uint8)
-        pil_image = Image.fromarray(np_image, 'RGBA' if np_image.shape[-1] == 4 else 'RGB')
-        
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format="PNG")
-        base64_str = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        return f"data:image/png;base64,{base64_str}"
+        data, mime = vision.encode_tensor(tensor_image, model, self.ENCODING)
+        return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
 
 
 class Leon_LLM_Chat_API_Node(HyprLabLLMNodeBase):
@@ -148,13 +103,13 @@ class Leon_LLM_Chat_API_Node(HyprLabLLMNodeBase):
             # Multiple images from IMAGE_ARRAY
             user_content = [{"type": "text", "text": user_message}]
             for img_data in image_array:
-                user_content.append({"type": "image_url", "image_url": {"url": img_data}})
+                user_content.append({"type": "image_url", "image_url": {"url": vision.presize_data_uri(img_data, model, self.ENCODING)}})
             print(f"🟢 LLM Chat: Processing {len(image_array)} images from IMAGE_ARRAY")
         elif has_image_socket or has_image_url:
             # Single image input
             if has_image_socket:
                 # Use socket input (convert tensor to base64)
-                image_data_uri = self._tensor_to_base64_data_uri(input_image)
+                image_data_uri = self._tensor_to_base64_data_uri(input_image, model)
             else:
                 # Use URL input directly
                 image_data_uri = image_url
@@ -248,13 +203,13 @@ class Leon_LLM_JSON_API_Node(HyprLabLLMNodeBase):
             # Multiple images from IMAGE_ARRAY
             user_content = [{"type": "text", "text": user_message}]
             for img_data in image_array:
-                user_content.append({"type": "image_url", "image_url": {"url": img_data}})
+                user_content.append({"type": "image_url", "image_url": {"url": vision.presize_data_uri(img_data, model, self.ENCODING)}})
             print(f"🟢 LLM JSON: Processing {len(image_array)} images from IMAGE_ARRAY")
         elif has_image_socket or has_image_url:
             # Single image input
             if has_image_socket:
                 # Use socket input (convert tensor to base64)
-                image_data_uri = self._tensor_to_base64_data_uri(input_image)
+                image_data_uri = self._tensor_to_base64_data_uri(input_image, model)
             else:
                 # Use URL input directly
                 image_data_uri = image_url
@@ -291,106 +246,13 @@ class Leon_LLM_JSON_API_Node(HyprLabLLMNodeBase):
 
 
 
-class Leon_Model_Selector_Node:
-    CATEGORY = "Leon_API"
-    RETURN_TYPES = ("STRING",)
-    RETURN_NAMES = ("model_name",)
-    FUNCTION = "select_model"
-
-    def __init__(self):
-        pass
-
-    @classmethod
-    def INPUT_TYPES(cls):
-        # Load available models from cached file
-        cached_models = cls._load_cached_models()
-        model_choices = [model["id"] for model in cached_models]  # Include all available models
-        
-        return {
-            "required": {
-                "model_choice": (model_choices, {"default": model_choices[0] if model_choices else "gemini-flash-latest", "tooltip": "Select a model from available options"}),
-                "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/models", "tooltip": "API URL to fetch models list"}),
-                "api_key": ("STRING", {"multiline": False, "default": "YOUR_HYPRLAB_API_KEY", "tooltip": "Your HyprLab API key"}),
-            },
-            "optional": {
-                "fetch_from_endpoint": ("BOOLEAN", {"default": False, "tooltip": "Fetch fresh model list from API endpoint and save to cache"}),
-                "custom_model": ("STRING", {"default": "", "tooltip": "Enter custom model name (overrides dropdown selection)"}),
-            }
-        }
-
-    @classmethod
-    def _load_cached_models(cls):
-        """Load models from cached models_config.json file"""
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        config_file = os.path.join(script_dir, "models_config.json")
-        
-        try:
-            if os.path.exists(config_file):
-                with open(config_file, 'r') as f:
-                    config_data = json.load(f)
-                    return config_data.get('data', [])
-        except Exception as e:
-            print(f"Failed to load cached models: {str(e)}")
-        
-        # Fallback to empty list if file doesn't exist or fails to load
-        return []
-
-    def _fetch_and_save_models(self, api_url, api_key):
-        """Fetch models from API and save to models_config.json"""
-        try:
-            headers = {
-                "Authorization": f"Bearer {api_key}"
-            }
-            
-            print(f"Fetching models from: {api_url}")
-            response = requests.get(api_url.rstrip('/'), headers=headers)
-            response.raise_for_status()
-            
-            config_data = response.json()
-            
-            # Save to file
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            config_file = os.path.join(script_dir, "models_config.json")
-            
-            with open(config_file, 'w') as f:
-                json.dump(config_data, f, indent=2)
-            
-            print(f"Successfully fetched and saved {len(config_data.get('data', []))} models to {config_file}")
-            return config_data.get('data', [])
-            
-        except Exception as e:
-            print(f"Failed to fetch models from API: {str(e)}")
-            print("Using cached models instead")
-            return self._load_cached_models()
-
-    def select_model(self, model_choice, api_url, api_key, fetch_from_endpoint=False, custom_model=""):
-        # If fetch from endpoint is enabled, fetch fresh data
-        if fetch_from_endpoint:
-            available_models = self._fetch_and_save_models(api_url, api_key)
-        else:
-            available_models = self._load_cached_models()
-        
-        # Use custom model if provided, otherwise use dropdown selection
-        selected_model = custom_model.strip() if custom_model.strip() else model_choice
-        
-        # Validate that selected model exists in available models (optional info)
-        model_found = any(model["id"] == selected_model for model in available_models)
-        if not model_found and not custom_model.strip():
-            print(f"Warning: Selected model '{selected_model}' not found in available models list")
-        
-        print(f"Selected model: {selected_model}")
-        return (selected_model,)
-
-
 # Node mappings for ComfyUI
 LLM_NODE_CLASS_MAPPINGS = {
     "Leon_LLM_Chat_API_Node": Leon_LLM_Chat_API_Node,
     "Leon_LLM_JSON_API_Node": Leon_LLM_JSON_API_Node,
-    "Leon_Model_Selector_Node": Leon_Model_Selector_Node,
 }
 
 LLM_NODE_DISPLAY_NAME_MAPPINGS = {
     "Leon_LLM_Chat_API_Node": "🤖 Leon LLM Chat API",
     "Leon_LLM_JSON_API_Node": "🤖 Leon LLM JSON API",
-    "Leon_Model_Selector_Node": "🤖 Leon Model Selector",
 }
\ No newline at end of file
@@ -0,0 +1,170 @@
+import json
+import os
+import time
+
+from ..base.interrupt import InterruptProcessingException
+
+
+# Kept apart from llm_api_nodes: its INPUT_TYPES is built at runtime, so
+# ComfyUI calls it at startup, and this module is much lighter to import.
+# The transport (requests, its watchdog thread) is only imported to fetch
+# the model list, and the ledger (sqlite) only where its ranking is read.
+
+class Leon_Model_Selector_Node:
+    CATEGORY = "Leon_API"
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("model_name",)
+    FUNCTION = "select_model"
+    CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models_config.json")
+    # ComfyUI asks for INPUT_TYPES on every /object_info and prompt validation;
+    # the ledger ranking in it is refreshed at most this often.
+    RANKING_REFRESH_SECONDS = 60.0
+    _models_cache = (None, [])        # (config file signature, models)
+    _input_types_cache = (None, None)  # (key, INPUT_TYPES result)
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        key = (cls._config_signature(), int(time.monotonic() // cls.RANKING_REFRESH_SECONDS),
+               os.environ.get("LEON_MODEL_SELECTOR_SORT", ""))
+        cached_key, cached = cls._input_types_cache
+        if cached_key == key:
+            return cached
+
+        # Load available models from cached file
+        cached_models = cls._load_cached_models()
+        model_choices = [model["id"] for model in cached_models]  # Include all available models
+        model_choices, speed_note = cls._rank_by_measured_speed(model_choices)
+        
+        input_types = {
+            "required": {
+                "model_choice": (model_choices, {"default": model_choices[0] if model_choices else "gemini-flash-latest", "tooltip": "Select a model from available options" + speed_note}),
+                "api_url": ("STRING", {"multiline": False, "default": "https://api.hyprlab.io/v1/models", "tooltip": "API URL to fetch models list"}),
+                "api_key": ("STRING", {"multiline": False, "default": "YOUR_HYPRLAB_API_KEY", "tooltip": "Your HyprLab API key"}),
+            },
+            "optional": {
+                "fetch_from_endpoint": ("BOOLEAN", {"default": False, "tooltip": "Fetch fresh model list from API endpoint and save to cache"}),
+                "custom_model": ("STRING", {"default": "", "tooltip": "Enter custom model name (overrides dropdown selection)"}),
+            }
+        }
+        cls._input_types_cache = (key, input_types)
+        return input_types
+
+    @classmethod
+    def _rank_by_measured_speed(cls, model_choices):
+        """
+        Annotate the tooltip with measured p50/p95 latency from the ledger, and with
+        LEON_MODEL_SELECTOR_SORT=speed list measured models fastest first. Choice
+        values themselves are never changed so saved workflows keep validating.
+        """
+        from ..base import ledger
+
+        try:
+            stats = {row["model"]: row for row in ledger.report() if row["p50_seconds"] is not None}
+        except Exception as e:
+            print(f"Model selector: could not read ledger: {str(e)}")
+            return model_choices, ""
+        measured = [m for m in model_choices if m in stats]
+        if not measured:
+            return model_choices, ""
+        measured.sort(key=lambda m: stats[m]["p50_seconds"])
+        if os.environ.get("LEON_MODEL_SELECTOR_SORT", "").lower() == "speed":
+            model_choices = measured + [m for m in model_choices if m not in stats]
+        note = "\nMeasured over the last 24h (p50 / p95):\n" + "\n".join(
+            f"{m}: {stats[m]['p50_seconds']:.1f}s / {stats[m]['p95_seconds']:.1f}s" for m in measured[:10]
+        )
+        return model_choices, note
+
+    @classmethod
+    def _config_signature(cls):
+        try:
+            stat = os.stat(cls.CONFIG_FILE)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @classmethod
+    def _load_cached_models(cls):
+        """Load models from cached models_config.json file, re-reading it only when it changes"""
+        signature = cls._config_signature()
+        cached_signature, cached_models = cls._models_cache
+        if signature is not None and signature == cached_signature:
+            return cached_models
+        
+        try:
+            if signature is not None:
+                with open(cls.CONFIG_FILE, 'r') as f:
+                    config_data = json.load(f)
+                models = config_data.get('data', [])
+                cls._models_cache = (signature, models)
+                return models
+        except Exception as e:
+            print(f"Failed to load cached models: {str(e)}")
+        
+        # Fallback to empty list if file doesn't exist or fails to load
+        return []
+
+    def _fetch_and_save_models(self, api_url, api_key):
+        """Fetch models from API and save to models_config.json"""
+        from ..base import transport
+
+        try:
+            headers = {
+                "Authorization": f"Bearer {api_key}"
+            }
+            
+            print(f"Fetching models from: {api_url}")
+            response = transport.get(api_url.rstrip('/'), headers=headers)
+            response.raise_for_status()
+            
+            config_data = response.json()
+            
+            # Save to file; the new mtime invalidates the cached list and INPUT_TYPES
+            config_file = self.CONFIG_FILE
+            
+            with open(config_file, 'w') as f:
+                json.dump(config_data, f, indent=2)
+            
+            print(f"Successfully fetched and saved {len(config_data.get('data', []))} models to {config_file}")
+            return config_data.get('data', [])
+            
+        except InterruptProcessingException:
+            raise
+        except Exception as e:
+            print(f"Failed to fetch models from API: {str(e)}")
+            print("Using cached models instead")
+            return self._load_cached_models()
+
+    def select_model(self, model_choice, api_url, api_key, fetch_from_endpoint=False, custom_model=""):
+        from ..base import ledger
+
+        # If fetch from endpoint is enabled, fetch fresh data
+        if fetch_from_endpoint:
+            available_models = self._fetch_and_save_models(api_url, api_key)
+        else:
+            available_models = self._load_cached_models()
+        
+        # Use custom model if provided, otherwise use dropdown selection
+        selected_model = custom_model.strip() if custom_model.strip() else model_choice
+        
+        # Validate that selected model exists in available models (optional info)
+        model_found = any(model["id"] == selected_model for model in available_models)
+        if not model_found and not custom_model.strip():
+            print(f"Warning: Selected model '{selected_model}' not found in available models list")
+        
+        print(f"Selected model: {selected_model}")
+        for row in ledger.report():
+            if row["model"] == selected_model and row["p50_seconds"] is not None:
+                print(f"Measured over the last 24h: p50 {row['p50_seconds']:.1f}s, p95 {row['p95_seconds']:.1f}s, {row['calls']} calls, {row['success_rate'] * 100:.0f}% ok")
+        return (selected_model,)
+
+
+MODEL_SELECTOR_NODE_CLASS_MAPPINGS = {
+    "Leon_Model_Selector_Node": Leon_Model_Selector_Node,
+}
+
+MODEL_SELECTOR_NODE_DISPLAY_NAME_MAPPINGS = {
+    "Leon_Model_Selector_Node": "🤖 Leon Model Selector",
+}
@@ -0,0 +1,285 @@
+import functools
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+from .base.job_journal import STATE_DIR
+
+
+# Lazy node registry.
+#
+# ComfyUI reads every node's class attributes (INPUT_TYPES, RETURN_TYPES, ...)
+# at startup and for each /object_info, but needs a provider's code only when
+# one of its nodes runs. MODULES declares where the nodes live; their metadata
+# is snapshotted into <state dir>/registry.json, keyed on the size and mtime
+# of every source file in this package. While the snapshot is current,
+# NODE_CLASS_MAPPINGS holds stand-in classes built from it, and a provider
+# module is imported the first time one of its nodes executes. Without a
+# current snapshot (first start, after an update or a local edit) every module
+# is imported as before and the snapshot is rewritten.
+#
+# INPUT_TYPES is computed once per class either way; nodes in DYNAMIC_INPUTS
+# build their inputs at runtime and always ask the real class.
+# LEON_LAZY_NODES=0 turns the stand-ins off.
+
+LAZY = os.environ.get("LEON_LAZY_NODES", "1").lower() not in ("0", "false", "no", "off")
+SNAPSHOT_PATH = os.path.join(STATE_DIR, "registry.json")
+FORMAT = 1
+
+# (module, mapping prefix) in NODE_CLASS_MAPPINGS order; each module exports
+# <prefix>_NODE_CLASS_MAPPINGS and <prefix>_NODE_DISPLAY_NAME_MAPPINGS.
+MODULES = [
+    ("img.flux_nodes", "FLUX"),
+    ("img.google_nodes", "GOOGLE"),
+    ("img.luma_nodes", "LUMA"),
+    ("img.bytedance_nodes", "BYTEDANCE"),
+    ("img.ideogram_nodes", "IDEOGRAM"),
+    ("img.recraft_nodes", "RECRAFT"),
+    ("img.qwen_nodes", "QWEN"),
+    ("img.nano_banana_nodes", "NANO_BANANA"),
+    ("img.xai_nodes", "XAI"),
+    ("llm.llm_api_nodes", "LLM"),
+    ("llm.model_selector_node", "MODEL_SELECTOR"),
+    ("img.midjourney_proxy_node", "MJ_PROXY"),
+    ("img.openai_image_nodes", "OPENAI_IMAGE"),
+    ("img.stable_diffusion_nodes", "STABLE_DIFFUSION"),
+    ("img.google_official_nodes", "GOOGLE_OFFICIAL"),
+    ("img.pruna_nodes", "PRUNA"),
+    ("util.utility_nodes", "UTIL"),
+    ("util.yellow_tint_cleaner_node", "UTIL"),
+]
+
+# Nodes whose INPUT_TYPES depend on runtime state (files, the ledger).
+DYNAMIC_INPUTS = {"Leon_Model_Selector_Node"}
+
+# Class attributes ComfyUI reads without running the node.
+CLASS_ATTRS = (
+    "RETURN_TYPES", "RETURN_NAMES", "FUNCTION", "CATEGORY", "OUTPUT_NODE", "OUTPUT_IS_LIST",
+    "INPUT_IS_LIST", "OUTPUT_TOOLTIPS", "DESCRIPTION", "DEPRECATED", "EXPERIMENTAL",
+    "NOT_IDEMPOTENT", "SEARCH_ALIASES",
+)
+
+_PACKAGE = __name__.rsplit(".", 1)[0]
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_resolve_lock = threading.Lock()
+
+
+def fingerprint():
+    """Size and mtime of every .py file in the package; any edit or update changes it."""
+    entries = []
+    for root, dirs, files in os.walk(_PACKAGE_DIR):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for name in sorted(files):
+            if name.endswith(".py"):
+                stat = os.stat(os.path.join(root, name))
+                entries.append(f"{os.path.relpath(os.path.join(root, name), _PACKAGE_DIR)}:{stat.st_size}:{stat.st_mtime_ns}")
+    entries.append(f"python:{sys.version_info[0]}.{sys.version_info[1]}:format:{FORMAT}")
+    return "|".join(entries)
+
+
+# -- INPUT_TYPES memoization ----------------------------------------------
+
+def memoize_input_types(cls):
+    """Compute cls.INPUT_TYPES() once per class (subclasses get their own entry)."""
+    owner = next((klass for klass in cls.__mro__ if "INPUT_TYPES" in klass.__dict__), None)
+    if owner is None:
+        return cls
+    original = owner.__dict__["INPUT_TYPES"]
+    func = original.__func__ if isinstance(original, (classmethod, staticmethod)) else original
+    if getattr(func, "_leon_memoized", False):
+        return cls
+    takes_cls = not isinstance(original, staticmethod)
+    cache = {}
+
+    @functools.wraps(func)
+    def INPUT_TYPES(klass):
+        if klass not in cache:
+            cache[klass] = func(klass) if takes_cls else func()
+        return cache[klass]
+
+    INPUT_TYPES._leon_memoized = True
+    owner.INPUT_TYPES = classmethod(INPUT_TYPES)
+    return cls
+
+
+# -- snapshot encoding ------------------------------------------------------
+# JSON has no tuples, but ComfyUI tells a combo (list of choices) from a typed
+# input (tuple) by type, so tuples are tagged.
+
+def _encode(value):
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        if not all(isinstance(k, str) for k in value):
+            raise TypeError("non-string dict key")
+        return {k: _encode(v) for k, v in value.items()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"cannot snapshot {type(value).__name__}")
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict):
+        if set(value) == {"__tuple__"}:
+            return tuple(_decode(v) for v in value["__tuple__"])
+        return {k: _decode(v) for k, v in value.items()}
+    return value
+
+
+def _describe(name, cls):
+    """Snapshot entry for one node class, or None if it can't be served without importing it."""
+    if hasattr(cls, "VALIDATE_INPUTS") or not callable(getattr(cls, getattr(cls, "FUNCTION", ""), None)):
+        # ComfyUI inspects VALIDATE_INPUTS' signature, so it needs the real class.
+        return None
+    attrs = {attr: _encode(getattr(cls, attr)) for attr in CLASS_ATTRS if hasattr(cls, attr)}
+    entry = {"class": cls.__name__, "attrs": attrs, "is_changed": hasattr(cls, "IS_CHANGED")}
+    if name not in DYNAMIC_INPUTS:
+        entry["input_types"] = _encode(cls.INPUT_TYPES())
+    return entry
+
+
+# -- loading ----------------------------------------------------------------
+
+def _import(module):
+    return importlib.import_module(f"{_PACKAGE}.{module}")
+
+
+def _module_mappings(module, prefix):
+    imported = _import(module)
+    return getattr(imported, f"{prefix}_NODE_CLASS_MAPPINGS"), getattr(imported, f"{prefix}_NODE_DISPLAY_NAME_MAPPINGS")
+
+
+def load_eager():
+    """Import every provider module; returns (class mappings, display names, snapshot modules)."""
+    classes, display_names, described = {}, {}, []
+    for module, prefix in MODULES:
+        module_classes, module_names = _module_mappings(module, prefix)
+        nodes = {}
+        for name, cls in module_classes.items():
+            if name not in DYNAMIC_INPUTS:
+                memoize_input_types(cls)
+            classes[name] = cls
+            try:
+                nodes[name] = _describe(name, cls)
+            except Exception as e:
+                print(f"Leon registry: {name} stays eager ({str(e)})")
+                nodes[name] = None
+        display_names.update(module_names)
+        described.append({
+            "module": module,
+            # A module with any node that can't be described is always imported.
+            "nodes": None if any(entry is None for entry in nodes.values()) else nodes,
+            "display_names": module_names,
+        })
+    return classes, display_names, described
+
+
+def _real_class(module, prefix, name):
+    with _resolve_lock:
+        cls = _module_mappings(module, prefix)[0][name]
+        if name not in DYNAMIC_INPUTS:
+            memoize_input_types(cls)
+        return cls
+
+
+def _stand_in(module, prefix, name, entry):
+    """A class with the snapshotted metadata that imports the real node on first use."""
+    attrs = {attr: _decode(value) for attr, value in entry["attrs"].items()}
+    resolve = functools.partial(_real_class, module, prefix, name)
+    function = attrs["FUNCTION"]
+
+    def __init__(self):
+        self._leon_node = None
+
+    def _node(self):
+        if self._leon_node is None:
+            self._leon_node = resolve()()
+        return self._leon_node
+
+    def __getattr__(self, attr):
+        # Anything else ComfyUI asks an instance for (check_lazy_status, ...).
+        if attr.startswith("_leon_"):
+            raise AttributeError(attr)
+        return getattr(self._node(), attr)
+
+    def run(self, *args, **kwargs):
+        return getattr(self._node(), function)(*args, **kwargs)
+
+    if "input_types" in entry:
+        input_types = _decode(entry["input_types"])
+
+        def INPUT_TYPES(cls):
+            return input_types
+    else:
+        def INPUT_TYPES(cls):
+            return resolve().INPUT_TYPES()
+
+    namespace = dict(attrs, __init__=__init__, _node=_node, __getattr__=__getattr__,
+                     INPUT_TYPES=classmethod(INPUT_TYPES), __module__=f"{_PACKAGE}.{module}",
+                     _leon_lazy=True, **{function: run})
+    if entry.get("is_changed"):
+        def IS_CHANGED(cls, *args, **kwargs):
+            return resolve().IS_CHANGED(*args, **kwargs)
+        namespace["IS_CHANGED"] = classmethod(IS_CHANGED)
+    return type(entry["class"], (), namespace)
+
+
+def _read_snapshot(expected):
+    try:
+        with open(SNAPSHOT_PATH, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("fingerprint") != expected or [m["module"] for m in snapshot.get("modules", [])] != [m for m, _ in MODULES]:
+        return None
+    return snapshot
+
+
+def _write_snapshot(current, described):
+    try:
+        os.makedirs(os.path.dirname(SNAPSHOT_PATH), exist_ok=True)
+        tmp_path = f"{SNAPSHOT_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": current, "created_at": time.time(), "modules": described}, f)
+        os.replace(tmp_path, SNAPSHOT_PATH)
+    except OSError as e:
+        print(f"Leon registry: could not write {SNAPSHOT_PATH}: {str(e)}")
+
+
+def load():
+    """(NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS) for ComfyUI, lazily where possible."""
+    if not LAZY:
+        classes, display_names, _ = load_eager()
+        return classes, display_names
+    current = fingerprint()
+    snapshot = _read_snapshot(current)
+    if snapshot is None:
+        classes, display_names, described = load_eager()
+        _write_snapshot(current, described)
+        return classes, display_names
+
+    classes, display_names = {}, {}
+    prefixes = dict(MODULES)
+    for described in snapshot["modules"]:
+        module = described["module"]
+        if described["nodes"] is None:
+            module_classes, _ = _module_mappings(module, prefixes[module])
+            for name, cls in module_classes.items():
+                if name not in DYNAMIC_INPUTS:
+                    memoize_input_types(cls)
+            classes.update(module_classes)
+        else:
+            for name, entry in described["nodes"].items():
+                classes[name] = _stand_in(module, prefixes[module], name, entry)
+        display_names.update(described["display_names"])
+    return classes, display_names
+
+
+__all__ = ["load", "load_eager", "memoize_input_types", "fingerprint", "MODULES", "DYNAMIC_INPUTS", "LAZY"]
@@ -1,16 +1,16 @@
-from .utility_nodes import UTIL_NODE_CLASS_MAPPINGS as BASE_CLASS_MAPPINGS
-from .utility_nodes import UTIL_NODE_DISPLAY_NAME_MAPPINGS as BASE_DISPLAY_NAME_MAPPINGS
-from .yellow_tint_cleaner_node import UTIL_NODE_CLASS_MAPPINGS as YT_CLASS_MAPPINGS
-from .yellow_tint_cleaner_node import UTIL_NODE_DISPLAY_NAME_MAPPINGS as YT_DISPLAY_NAME_MAPPINGS
+import importlib
 
-UTIL_NODE_CLASS_MAPPINGS = {
-    **BASE_CLASS_MAPPINGS,
-    **YT_CLASS_MAPPINGS
-}
 
-UTIL_NODE_DISPLAY_NAME_MAPPINGS = {
-    **BASE_DISPLAY_NAME_MAPPINGS,
-    **YT_DISPLAY_NAME_MAPPINGS
-}
+# Imported on first access; see nodes/img/__init__.py.
+def __getattr__(name):
+    if name in ("UTIL_NODE_CLASS_MAPPINGS", "UTIL_NODE_DISPLAY_NAME_MAPPINGS"):
+        base = importlib.import_module(".utility_nodes", __name__)
+        yellow_tint = importlib.import_module(".yellow_tint_cleaner_node", __name__)
+        return {
+            **getattr(base, name),
+            **getattr(yellow_tint, name)
+        }
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["UTIL_NODE_CLASS_MAPPINGS", "UTIL_NODE_DISPLAY_NAME_MAPPINGS"]
@@ -1,11 +1,13 @@
 from PIL import Image
 import io
-import torch
 import numpy as np
 import base64
 import requests # For ImgBB
 import json # For ImgBB
 
+from ..base import encoding, engine, ledger, timings, transport
+from ..base.interrupt import InterruptProcessingException
+
 class Leon_Image_Split_4Grid_Node:
     CATEGORY = "Leon_Utils"
     RETURN_TYPES = ("IMAGE", "IMAGE", "IMAGE", "IMAGE")
@@ -31,12 +33,7 @@ class Leon_Image_Split_4Grid_Node:
         return pil_image
 
     def _pil_to_rgba_tensor(self, pil_img):
-        pil_img = pil_img.convert("RGBA")
-        img_array = np.array(pil_img).astype(np.float32) / 255.0
-        if img_array.ndim == 3 and img_array.shape[-1] == 3:
-            alpha_channel = np.ones_like(img_array[..., :1])
-            img_array = np.concatenate((img_array, alpha_channel), axis=-1)
-        return torch.from_numpy(img_array).unsqueeze(0)
+        return engine.pil_to_rgba_tensor(pil_img)
 
     def split_image_grid(self, image):
         if image is None:
@@ -58,12 +55,14 @@ class Leon_Image_Split_4Grid_Node:
         img_bl = pil_image.crop(box_bl)
         img_br = pil_image.crop(box_br)
 
-        tensor_tl = self._pil_to_rgba_tensor(img_tl)
-        tensor_tr = self._pil_to_rgba_tensor(img_tr)
-        tensor_bl = self._pil_to_rgba_tensor(img_bl)
-        tensor_br = self._pil_to_rgba_tensor(img_br)
+        quadrants = [img_tl, img_tr, img_bl, img_br]
+        if width % 2 or height % 2:
+            # Odd sizes give quadrants of different sizes, which can't share a batch.
+            return tuple(self._pil_to_rgba_tensor(img) for img in quadrants)
 
-        return (tensor_tl, tensor_tr, tensor_bl, tensor_br)
+        # Converted in parallel into one allocation; each output is a view of it.
+        batch = engine.pil_images_to_batch(quadrants)
+        return tuple(batch[i:i + 1] for i in range(4))
 
 
 class Leon_String_Combine_Node:
@@ -118,6 +117,7 @@ class Leon_ImgBB_Upload_Node:
         pil_image = Image.fromarray(np_image, 'RGBA' if np_image.shape[-1] == 4 else 'RGB')
         return pil_image
 
+    @timings.instrument
     def upload_to_imgbb(self, image, api_key, expire=False, expiration_time_seconds=3600):
         if not api_key or not api_key.strip():
             raise ValueError("ImgBB API Key is required and cannot be empty.")
@@ -139,7 +139,7 @@ class Leon_ImgBB_Upload_Node:
         print(f"ImgBB Upload: Posting to {url.split('?key=')[0]}?key=YOUR_API_KEY...")
 
         try:
-            response = requests.post(url, data=payload)
+            response = transport.post(url, data=payload)
             response.raise_for_status()
             result = response.json()
 
@@ -161,6 +161,8 @@ class Leon_ImgBB_Upload_Node:
                 except Exception:
                     result_clean = result
                 raise ValueError(f"ImgBB API Error (Code: {status_code}): {error_message}. Full response: {json.dumps(result_clean)}")
+        except InterruptProcessingException:
+            raise
         except requests.exceptions.RequestException as e:
             raise ValueError(f"ImgBB upload request failed: {str(e)}")
         except Exception as e:
@@ -217,6 +219,7 @@ class Leon_Hypr_Upload_Node:
         buffer.seek(0)
         return buffer
 
+    @timings.instrument
     def upload_to_hypr(self, api_key, image=None, file_path="", url="", base64_data="", output_format=""):
         if not api_key or not api_key.strip():
             raise ValueError("HyprLab API Key is required and cannot be empty.")
@@ -232,7 +235,7 @@ class Leon_Hypr_Upload_Node:
             data = {}
             if output_format:
                 data["output_format"] = output_format
-            response = requests.post(endpoint, headers=headers, files=files, data=data)
+            response = transport.post(endpoint, headers=headers, files=files, data=data)
         elif file_path:
             # Local file upload via multipart
             try:
@@ -242,7 +245,7 @@ class Leon_Hypr_Upload_Node:
                 with open(file_path, "rb") as f:
                     files = {"file": (file_path.split("/")[-1], f, mime_type)}
                     data = {"output_format": output_format} if output_format else {}
-                    response = requests.post(endpoint, headers=headers, files=files, data=data)
+                    response = transport.post(endpoint, headers=headers, files=files, data=data)
             except FileNotFoundError:
                 raise ValueError(f"File not found: {file_path}")
         else:
@@ -269,7 +272,7 @@ class Leon_Hypr_Upload_Node:
                 raise ValueError("No valid input provided. Provide an image tensor, file_path, url, or base64_data.")
 
             headers_json = {**headers, "Content-Type": "application/json"}
-            response = requests.post(endpoint, headers=headers_json, json=payload)
+            response = transport.post(endpoint, headers=headers_json, json=payload)
 
         # Handle response
         try:
@@ -296,6 +299,8 @@ class Leon_Image_Array_Builder_Node:
     RETURN_TYPES = ("IMAGE_ARRAY",)  # Custom type: list of base64 strings or URLs
     RETURN_NAMES = ("image_array",)
     FUNCTION = "build_image_array"
+    # How the images are encoded (LEON_ENCODE_ARRAY); keep max unset to preserve dimensions.
+    ENCODING = encoding.profile("array", "png:6")
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -318,43 +323,17 @@ class Leon_Image_Array_Builder_Node:
 
     def _tensor_to_base64_data_uri(self, tensor_image):
         """Convert a single IMAGE tensor to base64 data URI, preserving original dimensions."""
-        if tensor_image is None:
-            return None
-        
-        # Handle batch dimension
-        if tensor_image.ndim == 4:
-            tensor_image = tensor_image[0]
-        
-        # Convert to numpy and PIL
-        np_image = (tensor_image.cpu().numpy() * 255).astype(np.uint8)
-        pil_image = Image.fromarray(np_image, 'RGBA' if np_image.shape[-1] == 4 else 'RGB')
-        
-        # Convert to base64 data URI
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format="PNG")
-        base64_str = base64.b64encode(buffer.getvalue()).decode("utf-8")
-        return f"data:image/png;base64,{base64_str}"
-
-    def _tensor_to_bytes(self, tensor_image):
-        """Convert a ComfyUI IMAGE tensor to PNG bytes for upload."""
-        if tensor_image.ndim == 4:
-            tensor_image = tensor_image[0]
-        np_image = (tensor_image.cpu().numpy() * 255).astype(np.uint8)
-        pil_image = Image.fromarray(np_image, 'RGBA' if np_image.shape[-1] == 4 else 'RGB')
-        buffer = io.BytesIO()
-        pil_image.save(buffer, format="PNG")
-        buffer.seek(0)
-        return buffer
+        return encoding.to_data_uri(tensor_image, self.ENCODING)
 
     def _upload_to_hyprlab(self, tensor_image, api_key):
         """Upload a single image to HyprLab and return the URL."""
         endpoint = "https://api.hyprlab.io/v1/uploads"
         headers = {"Authorization": f"Bearer {api_key.strip()}"}
         
-        buffer = self._tensor_to_bytes(tensor_image)
-        files = {"file": ("image.png", buffer, "image/png")}
+        data, mime = encoding.encode(tensor_image, self.ENCODING)
+        files = {"file": (f"image.{mime.split('/')[-1]}", data, mime)}
         
-        response = requests.post(endpoint, headers=headers, files=files)
+        response = transport.post(endpoint, headers=headers, files=files)
         response.raise_for_status()
         result = response.json()
         
@@ -363,6 +342,7 @@ class Leon_Image_Array_Builder_Node:
                 return result[key]
         raise ValueError(f"Unexpected HyprLab response format: {result}")
 
+    @timings.instrument
     def build_image_array(self, output_mode, api_key="", image_1=None, image_2=None, image_3=None, image_4=None, 
                           image_5=None, image_6=None, image_7=None, image_8=None):
         """Converts provided images into an array of base64-encoded strings or URLs, maintaining order and original dimensions."""
@@ -388,6 +368,8 @@ class Leon_Image_Array_Builder_Node:
                         url = self._upload_to_hyprlab(img, api_key)
                         image_array.append(url)
                         print(f"🟢 Image Array Builder: Uploaded image {idx} ({width}x{height}) → {url[:60]}...")
+                    except InterruptProcessingException:
+                        raise
                     except Exception as e:
                         raise ValueError(f"Failed to upload image {idx}: {str(e)}")
                 else:
@@ -406,12 +388,46 @@ class Leon_Image_Array_Builder_Node:
 
 
 
+class Leon_Model_Leaderboard_Node:
+    CATEGORY = "Leon_Utils"
+    RETURN_TYPES = ("STRING", "STRING",)
+    RETURN_NAMES = ("report", "fastest_model",)
+    FUNCTION = "build_report"
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "window_hours": ("FLOAT", {"default": 24.0, "min": 0.1, "max": 720.0, "step": 0.5, "tooltip": "Rolling window of ledger entries to include"}),
+            },
+            "optional": {
+                "node_class": ("STRING", {"multiline": False, "default": "", "tooltip": "Only include calls made by this node class (e.g. Leon_LLM_Chat_API_Node)"}),
+            }
+        }
+
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # The ledger changes with every call, so never reuse a cached report.
+        return float("nan")
+
+    def build_report(self, window_hours, node_class=""):
+        rows = ledger.report(window_hours * 3600, node_class=node_class.strip() or None)
+        report = ledger.format_report(rows)
+        print(f"🟢 Model Leaderboard ({window_hours}h):\n{report}")
+        fastest = rows[0]["model"] if rows and rows[0]["p50_seconds"] is not None else ""
+        return (report, fastest)
+
+
 UTIL_NODE_CLASS_MAPPINGS = {
     "Leon_Image_Split_4Grid_Node": Leon_Image_Split_4Grid_Node,
     "Leon_String_Combine_Node": Leon_String_Combine_Node,
     "Leon_ImgBB_Upload_Node": Leon_ImgBB_Upload_Node,
     "Leon_Hypr_Upload_Node": Leon_Hypr_Upload_Node,
     "Leon_Image_Array_Builder_Node": Leon_Image_Array_Builder_Node,
+    "Leon_Model_Leaderboard_Node": Leon_Model_Leaderboard_Node,
 }
 
 UTIL_NODE_DISPLAY_NAME_MAPPINGS = {
@@ -420,4 +436,5 @@ UTIL_NODE_DISPLAY_NAME_MAPPINGS = {
     "Leon_ImgBB_Upload_Node": "🤖 Leon ImgBB Upload",
     "Leon_Hypr_Upload_Node": "🤖 Leon Hypr Upload",
     "Leon_Image_Array_Builder_Node": "🤖 Leon Image Array Builder",
+    "Leon_Model_Leaderboard_Node": "🤖 Leon Model Leaderboard",
 } 
\ No newline at end of file
@@ -1,7 +1,8 @@
-import torch
 import numpy as np
 from PIL import Image, ImageEnhance, ImageChops
 
+from ..base import engine
+
 def normalize_gray(image: Image) -> Image:
     """Normalize a grayscale image using histogram equalization."""
     if image.mode != 'L':
@@ -235,19 +236,14 @@ class Leon_Yellow_Tint_Cleaner_Node:
         return pil_images
 
     def pil_to_tensor(self, pil_images):
-        # Convert list of PIL Images back to batched tensor (B, H, W, C)
-        tensors = []
-        for img in pil_images:
-            img_np = np.array(img).astype(np.float32) / 255.0
-            tensors.append(torch.from_numpy(img_np))
-        return torch.stack(tensors, dim=0)
+        # Convert list of PIL Images back to batched tensor (B, H, W, C), written into one allocation
+        return engine.pil_images_to_batch(pil_images, mode=pil_images[0].mode)
 
     def clean_yellow_tint(self, image, strength=100, brightness=0, contrast=0, saturation=0, red=0, green=0, blue=0, mode='RGB'):
         pil_images = self.tensor_to_pil(image)
-        adjusted_images = []
-        
-        for pil_img in pil_images:
-            adjusted = auto_adjust(
+        # One image per worker; PIL and NumPy release the GIL for most of auto_adjust.
+        adjusted_images = engine.map_parallel(
+            lambda pil_img: auto_adjust(
                 pil_img,
                 strength=strength,
                 brightness=brightness,
@@ -257,8 +253,9 @@ class Leon_Yellow_Tint_Cleaner_Node:
                 green=green,
                 blue=blue,
                 mode=mode
-            )
-            adjusted_images.append(adjusted)
+            ),
+            pil_images,
+        )
             
         return (self.pil_to_tensor(adjusted_images),)
 